@@ -21,6 +21,21 @@ from .multi_manager.multi_manager import (
 from .multi_manager.shared.shared_classes import (
     HomeAssistantXTData,
 )
+from .multi_manager.shared.device_map_snapshot import (
+    XTDeviceMapSnapshot,
+)
+from .multi_manager.shared.cloud_fix import (
+    CloudFixes,
+)
+from .multi_manager.shared.merging_manager import (
+    XTMergingManager,
+)
+from .multi_manager.shared.value_descriptor import (
+    XTValueDescriptor,
+)
+from .multi_manager.tuya_iot.xt_tuya_iot_model_cache import (
+    XTIOTModelCache,
+)
 
 from .util import (
     get_config_entry_runtime_data
@@ -42,8 +57,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: XTConfigEntry) -> bool:
     service_manager = ServiceManager(multi_manager=multi_manager)
     await multi_manager.setup_entry(hass, entry)
 
-    # Get all devices from Tuya
-    await hass.async_add_executor_job(multi_manager.update_device_cache)
+    # Restore the devices from the last run, the cloud will be queried in the background
+    restored_from_snapshot = await multi_manager.async_restore_device_cache()
+    if not restored_from_snapshot:
+        # Get all devices from Tuya
+        await multi_manager.async_update_device_cache()
 
     # Connection is successful, store the manager & listener
     entry.runtime_data = HomeAssistantXTData(multi_manager=multi_manager, listener=multi_manager.multi_device_listener, service_manager=service_manager)
@@ -71,10 +89,17 @@ async def async_setup_entry(hass: HomeAssistant, entry: XTConfigEntry) -> bool:
 
     for device in aggregated_device_map.values():
         multi_manager.virtual_state_handler.apply_init_virtual_states(device)
+    multi_manager.share_device_specs()
         
-    # If the device does not register any entities, the device does not need to subscribe
-    # So the subscription is here
-    await hass.async_add_executor_job(multi_manager.refresh_mq)
+    if restored_from_snapshot:
+        # The MQTT subscription is done once the devices are reconciled with the cloud
+        entry.async_create_background_task(
+            hass, multi_manager.async_reconcile_device_cache(), f"{DOMAIN}_reconcile_device_cache"
+        )
+    else:
+        # If the device does not register any entities, the device does not need to subscribe
+        # So the subscription is here
+        await hass.async_add_executor_job(multi_manager.refresh_mq)
     service_manager.register_services()
     return True
 
@@ -128,9 +153,15 @@ async def async_unload_entry(hass: HomeAssistant, entry: XTConfigEntry) -> bool:
     """Unloading the Tuya platforms."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
         tuya = entry.runtime_data
+        #Don't lose the commands that are still waiting in the queue, nor send them once the MQ is stopped
+        await tuya.manager.command_queue.async_stop()
         if tuya.manager.mq is not None:
             tuya.manager.mq.stop()
         tuya.manager.remove_device_listeners()
+        #The specs are fixed and merged again on the next load, don't keep their memos for the lifetime of the process
+        CloudFixes.clear_memo()
+        XTMergingManager.clear_memo()
+        XTValueDescriptor.clear_cache()
     return unload_ok
 
 
@@ -141,4 +172,6 @@ async def async_remove_entry(hass: HomeAssistant, entry: XTConfigEntry) -> None:
     """
     runtime_data = get_config_entry_runtime_data(hass, entry, DOMAIN)
     if runtime_data:
-        await hass.async_add_executor_job(runtime_data.device_manager.unload)
\ No newline at end of file
+        await hass.async_add_executor_job(runtime_data.device_manager.unload)
+    await XTDeviceMapSnapshot(hass, entry.entry_id).async_remove()
+    await XTIOTModelCache.async_remove_store(hass, entry.entry_id)
\ No newline at end of file
@@ -83,8 +83,7 @@ class TuyaCameraEntity(TuyaEntity, CameraEntity):
 
     async def stream_source(self) -> str | None:
         """Return the source of the stream."""
-        return await self.hass.async_add_executor_job(
-            self.device_manager.get_device_stream_allocate,
+        return await self.device_manager.async_get_device_stream_allocate(
             self.device.id,
             "rtsp",
         )
@@ -96,12 +95,16 @@ class TuyaCameraEntity(TuyaEntity, CameraEntity):
         stream_source = await self.stream_source()
         if not stream_source:
             return None
-        return await ffmpeg.async_get_image(
+        image = await ffmpeg.async_get_image(
             self.hass,
             stream_source,
             width=width,
             height=height,
         )
+        if not image:
+            #The allocated URL may not be valid anymore, allocate a new one next time
+            self.device_manager.stream_url_cache.invalidate(self.device.id)
+        return image
 
     def enable_motion_detection(self) -> None:
         """Enable motion detection in the camera."""
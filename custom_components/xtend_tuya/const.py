@@ -71,6 +71,22 @@ SMARTLIFE_APP = "smartlife"
 MESSAGE_SOURCE_TUYA_IOT = "tuya_iot"
 MESSAGE_SOURCE_TUYA_SHARING = "tuya_sharing"
 
+#Seconds during which the commands sent to a device are merged before being sent, 0 sends them right away
+#(the default as the window delays every command and the virtual functions are applied without waiting)
+COMMAND_COALESCING_WINDOW = 0
+#Seconds after which a commanded value that no report confirmed is rolled back
+OPTIMISTIC_STATE_TIMEOUT = 10
+#Seconds during which an allocated stream URL is reused when the allocation doesn't return its expire_time
+STREAM_URL_CACHE_TTL = 240
+#Seconds before the expiration at which a stream URL is allocated again in the background
+STREAM_URL_REFRESH_MARGIN = 60
+#Number of fixed specs kept, one per product in most installations
+CLOUD_FIXES_MEMO_SIZE = 256
+#Number of aligned pairs of value descriptors kept
+VALUE_DESCRIPTOR_ALIGNMENT_MEMO_SIZE = 4096
+#Number of distinct value descriptors whose parsed form is kept
+VALUE_DESCRIPTOR_CACHE_SIZE = 4096
+
 PLATFORMS = [
     Platform.ALARM_CONTROL_PANEL,
     Platform.BINARY_SENSOR,
@@ -17,6 +17,12 @@ from .const import DOMAIN, DPCode
 from .multi_manager.shared.device import (
     XTDevice,
 )
+from .multi_manager.shared.cloud_fix import (
+    CloudFixes,
+)
+from .multi_manager.shared.spec_pool import (
+    XTDeviceSpecPool,
+)
 
 
 async def async_get_config_entry_diagnostics(
@@ -52,6 +58,16 @@ def _async_get_diagnostics(
         "mqtt_connected": mqtt_connected,
         "disabled_by": entry.disabled_by,
         "disabled_polling": entry.pref_disable_polling,
+        "message_ingest": hass_data.manager.message_metrics.as_dict(),
+        "command_queue": hass_data.manager.command_queue.get_metrics(),
+        "optimistic_state": hass_data.manager.optimistic_state_handler.get_metrics(),
+        "stream_url_cache": hass_data.manager.stream_url_cache.get_metrics(),
+        "cloud_fixes_memo": CloudFixes.get_memo_metrics(),
+        "shared_specs": XTDeviceSpecPool.get_metrics(),
+        "accounts": {
+            account_name: account.get_diagnostics()
+            for account_name, account in hass_data.manager.accounts.items()
+        },
     }
 
     if device:
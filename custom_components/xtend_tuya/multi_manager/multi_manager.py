@@ -1,12 +1,13 @@
 from __future__ import annotations
 from functools import partial
-import copy
 import importlib
 import os
+import threading
 from typing import Any, Literal, Optional
 
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryAuthFailed, HomeAssistantError
 
 from tuya_iot.device import (
     PROTOCOL_DEVICE_REPORT,
@@ -61,6 +62,29 @@ from .shared.multi_virtual_function_handler import (
     XTVirtualFunctionHandler,
 )
 
+from .shared.device_map_snapshot import (
+    SNAPSHOT_SPECIFIC_ATTRIBUTES,
+    XTDeviceMapSnapshot,
+)
+
+from .shared.message_metrics import (
+    XTMessageMetrics,
+)
+
+from .shared.command_queue import (
+    XTCommandQueue,
+)
+
+from .shared.optimistic_state import (
+    XTOptimisticStateHandler,
+)
+from .shared.stream_url_cache import (
+    XTStreamURLCache,
+)
+from .shared.spec_pool import (
+    XTDeviceSpecPool,
+)
+
 from ..util import (
     append_lists,
 )
@@ -83,6 +107,22 @@ class MultiManager:  # noqa: F811
         self.is_ready_for_messages = False
         self.pending_messages: list[tuple[str, str]] = []
         self.devices_shared: dict[str, XTDevice] = {}
+        self.config_entry: XTConfigEntry = None
+        self.device_map_snapshot: XTDeviceMapSnapshot = None
+        self.restored_device_ids: set[str] = set()
+        self.restored_domain_identifiers: dict[str, list[str]] = {}
+        self.new_device_ids: list[str] = []
+        self.removed_device_ids: list[str] = []
+        self.reconciled_device_codes: dict[str, list[str]] = {}
+        #Commands sent to the restored devices before the accounts know them
+        self.reconcile_lock = threading.Lock()
+        self.is_waiting_for_reconcile = False
+        self.reconcile_error: str | None = None
+        self.commands_waiting_for_reconcile: list[tuple[str, list[dict[str, Any]]]] = []
+        self.message_metrics = XTMessageMetrics()
+        self.command_queue = XTCommandQueue(hass, self._async_send_regular_commands)
+        self.optimistic_state_handler = XTOptimisticStateHandler(self)
+        self.stream_url_cache = XTStreamURLCache(hass, self._allocate_stream_url)
 
     @property
     def device_map(self):
@@ -98,6 +138,8 @@ class MultiManager:  # noqa: F811
         return None
 
     async def setup_entry(self, hass: HomeAssistant, config_entry: XTConfigEntry) -> None:
+        self.config_entry = config_entry
+        self.device_map_snapshot = XTDeviceMapSnapshot(hass, config_entry.entry_id)
         #Load all the plugins
         #subdirs = await self.hass.async_add_executor_job(os.listdir, os.path.dirname(__file__))
         subdirs = AllowedPlugins.get_plugins_to_load()
@@ -120,6 +162,8 @@ class MultiManager:  # noqa: F811
         return_list: list = []
         for account in self.accounts.values():
             return_list = append_lists(return_list, account.get_domain_identifiers_of_device(device_id))
+        #Until the cloud is reconciled, the accounts don't know the restored devices
+        return_list = append_lists(return_list, self.restored_domain_identifiers.get(device_id))
         return return_list
     
     def get_platform_descriptors_to_merge(self, platform: Platform) -> list:
@@ -129,6 +173,76 @@ class MultiManager:  # noqa: F811
                 return_list.append(new_descriptors)
         return return_list
     
+    async def async_restore_device_cache(self) -> bool:
+        """Fill the device map from the last snapshot, return True if devices were restored."""
+        restored = await self.device_map_snapshot.async_load()
+        if not restored:
+            return False
+        device_map, domain_identifiers = restored
+        if not device_map:
+            return False
+        for device_id, device in device_map.items():
+            CloudFixes.apply_fixes(device)
+            #The online flag and status of the snapshot are not current, the device is unavailable until reconciled
+            device.online = False
+            self.master_device_map[device_id] = device
+            self.restored_device_ids.add(device_id)
+        self.restored_domain_identifiers = domain_identifiers
+        self.is_waiting_for_reconcile = True
+        LOGGER.debug(f"Restored {len(device_map)} devices from the last snapshot")
+        return True
+
+    async def async_update_device_cache(self):
+        await self.hass.async_add_executor_job(self.update_device_cache)
+        domain_identifiers: dict[str, list[str]] = {}
+        for device_id in self.master_device_map:
+            domain_identifiers[device_id] = self.get_domain_identifiers_of_device(device_id)
+        await self.device_map_snapshot.async_save(self.master_device_map, domain_identifiers)
+
+    async def async_reconcile_device_cache(self):
+        """Fetch the devices from the cloud after a restore from the snapshot."""
+        try:
+            await self.async_update_device_cache()
+        except ConfigEntryAuthFailed:
+            self._fail_reconcile("authentication failed")
+            self.config_entry.async_start_reauth(self.hass)
+            return
+        except Exception as e:
+            LOGGER.error(f"Background refresh of the devices failed, keeping the restored devices unavailable: {e}")
+            self._fail_reconcile(f"{e}")
+            return
+        self.restored_domain_identifiers = {}
+        for device_id in self.new_device_ids:
+            if device := self.device_map.get(device_id):
+                self.multi_device_listener.add_device(device)
+        self.new_device_ids = []
+        for device_id in self.removed_device_ids:
+            self.multi_device_listener.async_remove_device(device_id)
+        self.removed_device_ids = []
+        for device_id, updated_codes in self.reconciled_device_codes.items():
+            if device := self.device_map.get(device_id):
+                self.multi_device_listener.update_device(device, updated_codes)
+        self.reconciled_device_codes = {}
+        for device in self.device_map.values():
+            self.virtual_state_handler.apply_init_virtual_states(device)
+        self.share_device_specs()
+        await self.hass.async_add_executor_job(self.refresh_mq)
+        with self.reconcile_lock:
+            self.is_waiting_for_reconcile = False
+            waiting_commands = self.commands_waiting_for_reconcile
+            self.commands_waiting_for_reconcile = []
+        for device_id, commands in waiting_commands:
+            await self.hass.async_add_executor_job(self.send_commands, device_id, commands)
+
+    def _fail_reconcile(self, reason: str) -> None:
+        with self.reconcile_lock:
+            self.is_waiting_for_reconcile = False
+            self.reconcile_error = reason
+            waiting_commands = self.commands_waiting_for_reconcile
+            self.commands_waiting_for_reconcile = []
+        for device_id, commands in waiting_commands:
+            LOGGER.error(f"Commands {commands} to {device_id} dropped, the devices could not be fetched from the cloud: {reason}")
+
     def update_device_cache(self):
         self.is_ready_for_messages = False
         for key, manager in self.accounts.items():
@@ -142,6 +256,7 @@ class MultiManager:  # noqa: F811
         
         #Register all devices in the master device map
         self._update_master_device_map()
+        self._reconcile_restored_devices()
 
         #Now let's aggregate all of these devices into a single
         #"All functionnality" device
@@ -150,6 +265,10 @@ class MultiManager:  # noqa: F811
             CloudFixes.apply_fixes(device)
         self._process_pending_messages()
 
+    def share_device_specs(self):
+        #To be called once the specs are complete, identical devices then point to the same entries
+        XTDeviceSpecPool.share_devices(self.device_map.values())
+
     def _process_pending_messages(self):
         self.is_ready_for_messages = True
         for messages in self.pending_messages:
@@ -163,6 +282,51 @@ class MultiManager:  # noqa: F811
                     if device_id not in self.master_device_map:
                         self.master_device_map[device_id] = device_map[device_id]
 
+    def _reconcile_restored_devices(self):
+        #The entities hold the restored devices, keep these objects and give them
+        #the specs and status freshly fetched by the accounts
+        if not self.restored_device_ids:
+            return
+        for device_id in self.master_device_map:
+            if device_id not in self.restored_device_ids:
+                self.new_device_ids.append(device_id)
+        for device_id in self.restored_device_ids:
+            restored_device = self.master_device_map[device_id]
+            devices = self.__get_devices_from_device_id(device_id)
+            if not devices:
+                #The device was removed from the account, don't keep it (and save it again) as an offline device
+                LOGGER.debug(f"Restored device {restored_device.name} ({device_id}) is no longer available, removing it")
+                self.master_device_map.pop(device_id, None)
+                self.restored_domain_identifiers.pop(device_id, None)
+                self.removed_device_ids.append(device_id)
+                continue
+            fresh_device = devices[0]
+            if fresh_device is restored_device:
+                continue
+            has_new_codes = self._update_restored_device(restored_device, fresh_device)
+            for device_map in self.__get_available_device_maps():
+                if device_map.get(device_id) is fresh_device:
+                    device_map[device_id] = restored_device
+            if has_new_codes:
+                #Discover the entities of the DPs that the snapshot didn't have
+                self.new_device_ids.append(device_id)
+        self.restored_device_ids.clear()
+
+    def _update_restored_device(self, restored_device: XTDevice, fresh_device: XTDevice) -> bool:
+        """Copy the specs, status and online flag of the fresh device, return True if it has new DP codes."""
+        has_new_codes = (
+            any(code not in restored_device.status for code in fresh_device.status)
+            or any(code not in restored_device.function for code in fresh_device.function)
+        )
+        updated_codes = [code for code, value in fresh_device.status.items() if restored_device.status.get(code) != value]
+        for attribute in SNAPSHOT_SPECIFIC_ATTRIBUTES:
+            if hasattr(fresh_device, attribute):
+                setattr(restored_device, attribute, getattr(fresh_device, attribute))
+        restored_device.online = fresh_device.online
+        restored_device.invalidate_code_index()
+        self.reconciled_device_codes[restored_device.id] = updated_codes
+        return has_new_codes
+
     def __get_available_device_maps(self) -> list[dict[str, XTDevice]]:
         return_list: list[dict[str, XTDevice]] = []
         for manager in self.accounts.values():
@@ -204,6 +368,8 @@ class MultiManager:  # noqa: F811
             and device.status_range[code].dp_id is not None
             ):
             return device.status_range[code].dp_id
+        if isinstance(device, XTDevice):
+            return device.get_dp_id_from_code(code)
         for dpId in device.local_strategy:
             if device.local_strategy[dpId]["status_code"] == code:
                 return dpId
@@ -272,9 +438,19 @@ class MultiManager:  # noqa: F811
             return None, None, None, False
         return code, dpId, value, True
 
+    def process_device_report_status_list(self, device: XTDevice, source: str, status: list) -> list:
+        #The report payload is left untouched, the returned list holds new items
+        status = self.convert_device_report_status_list(device.id, status)
+        status = self.multi_source_handler.filter_status_list(device.id, source, status)
+        status = self.virtual_state_handler.apply_virtual_states_to_status_list(device, status)
+        self.optimistic_state_handler.on_device_report(device, status)
+        return status
+
     def convert_device_report_status_list(self, device_id: str, status_in: list) -> list:
-        status = copy.deepcopy(status_in)
-        for item in status:
+        #The items hold scalar values, a shallow copy of each is enough to annotate them
+        status: list[dict[str, Any]] = []
+        for item in status_in:
+            item = dict(item)
             code, dpId, value, result_ok = self._read_code_dpid_value_from_state(device_id, item)
             if result_ok:
                 item["code"] = code
@@ -283,6 +459,7 @@ class MultiManager:  # noqa: F811
             else:
                 #LOGGER.warning(f"convert_device_report_status_list code retrieval failed => {item} <=>{device_id}")
                 pass
+            status.append(item)
         return status
 
     def on_message(self, source: str, msg: str):
@@ -303,7 +480,8 @@ class MultiManager:  # noqa: F811
             #self.device_watcher.report_message(dev_id, f"on_message ({source}) status list => {status_list}")
         
         if source in self.accounts:
-            self.accounts[source].on_message(new_message)
+            with self.message_metrics.measure(source):
+                self.accounts[source].on_message(new_message)
 
     def _get_device_id_from_message(self, msg: str) -> str | None:
         protocol = msg.get("protocol", 0)
@@ -346,6 +524,14 @@ class MultiManager:  # noqa: F811
     def send_commands(
             self, device_id: str, commands: list[dict[str, Any]]
     ):
+        if self.is_waiting_for_reconcile or self.reconcile_error is not None:
+            with self.reconcile_lock:
+                if self.is_waiting_for_reconcile:
+                    #The accounts don't know the restored devices yet, send the commands once they do
+                    self.commands_waiting_for_reconcile.append((device_id, commands))
+                    return
+                if self.reconcile_error is not None:
+                    raise HomeAssistantError(f"Devices could not be fetched from the cloud: {self.reconcile_error}")
         virtual_function_commands: list[dict[str, Any]] = []
         regular_commands: list[dict[str, Any]] = []
         if device := self.device_map.get(device_id, None):
@@ -371,8 +557,17 @@ class MultiManager:  # noqa: F811
             self.virtual_function_handler.process_virtual_function(device_id, virtual_function_commands)
 
         if regular_commands:
+            #Show the commanded values right away, the device report confirms them later.
+            #Commands that no account sends would never be confirmed
+            command_codes_to_send: set[str] = set()
             for account in self.accounts.values():
-                account.send_commands(device_id, regular_commands)
+                command_codes_to_send.update(account.get_command_codes_to_send(device_id, regular_commands))
+            self.optimistic_state_handler.apply_commands(device, [command for command in regular_commands if command["code"] in command_codes_to_send])
+            self.command_queue.enqueue(device_id, regular_commands)
+
+    async def _async_send_regular_commands(self, device_id: str, commands: list[dict[str, Any]]):
+        for account in self.accounts.values():
+            await account.async_send_commands(self.hass, device_id, commands)
 
     def get_device_stream_allocate(
             self, device_id: str, stream_type: Literal["flv", "hls", "rtmp", "rtsp"]
@@ -381,6 +576,26 @@ class MultiManager:  # noqa: F811
             if stream_allocate := account.get_device_stream_allocate(device_id, stream_type):
                 return stream_allocate
 
+    def get_device_stream_allocation(
+            self, device_id: str, stream_type: Literal["flv", "hls", "rtmp", "rtsp"]
+    ) -> Optional[dict[str, Any]]:
+        for account in self.accounts.values():
+            if stream_allocation := account.get_device_stream_allocation(device_id, stream_type):
+                return stream_allocation
+
+    async def async_get_device_stream_allocate(
+            self, device_id: str, stream_type: Literal["flv", "hls", "rtmp", "rtsp"], source: str | None = None
+    ) -> Optional[str]:
+        #Allocated URLs are reused until they expire
+        return await self.stream_url_cache.async_get(device_id, stream_type, source)
+
+    def _allocate_stream_url(self, device_id: str, stream_type: str, source: str | None) -> dict[str, Any] | None:
+        if source is None:
+            return self.get_device_stream_allocation(device_id, stream_type)
+        if account := self.get_account_by_name(source):
+            return account.get_device_stream_allocation(device_id, stream_type)
+        return None
+
     def send_lock_unlock_command(
             self, device_id: str, lock: bool
     ) -> bool:
@@ -1,35 +1,201 @@
 from __future__ import annotations
 
+from collections import OrderedDict
 import json
+import threading
+from typing import Any
 
 from .device import (
     XTDevice,
     XTDeviceFunction,
     XTDeviceStatusRange,
 )
+from .value_descriptor import (
+    XTValueDescriptor,
+)
+from .spec_pool import (
+    XTDeviceSpecPool,
+)
 from ...const import (
     LOGGER,  # noqa: F401
+    CLOUD_FIXES_MEMO_SIZE,
 )
 from ...base import (
     DPType,
     TuyaEntity,
 )
 
+#State values that let determine_most_plausible prefer a boolean type
+BOOLEAN_STATE_VALUES = ["True", "False", "true", "false", True, False]
+
+class XTCloudFixesCodeView:
+    """status_range, function and local_strategy entries of a DP code side by side."""
+
+    def __init__(self, code: str) -> None:
+        self.code = code
+        self.status_range: XTDeviceStatusRange | None = None
+        self.function: XTDeviceFunction | None = None
+        #(dp_id, True if the code is the status_code of the DP and False if it's one of its aliases), in local_strategy order
+        self.local_strategy_dp_ids: list[tuple[int, bool]] = []
+
+class XTCloudFixesResult:
+    """What the fixes changed on the specs of a device, to apply it to devices with the same specs."""
+
+    def __init__(self, device: XTDevice, fingerprint: int) -> None:
+        self.fingerprint = fingerprint
+        self.status_range = {code: (status_range.type, status_range.values, status_range.dp_id) for code, status_range in device.status_range.items()}
+        self.function = {code: (function.type, function.values, function.dp_id) for code, function in device.function.items()}
+        self.local_strategy: dict[int, tuple[bool, bool, tuple[str, ...], dict[str, Any] | None]] = {}
+        for dp_id, dp_item in device.local_strategy.items():
+            config_item: dict[str, Any] | None = dp_item.get("config_item")
+            fixed_config_item: dict[str, Any] | None = None
+            if config_item:
+                fixed_config_item = {key: config_item[key] for key in ("valueType", "valueDesc", "statusFormat", "enumMappingMap") if key in config_item}
+                if "enumMappingMap" in fixed_config_item:
+                    fixed_config_item["enumMappingMap"] = dict(fixed_config_item["enumMappingMap"])
+            self.local_strategy[dp_id] = (
+                dp_item["property_update"],
+                dp_item["use_open_api"],
+                tuple(dp_item["status_code_alias"]),
+                fixed_config_item,
+            )
+
+    def apply(self, device: XTDevice) -> None:
+        #The value descriptors are immutable strings, they are shared with the other devices
+        for code, status_range in device.status_range.items():
+            if not isinstance(status_range, XTDeviceStatusRange):
+                status_range = device.status_range[code] = XTDeviceStatusRange.from_compatible_status_range(status_range)
+            status_range.type, status_range.values, status_range.dp_id = self.status_range[code]
+        for code, function in device.function.items():
+            if not isinstance(function, XTDeviceFunction):
+                function = device.function[code] = XTDeviceFunction.from_compatible_function(function)
+            function.type, function.values, function.dp_id = self.function[code]
+        for dp_id, dp_item in device.local_strategy.items():
+            property_update, use_open_api, status_code_alias, fixed_config_item = self.local_strategy[dp_id]
+            dp_item["property_update"] = property_update
+            dp_item["use_open_api"] = use_open_api
+            dp_item["status_code_alias"] = list(status_code_alias)
+            if fixed_config_item and (config_item := dp_item.get("config_item")):
+                config_item.update(fixed_config_item)
+                if "enumMappingMap" in fixed_config_item:
+                    config_item["enumMappingMap"] = dict(fixed_config_item["enumMappingMap"])
+
 class CloudFixes:
+    #Fixed specs by (product_id, fingerprint of the specs before the fixes)
+    memo_lock = threading.Lock()
+    memo: OrderedDict[tuple[str | None, int], XTCloudFixesResult] = OrderedDict()
+    memo_hit_count: int = 0
+    memo_miss_count: int = 0
+
     def apply_fixes(device: XTDevice):
+        #The fixes give the same result as long as their inputs didn't change
+        fingerprint = CloudFixes.get_fingerprint(device)
+        if getattr(device, "_cloud_fixes_fingerprint", None) == fingerprint:
+            return
+        XTDeviceSpecPool.unshare(device)
+        #Devices of the same product come with the same specs, fix them once
+        memo_key = (getattr(device, "product_id", None), fingerprint)
+        with CloudFixes.memo_lock:
+            result = CloudFixes.memo.get(memo_key)
+            if result is not None:
+                CloudFixes.memo.move_to_end(memo_key)
+                CloudFixes.memo_hit_count += 1
+            else:
+                CloudFixes.memo_miss_count += 1
+        if result is not None:
+            result.apply(device)
+            device.invalidate_code_index()
+            device._cloud_fixes_fingerprint = result.fingerprint
+            return
         CloudFixes._unify_data_types(device)
         CloudFixes._unify_added_attributes(device)
-        CloudFixes._map_dpid_to_codes(device)
-        CloudFixes._fix_incorrect_valuedescr(device)
+        code_views = CloudFixes._get_code_views(device)
+        CloudFixes._map_dpid_to_codes(code_views)
+        CloudFixes._fix_incorrect_valuedescr(device, code_views)
         CloudFixes._fix_incorrect_percentage_scale(device)
-        CloudFixes._align_valuedescr(device)
-        CloudFixes._fix_missing_local_strategy_enum_mapping_map(device)
-        CloudFixes._fix_missing_range_values_using_local_strategy(device)
-        CloudFixes._fix_missing_aliases_using_status_format(device)
+        CloudFixes._align_valuedescr(device, code_views)
+        CloudFixes._fix_local_strategies(device)
+        device.invalidate_code_index()
+        device._cloud_fixes_fingerprint = CloudFixes.get_fingerprint(device)
+        result = XTCloudFixesResult(device, device._cloud_fixes_fingerprint)
+        with CloudFixes.memo_lock:
+            CloudFixes.memo[memo_key] = result
+            while len(CloudFixes.memo) > CLOUD_FIXES_MEMO_SIZE:
+                CloudFixes.memo.popitem(last=False)
 
         #This causes some entities to disappear, instead we know update all local alias statuses
         #CloudFixes._remove_status_that_are_local_strategy_aliases(device)
 
+    def clear_memo():
+        with CloudFixes.memo_lock:
+            CloudFixes.memo.clear()
+
+    def get_memo_metrics() -> dict[str, Any]:
+        with CloudFixes.memo_lock:
+            return {
+                "products": len(CloudFixes.memo),
+                "hits": CloudFixes.memo_hit_count,
+                "misses": CloudFixes.memo_miss_count,
+            }
+
+    def get_fingerprint(device: XTDevice) -> int:
+        """Hash of everything the fixes read from the device."""
+        status_range_items = tuple(
+            (code, getattr(status_range, "type", None), CloudFixes._get_hashable(getattr(status_range, "values", None)), getattr(status_range, "dp_id", None))
+            for code, status_range in device.status_range.items()
+        )
+        function_items = tuple(
+            (code, getattr(function, "type", None), CloudFixes._get_hashable(getattr(function, "values", None)), getattr(function, "dp_id", None))
+            for code, function in device.function.items()
+        )
+        local_strategy_items: list[tuple] = []
+        for dp_id, dp_item in device.local_strategy.items():
+            status_code = dp_item.get("status_code")
+            config_item = dp_item.get("config_item") or {}
+            local_strategy_items.append((
+                dp_id,
+                status_code,
+                CloudFixes._get_hashable(dp_item.get("status_code_alias")),
+                dp_item.get("property_update"),
+                dp_item.get("use_open_api"),
+                CloudFixes._get_hashable(config_item.get("valueType")),
+                CloudFixes._get_hashable(config_item.get("valueDesc")),
+                CloudFixes._get_hashable(config_item.get("statusFormat")),
+                CloudFixes._get_hashable(config_item.get("enumMappingMap")),
+                device.status.get(status_code) in BOOLEAN_STATE_VALUES,
+            ))
+        return hash((status_range_items, function_items, tuple(local_strategy_items)))
+
+    def _get_hashable(value: Any) -> Any:
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        if isinstance(value, dict):
+            return tuple((key, CloudFixes._get_hashable(item)) for key, item in value.items())
+        if isinstance(value, (list, tuple)):
+            return tuple(CloudFixes._get_hashable(item) for item in value)
+        return repr(value)
+
+    def _get_code_views(device: XTDevice) -> dict[str, XTCloudFixesCodeView]:
+        code_views: dict[str, XTCloudFixesCodeView] = {}
+        for code, status_range in device.status_range.items():
+            code_views[code] = XTCloudFixesCodeView(code)
+            code_views[code].status_range = status_range
+        for code, function in device.function.items():
+            if code not in code_views:
+                code_views[code] = XTCloudFixesCodeView(code)
+            code_views[code].function = function
+        for dp_id, dp_item in device.local_strategy.items():
+            if code := dp_item.get("status_code"):
+                if code not in code_views:
+                    code_views[code] = XTCloudFixesCodeView(code)
+                code_views[code].local_strategy_dp_ids.append((dp_id, True))
+            if aliases := dp_item.get("status_code_alias"):
+                for alias in aliases:
+                    if alias not in code_views:
+                        code_views[alias] = XTCloudFixesCodeView(alias)
+                    code_views[alias].local_strategy_dp_ids.append((dp_id, False))
+        return code_views
+
     def _unify_added_attributes(device: XTDevice):
         for dpId in device.local_strategy:
             if device.local_strategy[dpId].get("property_update") is None:
@@ -81,73 +247,49 @@ class CloudFixes:
                                     case 2:
                                         config_item["valueType"] = device.status_range[code].type
                                         config_item["valueDesc"] = device.status_range[code].values
-    def _map_dpid_to_codes(device: XTDevice):
-        for dpId in device.local_strategy:
-            if code := device.local_strategy[dpId].get("status_code"):
-                if code in device.function:
-                    device.function[code].dp_id = dpId
-                if code in device.status_range:
-                    device.status_range[code].dp_id = dpId
-            if code_alias := device.local_strategy[dpId].get("status_code_alias"):
-                for code in code_alias:
-                    if code in device.function:
-                        device.function[code].dp_id = dpId
-                    if code in device.status_range:
-                        device.status_range[code].dp_id = dpId
-
-    def _fix_incorrect_valuedescr(device: XTDevice):
-        all_codes: list[str] = []
-        for code in device.status_range:
-            if code not in all_codes:
-                all_codes.append(code)
-        for code in device.function:
-            if code not in all_codes:
-                all_codes.append(code)
-        for dp_item in device.local_strategy.values():
-            if code := dp_item.get("status_code"):
-                if code not in all_codes:
-                    all_codes.append(code)
-            if aliases := dp_item.get("status_code_alias"):
-                for alias in aliases:
-                    if alias not in all_codes:
-                        all_codes.append(alias)
-        for code in all_codes:
+    def _map_dpid_to_codes(code_views: dict[str, XTCloudFixesCodeView]):
+        for code_view in code_views.values():
+            if not code_view.local_strategy_dp_ids:
+                continue
+            #The last DP referencing the code wins
+            dp_id = code_view.local_strategy_dp_ids[-1][0]
+            if code_view.function is not None:
+                code_view.function.dp_id = dp_id
+            if code_view.status_range is not None:
+                code_view.status_range.dp_id = dp_id
+
+    def _fix_incorrect_valuedescr(device: XTDevice, code_views: dict[str, XTCloudFixesCodeView]):
+        for code, code_view in code_views.items():
             correct_value = None
             dp_id = None
             need_fixing = False
             sr_need_fixing = False
             fn_need_fixing = False
             ls_need_fixing = False
-            if code in device.status_range:
-                sr_value_dict, sr_value_raw = CloudFixes.get_value_descr_dict(device.status_range[code].values)
-                if device.status_range[code].dp_id is not None:
-                    dp_id = device.status_range[code].dp_id
+            if code_view.status_range is not None:
+                sr_value_dict, sr_value_raw = CloudFixes.get_value_descr_dict(code_view.status_range.values)
+                if code_view.status_range.dp_id is not None:
+                    dp_id = code_view.status_range.dp_id
                 if sr_value_dict is None:
                     sr_need_fixing = True
                     need_fixing = True
                 else:
                     correct_value = sr_value_raw
-            if code in device.function:
-                fn_value_dict, fn_value_raw = CloudFixes.get_value_descr_dict(device.function[code].values)
-                if device.function[code].dp_id is not None:
-                    dp_id = device.function[code].dp_id
+            if code_view.function is not None:
+                fn_value_dict, fn_value_raw = CloudFixes.get_value_descr_dict(code_view.function.values)
+                if code_view.function.dp_id is not None:
+                    dp_id = code_view.function.dp_id
                 if fn_value_dict is None:
                     fn_need_fixing = True
                     need_fixing = True
                 else:
                     correct_value = fn_value_raw
             if dp_id is None:
-                #Try to find the code the manually (Should not happen in theory)
-                for dp_id_temp in device.local_strategy:
-                    if ls_code := device.local_strategy[dp_id_temp].get("status_code"):
-                        if ls_code == code:
-                            dp_id = dp_id_temp
-                            break
-                    if aliases := device.local_strategy[dp_id_temp].get("status_code_alias"):
-                        for alias in aliases:
-                            if alias == code:
-                                dp_id = dp_id_temp
-                                break
+                #Take it from the local strategy, the DP that has the code as status_code is preferred over the aliases
+                for dp_id_temp, is_status_code in code_view.local_strategy_dp_ids:
+                    dp_id = dp_id_temp
+                    if is_status_code:
+                        break
             if dp_id is not None:
                 if dp_item := device.local_strategy.get(dp_id):
                     if config_item := dp_item.get("config_item"):
@@ -172,21 +314,19 @@ class CloudFixes:
                     else:
                         correct_value = CloudFixes.get_fixed_value_descr(error_values[0], error_values[1])
                 if sr_need_fixing:
-                    device.status_range[code].values = correct_value
+                    code_view.status_range.values = correct_value
                 if fn_need_fixing:
-                    device.function[code].values = correct_value
+                    code_view.function.values = correct_value
                 if ls_need_fixing:
                     config_item["valueDesc"] = correct_value
 
     def get_value_descr_dict(value_str: str):
-        try:
-            value_dict: dict = json.loads(value_str)
-            if value_dict.get("ErrorValue1"):
-                return None, value_dict["ErrorValue1"]
-            iter(value_dict)
-            return value_dict, value_str
-        except Exception:
+        value_dict = XTValueDescriptor.parse(value_str)
+        if value_dict is None:
             return None, value_str
+        if value_dict.get("ErrorValue1"):
+            return None, value_dict["ErrorValue1"]
+        return value_dict, value_str
     
     def get_fixed_value_descr(value1_str: str, value2_str: str | None = None) -> str:
         if value1_str is not None and value2_str is not None:
@@ -205,56 +345,41 @@ class CloudFixes:
         else:
             return json.dumps({})
 
-    def _align_valuedescr(device: XTDevice):
-        all_codes: dict[str, int] = {}
-        for code in device.status_range:
-            if code not in all_codes:
-                all_codes[code] = 1
-            else:
-                all_codes[code] += 1
-        for code in device.function:
-            if code not in all_codes:
-                all_codes[code] = 1
-            else:
-                all_codes[code] += 1
-        for dp_item in device.local_strategy.values():
-            if code := dp_item.get("status_code"):
-                if code not in all_codes:
-                    all_codes[code] = 1
-                else:
-                    all_codes[code] += 1
-        for code in all_codes:
-            if all_codes[code] < 2:
+    def _align_valuedescr(device: XTDevice, code_views: dict[str, XTCloudFixesCodeView]):
+        for code_view in code_views.values():
+            #Only the codes present at least twice (aliases don't count) need to be aligned
+            occurrences = sum(is_status_code for _, is_status_code in code_view.local_strategy_dp_ids)
+            if code_view.status_range is not None:
+                occurrences += 1
+            if code_view.function is not None:
+                occurrences += 1
+            if occurrences < 2:
                 continue
             sr_value = None
             fn_value = None
             ls_value = None
             dp_id = None
-            if code in device.status_range:
-                sr_value = json.loads(device.status_range[code].values)
-                dp_id = device.status_range[code].dp_id
-            if code in device.function:
-                fn_value = json.loads(device.function[code].values)
-                dp_id = device.function[code].dp_id
+            if code_view.status_range is not None:
+                sr_value = XTValueDescriptor.parse(code_view.status_range.values)
+                dp_id = code_view.status_range.dp_id
+            if code_view.function is not None:
+                fn_value = XTValueDescriptor.parse(code_view.function.values)
+                dp_id = code_view.function.dp_id
             if dp_id is not None:
                 if dp_item := device.local_strategy.get(dp_id):
                     if config_item := dp_item.get("config_item"):
                         if value_descr := config_item.get("valueDesc"):
-                            ls_value = json.loads(value_descr)
+                            ls_value = XTValueDescriptor.parse(value_descr)
             fix_dict = CloudFixes.compute_aligned_valuedescr(ls_value, sr_value, fn_value)
-            for fix_code in fix_dict:
-                if sr_value:
-                    sr_value[fix_code] = fix_dict[fix_code]
-                if fn_value:
-                    fn_value[fix_code] = fix_dict[fix_code]
-                if ls_value:
-                    ls_value[fix_code] = fix_dict[fix_code]
-            if sr_value:
-                device.status_range[code].values = json.dumps(sr_value)
-            if fn_value:
-                device.function[code].values = json.dumps(fn_value)
-            if ls_value:
-                config_item["valueDesc"] = json.dumps(ls_value)
+            if not fix_dict:
+                continue
+            #Only the descriptors that the alignment changes are dumped again
+            if new_value := XTValueDescriptor.with_changes(sr_value, fix_dict):
+                code_view.status_range.values = new_value
+            if new_value := XTValueDescriptor.with_changes(fn_value, fix_dict):
+                code_view.function.values = new_value
+            if new_value := XTValueDescriptor.with_changes(ls_value, fix_dict):
+                config_item["valueDesc"] = new_value
 
     
     def compute_aligned_valuedescr(value1: dict, value2: dict, value3: dict) -> dict:
@@ -301,7 +426,8 @@ class CloudFixes:
             return_dict["step"] = step_cur
         range_list: list = CloudFixes._get_field_of_valuedescr(value1, value2, value3, "range")
         if len(range_list) > 1:
-            range_ref:list = range_list[0]
+            #The value descriptors are shared, don't extend their range in place
+            range_ref:list = list(range_list[0])
             for range in range_list[1:]:
                 #Determine if the range should be merged or not
 
@@ -339,51 +465,35 @@ class CloudFixes:
         
 
     def _fix_incorrect_percentage_scale(device: XTDevice):
-        supported_units: list = ["%"]
         for code in device.status_range:
-            value = json.loads(device.status_range[code].values)
-            if "unit" in value and "min" in value and "max" in value and "scale" in value:
-                unit = value["unit"]
-                min = value["min"]
-                max = value["max"]
-                if unit not in supported_units:
-                    continue
-                if max % 100 != 0:
-                    continue
-                if min not in (0, 1):
-                    continue
-                value["scale"] = int(max / 100) - 1
-                device.status_range[code].values = json.dumps(value)
+            if new_value := CloudFixes._get_fixed_percentage_scale(device.status_range[code].values):
+                device.status_range[code].values = new_value
         for code in device.function:
-            value = json.loads(device.function[code].values)
-            if "unit" in value and "min" in value and "max" in value and "scale" in value:
-                unit = value["unit"]
-                min = value["min"]
-                max = value["max"]
-                if unit not in supported_units:
-                    continue
-                if max % 100 != 0:
-                    continue
-                if min not in (0, 1):
-                    continue
-                value["scale"] = int(max / 100) - 1
-                device.function[code].values = json.dumps(value)
+            if new_value := CloudFixes._get_fixed_percentage_scale(device.function[code].values):
+                device.function[code].values = new_value
         for dpId in device.local_strategy:
             if config_item := device.local_strategy[dpId].get("config_item"):
                 if value_descr := config_item.get("valueDesc"):
-                    value = json.loads(value_descr)
-                    if "unit" in value and "min" in value and "max" in value and "scale" in value:
-                        unit = value["unit"]
-                        min = value["min"]
-                        max = value["max"]
-                        if unit not in supported_units:
-                            continue
-                        if max % 100 != 0:
-                            continue
-                        if min not in (0, 1):
-                            continue
-                        value["scale"] = int(max / 100) - 1
-                        config_item["valueDesc"] = json.dumps(value)
+                    if new_value := CloudFixes._get_fixed_percentage_scale(value_descr):
+                        config_item["valueDesc"] = new_value
+
+    def _get_fixed_percentage_scale(value_descr: str) -> str | None:
+        supported_units: list = ["%"]
+        value = XTValueDescriptor.parse(value_descr)
+        if value is None:
+            return None
+        if "unit" in value and "min" in value and "max" in value and "scale" in value:
+            unit = value["unit"]
+            min = value["min"]
+            max = value["max"]
+            if unit not in supported_units:
+                return None
+            if max % 100 != 0:
+                return None
+            if min not in (0, 1):
+                return None
+            return XTValueDescriptor.with_changes(value, {"scale": int(max / 100) - 1})
+        return None
 
     def determine_most_plausible(value1: dict, value2: dict, key: str, state_value: any = None) -> int | None:
         if key in value1 and key in value2:
@@ -413,64 +523,67 @@ class CloudFixes:
             return 2
         return None
 
-    def _fix_missing_local_strategy_enum_mapping_map(device: XTDevice):
+    def _fix_local_strategies(device: XTDevice):
+        #These fixes only look at one DP at a time, they are done in the same walk of the local strategy
         for local_strategy in device.local_strategy.values():
-            if config_item := local_strategy.get("config_item", None):
-                if mappings := config_item.get("enumMappingMap", None):
-                    if 'false' in mappings and str(False) not in mappings:
-                        mappings[str(False)] = mappings['false']
-                    if 'true' in mappings and str(True) not in mappings:
-                        mappings[str(True)] = mappings['true']
+            CloudFixes._fix_missing_local_strategy_enum_mapping_map(local_strategy)
+            CloudFixes._fix_missing_range_values_using_local_strategy(device, local_strategy)
+            CloudFixes._fix_missing_aliases_using_status_format(local_strategy)
+
+    def _fix_missing_local_strategy_enum_mapping_map(local_strategy: dict[str, Any]):
+        if config_item := local_strategy.get("config_item", None):
+            if mappings := config_item.get("enumMappingMap", None):
+                if 'false' in mappings and str(False) not in mappings:
+                    mappings[str(False)] = mappings['false']
+                if 'true' in mappings and str(True) not in mappings:
+                    mappings[str(True)] = mappings['true']
     
-    def _fix_missing_range_values_using_local_strategy(device: XTDevice):
-        for local_strategy in device.local_strategy.values():
-            status_code = local_strategy.get("status_code", None)
-            if status_code not in device.status_range and status_code not in device.function:
-                continue
-            if config_item := local_strategy.get("config_item", None):
-                if config_item.get("valueType", None) != "Enum":
-                    continue
-                if valueDesc := config_item.get("valueDesc", None):
-                    value_dict = json.loads(valueDesc)
-                    if valueDescr_range := value_dict.get("range", {}):
-                        if status_range := device.status_range.get(status_code, None):
-                            if status_range_values := json.loads(status_range.values):
-                                status_range_range_dict: list = status_range_values.get("range", {})
-                                new_range_list: list = []
-                                for new_range_value in valueDescr_range:
-                                    new_range_list.append(new_range_value)
-                                for new_range_value in status_range_range_dict:
-                                    if new_range_value not in new_range_list:
-                                        new_range_list.append(new_range_value)
-                                status_range_values["range"] = new_range_list
-                                status_range.values = json.dumps(status_range_values)
-                        if function := device.function.get(status_code, None):
-                            if function_values := json.loads(function.values):
-                                function_range_dict: list = function_values.get("range", {})
-                                new_range_list: list = []
-                                for new_range_value in valueDescr_range:
-                                    new_range_list.append(new_range_value)
-                                for new_range_value in function_range_dict:
-                                    if new_range_value not in new_range_list:
-                                        new_range_list.append(new_range_value)
-                                function_values["range"] = new_range_list
-                                function.values = json.dumps(function_values)
-
-
-    def _fix_missing_aliases_using_status_format(device: XTDevice):
-        for local_strategy in device.local_strategy.values():
-            status_code = local_strategy.get("status_code", None)
-            if config_item := local_strategy.get("config_item", None):
-                if status_formats := config_item.get("statusFormat", None):
-                    status_formats_dict: dict = json.loads(status_formats)
-                    pop_list: list[str] = []
-                    for status in status_formats_dict:
-                        if status != status_code and status not in local_strategy["status_code_alias"]:
-                            pop_list.append(status)
-                            local_strategy["status_code_alias"].append(status)
-                    for status in pop_list:
-                        status_formats_dict.pop(status)
-                    config_item["statusFormat"] = json.dumps(status_formats_dict)
+    def _fix_missing_range_values_using_local_strategy(device: XTDevice, local_strategy: dict[str, Any]):
+        status_code = local_strategy.get("status_code", None)
+        if status_code not in device.status_range and status_code not in device.function:
+            return
+        if config_item := local_strategy.get("config_item", None):
+            if config_item.get("valueType", None) != "Enum":
+                return
+            if valueDesc := config_item.get("valueDesc", None):
+                value_dict = XTValueDescriptor.parse(valueDesc)
+                if value_dict is None:
+                    return
+                if valueDescr_range := value_dict.get("range", {}):
+                    if status_range := device.status_range.get(status_code, None):
+                        if new_values := CloudFixes._get_values_with_range(status_range.values, valueDescr_range):
+                            status_range.values = new_values
+                    if function := device.function.get(status_code, None):
+                        if new_values := CloudFixes._get_values_with_range(function.values, valueDescr_range):
+                            function.values = new_values
+
+    def _get_values_with_range(values: str, range_values: list) -> str | None:
+        if values_dict := XTValueDescriptor.parse(values):
+            current_range: list = values_dict.get("range", {})
+            new_range_list: list = []
+            for new_range_value in range_values:
+                new_range_list.append(new_range_value)
+            for new_range_value in current_range:
+                if new_range_value not in new_range_list:
+                    new_range_list.append(new_range_value)
+            return XTValueDescriptor.with_changes(values_dict, {"range": new_range_list})
+        return None
+
+    def _fix_missing_aliases_using_status_format(local_strategy: dict[str, Any]):
+        status_code = local_strategy.get("status_code", None)
+        if config_item := local_strategy.get("config_item", None):
+            if status_formats := config_item.get("statusFormat", None):
+                status_formats_dict: dict = json.loads(status_formats)
+                pop_list: list[str] = []
+                for status in status_formats_dict:
+                    if status != status_code and status not in local_strategy["status_code_alias"]:
+                        pop_list.append(status)
+                        local_strategy["status_code_alias"].append(status)
+                if not pop_list:
+                    return
+                for status in pop_list:
+                    status_formats_dict.pop(status)
+                config_item["statusFormat"] = json.dumps(status_formats_dict)
     
     def _remove_status_that_are_local_strategy_aliases(device: XTDevice):
         for local_strategy in device.local_strategy.values():
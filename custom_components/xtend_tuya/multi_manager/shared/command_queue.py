@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Coroutine
+import asyncio
+import threading
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from ...const import (
+    COMMAND_COALESCING_WINDOW,
+    LOGGER,  # noqa: F401
+)
+
+class XTPendingCommands:
+    def __init__(self) -> None:
+        self.commands: dict[str, dict[str, Any]] = {}
+        self.first_enqueue_time = time.monotonic()
+
+class XTCommandQueue:
+    """Per-device outbound command queue.
+
+    Commands sent to the same device within the window are merged, the last value of a
+    DP code wins and is sent in the position of its last write, as one batch from the
+    event loop. The window is 0 by default: each command is then sent on its own.
+    """
+
+    def __init__(self, hass: HomeAssistant, async_send_commands: Callable[[str, list[dict[str, Any]]], Coroutine[Any, Any, None]], window: float = COMMAND_COALESCING_WINDOW) -> None:
+        self.hass = hass
+        self.async_send_commands = async_send_commands
+        self.window = window
+        self.lock = threading.Lock()
+        self.pending: dict[str, XTPendingCommands] = {}
+        #Only used from the event loop
+        self.flush_handles: dict[str, asyncio.TimerHandle] = {}
+        self.stopped: bool = False
+        self.queue_depth: int = 0
+        self.max_queue_depth: int = 0
+        self.enqueued_count: int = 0
+        self.merged_count: int = 0
+        self.flush_count: int = 0
+        self.total_flush_latency: float = 0
+        self.max_flush_latency: float = 0
+
+    def enqueue(self, device_id: str, commands: list[dict[str, Any]]) -> None:
+        """Queue commands for a device, can be called from any thread."""
+        if self.stopped:
+            LOGGER.warning(f"Commands {commands} to {device_id} dropped, the integration is unloading")
+            return
+        if self.window <= 0:
+            self.hass.add_job(self._async_send_commands, device_id, commands)
+            return
+        with self.lock:
+            new_batch = device_id not in self.pending
+            if new_batch:
+                self.pending[device_id] = XTPendingCommands()
+            pending_commands = self.pending[device_id].commands
+            for command in commands:
+                self.enqueued_count += 1
+                #The latest write of a code moves to the end so that the commands keep their order
+                if pending_commands.pop(command["code"], None) is not None:
+                    self.merged_count += 1
+                else:
+                    self.queue_depth += 1
+                pending_commands[command["code"]] = command
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        if new_batch:
+            self.hass.loop.call_soon_threadsafe(self._async_schedule_flush, device_id)
+
+    def _async_schedule_flush(self, device_id: str) -> None:
+        if self.stopped:
+            #Queued while stopping
+            self._async_flush(device_id)
+            return
+        self.flush_handles[device_id] = self.hass.loop.call_later(self.window, self._async_flush, device_id)
+
+    def _async_flush(self, device_id: str) -> None:
+        self.flush_handles.pop(device_id, None)
+        self.hass.async_create_task(self.async_flush(device_id))
+
+    async def async_flush(self, device_id: str) -> None:
+        if handle := self.flush_handles.pop(device_id, None):
+            handle.cancel()
+        with self.lock:
+            if (pending := self.pending.pop(device_id, None)) is None:
+                return
+            self.queue_depth -= len(pending.commands)
+            latency = time.monotonic() - pending.first_enqueue_time
+            self.flush_count += 1
+            self.total_flush_latency += latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+        await self._async_send_commands(device_id, list(pending.commands.values()))
+
+    async def async_flush_all(self) -> None:
+        with self.lock:
+            device_ids = list(self.pending)
+        for device_id in device_ids:
+            await self.async_flush(device_id)
+
+    async def async_stop(self) -> None:
+        """Send the queued commands right away and stop queueing, to be called on unload."""
+        self.stopped = True
+        await self.async_flush_all()
+
+    async def _async_send_commands(self, device_id: str, commands: list[dict[str, Any]]) -> None:
+        try:
+            await self.async_send_commands(device_id, commands)
+        except Exception as e:
+            LOGGER.error(f"Sending commands {commands} to {device_id} failed: {e}")
+
+    def get_metrics(self) -> dict[str, Any]:
+        with self.lock:
+            average_latency = None
+            if self.flush_count > 0:
+                average_latency = round(self.total_flush_latency / self.flush_count * 1000, 3)
+            return {
+                "window_seconds": self.window,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "enqueued_commands": self.enqueued_count,
+                "merged_commands": self.merged_count,
+                "flushes": self.flush_count,
+                "flush_latency_average_ms": average_latency,
+                "flush_latency_max_ms": round(self.max_flush_latency * 1000, 3),
+            }
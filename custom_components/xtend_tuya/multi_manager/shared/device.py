@@ -5,6 +5,10 @@ from types import SimpleNamespace
 from dataclasses import dataclass, field
 import copy
 
+from ...const import (
+    LOGGER,  # noqa: F401
+)
+
 @dataclass
 class XTDeviceStatusRange:
     code: str
@@ -108,6 +112,7 @@ class XTDevice(SimpleNamespace):
         self.function = {}
         self.status_range = {}
         super().__init__(**kwargs)
+        self.invalidate_code_index()
 
     def __eq__(self, other):
         """If devices are the same one."""
@@ -144,6 +149,38 @@ class XTDevice(SimpleNamespace):
 
         return new_device
     
+    def invalidate_code_index(self) -> None:
+        """To be called whenever the content of local_strategy changes."""
+        self._code_index: dict[str, int] | None = None
+        self._code_index_source: dict[int, dict[str, Any]] | None = None
+        self._code_index_size: int = 0
+
+    def _build_code_index(self) -> dict[str, int]:
+        #First dpId declaring the code (or one of its aliases) wins, like the former linear scan
+        code_index: dict[str, int] = {}
+        for dp_id, dp_item in self.local_strategy.items():
+            if (status_code := dp_item.get("status_code")) is not None:
+                code_index.setdefault(status_code, dp_id)
+            if "status_code_alias" in dp_item:
+                for alias in dp_item["status_code_alias"]:
+                    code_index.setdefault(alias, dp_id)
+            else:
+                LOGGER.warning(f"Device {self.name} ({self.id}) has no status_code_alias dict for dpId {dp_id}, please contact the developer about this")
+        self._code_index = code_index
+        self._code_index_source = self.local_strategy
+        self._code_index_size = len(self.local_strategy)
+        return code_index
+
+    def get_dp_id_from_code(self, code: str) -> int | None:
+        code_index = self._code_index
+        if (
+            code_index is None
+            or self._code_index_source is not self.local_strategy
+            or self._code_index_size != len(self.local_strategy)
+        ):
+            code_index = self._build_code_index()
+        return code_index.get(code)
+
     """def copy_data_from_device(source_device, dest_device) -> None:
         if hasattr(source_device, "online") and hasattr(dest_device, "online"):
             dest_device.online = source_device.online
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from dataclasses import asdict
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .device import (
+    XTDevice,
+    XTDeviceFunction,
+    XTDeviceStatusRange,
+)
+from ...const import (
+    DOMAIN,
+    LOGGER,  # noqa: F401
+)
+
+SNAPSHOT_STORAGE_VERSION = 1
+
+#These are serialized separately or are too big to be worth persisting
+SNAPSHOT_SPECIFIC_ATTRIBUTES = ("status", "function", "status_range", "local_strategy", "data_model")
+
+class XTDeviceMapSnapshot:
+    """Persist the merged device map so that the next startup doesn't wait on the cloud."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self.store: Store[dict[str, Any]] = Store(hass, SNAPSHOT_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.device_map")
+
+    async def async_load(self) -> tuple[dict[str, XTDevice], dict[str, list[str]]] | None:
+        data = await self.store.async_load()
+        if not data:
+            return None
+        device_map: dict[str, XTDevice] = {}
+        domain_identifiers: dict[str, list[str]] = {}
+        try:
+            for device_id, device_data in data.get("devices", {}).items():
+                device_map[device_id] = XTDeviceMapSnapshot._device_from_dict(device_data)
+                domain_identifiers[device_id] = device_data.get("domain_identifiers", [])
+        except Exception as e:
+            LOGGER.warning(f"Device snapshot could not be restored, ignoring it: {e}")
+            return None
+        return device_map, domain_identifiers
+
+    async def async_save(self, device_map: dict[str, XTDevice], domain_identifiers: dict[str, list[str]]) -> None:
+        devices: dict[str, dict[str, Any]] = {}
+        for device_id, device in device_map.items():
+            try:
+                devices[device_id] = XTDeviceMapSnapshot._device_to_dict(device)
+            except RuntimeError:
+                #The device was updated while being serialized, it will be saved next time
+                return
+            devices[device_id]["domain_identifiers"] = domain_identifiers.get(device_id, [])
+        await self.store.async_save({"devices": devices})
+
+    async def async_remove(self) -> None:
+        """Delete the snapshot, to be called when the config entry is removed."""
+        await self.store.async_remove()
+
+    @staticmethod
+    def _device_to_dict(device: XTDevice) -> dict[str, Any]:
+        attributes: dict[str, Any] = {}
+        for key, value in device.__dict__.items():
+            if key.startswith("_") or key in SNAPSHOT_SPECIFIC_ATTRIBUTES:
+                continue
+            if value is None or isinstance(value, (str, int, float, bool)):
+                attributes[key] = value
+        return {
+            "attributes": attributes,
+            "status": dict(device.status),
+            "function": {code: asdict(function) for code, function in device.function.items()},
+            "status_range": {code: asdict(status_range) for code, status_range in device.status_range.items()},
+            "local_strategy": {str(dp_id): dp_item for dp_id, dp_item in device.local_strategy.items()},
+        }
+
+    @staticmethod
+    def _device_from_dict(data: dict[str, Any]) -> XTDevice:
+        device = XTDevice(**data["attributes"])
+        device.status = data.get("status", {})
+        device.function = {code: XTDeviceFunction(**function) for code, function in data.get("function", {}).items()}
+        device.status_range = {code: XTDeviceStatusRange(**status_range) for code, status_range in data.get("status_range", {}).items()}
+        device.local_strategy = {int(dp_id): dp_item for dp_id, dp_item in data.get("local_strategy", {}).items()}
+        return device
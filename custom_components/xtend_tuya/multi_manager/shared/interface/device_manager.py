@@ -55,6 +55,14 @@ class XTDeviceManagerInterface(ABC):
     ) -> Optional[str]:
         pass
 
+    def get_device_stream_allocation(
+            self, device_id: str, stream_type: Literal["flv", "hls", "rtmp", "rtsp"]
+    ) -> Optional[dict[str, Any]]:
+        #Result of the allocation, the URL along with its expire_time when the API gives it
+        if url := self.get_device_stream_allocate(device_id, stream_type):
+            return {"url": url}
+        return None
+
     def send_lock_unlock_command(
             self, device_id: str, lock: bool
     ) -> bool:
@@ -86,6 +94,14 @@ class XTDeviceManagerInterface(ABC):
     def send_commands(self, device_id: str, commands: list[dict[str, Any]]):
         pass
 
+    async def async_send_commands(self, hass: HomeAssistant, device_id: str, commands: list[dict[str, Any]]):
+        #Accounts without an async client run the blocking call in the executor
+        await hass.async_add_executor_job(self.send_commands, device_id, commands)
+
+    def get_command_codes_to_send(self, device_id: str, commands: list[dict[str, Any]]) -> list[str]:
+        #Codes of the commands that send_commands actually sends to the device
+        return []
+
     def get_devices_from_device_id(self, device_id: str) -> list[XTDevice] | None:
         return_list = []
         device_maps = self.get_available_device_maps()
@@ -106,12 +122,22 @@ class XTDeviceManagerInterface(ABC):
     def call_api(self, method: str, url: str, payload: str) -> str | None:
         pass
 
+    async def async_call_api(self, hass: HomeAssistant, method: str, url: str, payload: str) -> str | None:
+        #Accounts without an async client run the blocking call in the executor
+        return await hass.async_add_executor_job(self.call_api, method, url, payload)
+
+    def get_diagnostics(self) -> dict[str, Any]:
+        return {}
+
     def trigger_scene(self, home_id: str, scene_id: str) -> False:
         return False
     
-    def get_webrtc_sdp_answer(self, device_id: str, session_id: str, sdp_offer: str, channel: str) -> str | None:
+    def get_webrtc_sdp_answer(self, device_id: str, session_id: str, sdp_offer: str, channel: str, trickle: bool = False) -> str | None:
         return None
     
+    async def async_get_webrtc_sdp_answer(self, hass: HomeAssistant, device_id: str, session_id: str, sdp_offer: str, channel: str, trickle: bool = False) -> str | None:
+        return await hass.async_add_executor_job(self.get_webrtc_sdp_answer, device_id, session_id, sdp_offer, channel, trickle)
+    
     def get_webrtc_ice_servers(self, device_id: str, session_id: str, format: str) -> str | None:
         return None
     
@@ -122,4 +148,7 @@ class XTDeviceManagerInterface(ABC):
         return None
     
     def send_webrtc_trickle_ice(self, device_id: str, session_id: str, candidate: str) -> str | None:
+        return None
+    
+    def get_webrtc_trickle_ice(self, session_id: str) -> str | None:
         return None
\ No newline at end of file
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import functools
 import json
-import copy
+from typing import Any
 
 from .device import (
     XTDevice,
@@ -11,15 +12,50 @@ from .device import (
 from .cloud_fix import (
     CloudFixes,
 )
+from .value_descriptor import (
+    XTValueDescriptor,
+)
+from .spec_pool import (
+    XTDeviceSpecPool,
+)
 
 from ...const import (
     LOGGER,  # noqa: F401
+    VALUE_DESCRIPTOR_ALIGNMENT_MEMO_SIZE,
 )
 
+#Paths are built as (parent, separator, key) nodes and only formatted when a conflict is reported
+type XTMergingPath = str | tuple[XTMergingPath, str, Any]
+
+class XTMergingConflict:
+    def __init__(self, path: XTMergingPath, left: Any, right: Any, different_types: bool = False) -> None:
+        self.path = path
+        self.left = left
+        self.right = right
+        self.different_types = different_types
+
+    def __repr__(self) -> str:
+        path = XTMergingConflict.format_path(self.path)
+        if self.different_types:
+            return f"Merging tried to merge objects of different types: {type(self.left)} and {type(self.right)}, returning left ({path})"
+        return f"Merging {type(self.left)} that are different: |{self.left}| <=> |{self.right}|, using left ({path})"
+
+    def format_path(path: XTMergingPath) -> str:
+        segments: list[str] = []
+        while isinstance(path, tuple):
+            path, separator, key = path
+            if separator == "[":
+                segments.append(f"[{key}]")
+            else:
+                segments.append(f"{separator}{key}")
+        return f"{path}" + "".join(reversed(segments))
+
 class XTMergingManager:
     def merge_devices(device1: XTDevice, device2: XTDevice):
-        device1_bak = copy.deepcopy(device1)
-        device2_bak = copy.deepcopy(device2)
+        #The entries are modified in place below
+        XTDeviceSpecPool.unshare(device1)
+        XTDeviceSpecPool.unshare(device2)
+
         #Make both devices compliant
         XTMergingManager._fix_incorrect_valuedescr(device1, device2)
         XTMergingManager._fix_incorrect_valuedescr(device2, device1)
@@ -33,13 +69,13 @@ class XTMergingManager:
         XTMergingManager._align_valuedescr(device1, device2)
 
         #Finally, align and extend both devices
-        msg_queue: list[str] = []
+        msg_queue: list[XTMergingConflict] = []
         device1.status_range = XTMergingManager.smart_merge(device1.status_range, device2.status_range, msg_queue, "status_range")
         device1.function = XTMergingManager.smart_merge(device1.function, device2.function, msg_queue, "function")
         device1.status = XTMergingManager.smart_merge(device1.status, device2.status, None, "status")
         device1.local_strategy = XTMergingManager.smart_merge(device1.local_strategy, device2.local_strategy, msg_queue, "local_strategy")
         if msg_queue:
-            LOGGER.warning(f"Messages for merging of {device1_bak} and {device2_bak}:")
+            LOGGER.warning(f"Messages for merging of {device1.id} ({device1.name}) and {device2.id} ({device2.name}):")
             for msg in msg_queue:
                 LOGGER.warning(msg)
 
@@ -48,6 +84,8 @@ class XTMergingManager:
         device2.function = device1.function
         device2.status = device1.status
         device2.local_strategy = device1.local_strategy
+        device1.invalidate_code_index()
+        device2.invalidate_code_index()
         if device1.data_model:
             device2.data_model = device1.data_model
         elif device2.data_model:
@@ -114,24 +152,14 @@ class XTMergingManager:
     def _align_valuedescr(device1: XTDevice, device2: XTDevice):
         for code in device1.status_range:
             if code in device2.status_range and device1.status_range[code].values != device2.status_range[code].values:
-                value1 = json.loads(device1.status_range[code].values)
-                value2 = json.loads(device2.status_range[code].values)
-                computed_diff = CloudFixes.compute_aligned_valuedescr(value1, value2, None)
-                for fix_code in computed_diff:
-                    value1[fix_code] = computed_diff[fix_code]
-                    value2[fix_code] = computed_diff[fix_code]
-                device1.status_range[code].values = json.dumps(value1)
-                device2.status_range[code].values = json.dumps(value2)
+                value1, value2 = XTMergingManager._get_aligned_valuedescr(device1.status_range[code].values, device2.status_range[code].values)
+                device1.status_range[code].values = value1
+                device2.status_range[code].values = value2
         for code in device1.function:
             if code in device2.function and device1.function[code].values != device2.function[code].values:
-                value1 = json.loads(device1.function[code].values)
-                value2 = json.loads(device2.function[code].values)
-                computed_diff = CloudFixes.compute_aligned_valuedescr(value1, value2, None)
-                for fix_code in computed_diff:
-                    value1[fix_code] = computed_diff[fix_code]
-                    value2[fix_code] = computed_diff[fix_code]
-                device1.function[code].values = json.dumps(value1)
-                device2.function[code].values = json.dumps(value2)
+                value1, value2 = XTMergingManager._get_aligned_valuedescr(device1.function[code].values, device2.function[code].values)
+                device1.function[code].values = value1
+                device2.function[code].values = value2
         for dp_id in device1.local_strategy:
             if dp_id in device2.local_strategy:
                 config_item1 = device1.local_strategy[dp_id].get("config_item")
@@ -139,15 +167,32 @@ class XTMergingManager:
                 if config_item1 is not None and config_item2 is not None:
                     value_descr1 = config_item1.get("valueDesc")
                     value_descr2 = config_item2.get("valueDesc")
-                    if value_descr1 is not None and value_descr2 is not None:
-                        value1 = json.loads(value_descr1)
-                        value2 = json.loads(value_descr2)
-                        computed_diff = CloudFixes.compute_aligned_valuedescr(value1, value2, None)
-                        for fix_code in computed_diff:
-                            value1[fix_code] = computed_diff[fix_code]
-                            value2[fix_code] = computed_diff[fix_code]
-                        config_item1["valueDesc"] = json.dumps(value1)
-                        config_item2["valueDesc"] = json.dumps(value2)
+                    if value_descr1 is not None and value_descr2 is not None and value_descr1 != value_descr2:
+                        config_item1["valueDesc"], config_item2["valueDesc"] = XTMergingManager._get_aligned_valuedescr(value_descr1, value_descr2)
+
+    def _get_aligned_valuedescr(value_descr1: str, value_descr2: str) -> tuple[str, str]:
+        if isinstance(value_descr1, str) and isinstance(value_descr2, str):
+            #Devices of the same product align the same pairs of descriptors
+            return XTMergingManager._get_aligned_valuedescr_memo(value_descr1, value_descr2)
+        return XTMergingManager._compute_aligned_valuedescr(value_descr1, value_descr2)
+
+    def _compute_aligned_valuedescr(value_descr1: str, value_descr2: str) -> tuple[str, str]:
+        value1 = XTValueDescriptor.parse(value_descr1)
+        value2 = XTValueDescriptor.parse(value_descr2)
+        computed_diff = CloudFixes.compute_aligned_valuedescr(value1, value2, None)
+        if not computed_diff:
+            return value_descr1, value_descr2
+        #The descriptors are only dumped again when the alignment changes them
+        if new_value := XTValueDescriptor.with_changes(value1, computed_diff):
+            value_descr1 = new_value
+        if new_value := XTValueDescriptor.with_changes(value2, computed_diff):
+            value_descr2 = new_value
+        return value_descr1, value_descr2
+
+    _get_aligned_valuedescr_memo = functools.lru_cache(maxsize=VALUE_DESCRIPTOR_ALIGNMENT_MEMO_SIZE)(_compute_aligned_valuedescr)
+
+    def clear_memo():
+        XTMergingManager._get_aligned_valuedescr_memo.cache_clear()
 
     def _align_api_usage(device1: XTDevice, device2: XTDevice):
         for dpId in device1.local_strategy:
@@ -242,33 +287,33 @@ class XTMergingManager:
                     else:
                         device2.local_strategy[dpId]["value_convert"] = device1.local_strategy[dpId]["value_convert"]
 
-    def smart_merge(left: any, right: any, msg_queue: list[str] | None = None, path: str = "") -> any:
+    def smart_merge(left: any, right: any, msg_queue: list[XTMergingConflict] | None = None, path: XTMergingPath = "") -> any:
         if left is None or right is None:
             if left is not None:
                 return left
             return right
         if type(left) is not type(right):
             if msg_queue is not None:
-                msg_queue.append(f"Merging tried to merge objects of different types: {type(left)} and {type(right)}, returning left ({path})")
+                msg_queue.append(XTMergingConflict(path, left, right, True))
             return left
         if isinstance(left, XTDeviceStatusRange):
-            left.code = XTMergingManager.smart_merge(left.code, right.code, msg_queue, f"{path}.code")
-            left.type = XTMergingManager.smart_merge(left.type, right.type, msg_queue, f"{path}.type")
-            left.values = XTMergingManager.smart_merge(left.values, right.values, msg_queue, f"{path}.values")
-            left.dp_id = XTMergingManager.smart_merge(left.dp_id, right.dp_id, msg_queue, f"{path}.dp_id")
+            left.code = XTMergingManager.smart_merge(left.code, right.code, msg_queue, (path, ".", "code"))
+            left.type = XTMergingManager.smart_merge(left.type, right.type, msg_queue, (path, ".", "type"))
+            left.values = XTMergingManager.smart_merge(left.values, right.values, msg_queue, (path, ".", "values"))
+            left.dp_id = XTMergingManager.smart_merge(left.dp_id, right.dp_id, msg_queue, (path, ".", "dp_id"))
             return left
         elif isinstance(left, XTDeviceFunction):
-            left.code = XTMergingManager.smart_merge(left.code, right.code, msg_queue, f"{path}.code")
-            left.type = XTMergingManager.smart_merge(left.type, right.type, msg_queue, f"{path}.type")
-            left.desc = XTMergingManager.smart_merge(left.desc, right.desc, msg_queue, f"{path}.desc")
-            left.name = XTMergingManager.smart_merge(left.name, right.name, msg_queue, f"{path}.name")
-            left.values = XTMergingManager.smart_merge(left.values, right.values, msg_queue, f"{path}.values")
-            left.dp_id = XTMergingManager.smart_merge(left.dp_id, right.dp_id, msg_queue, f"{path}.dp_id")
+            left.code = XTMergingManager.smart_merge(left.code, right.code, msg_queue, (path, ".", "code"))
+            left.type = XTMergingManager.smart_merge(left.type, right.type, msg_queue, (path, ".", "type"))
+            left.desc = XTMergingManager.smart_merge(left.desc, right.desc, msg_queue, (path, ".", "desc"))
+            left.name = XTMergingManager.smart_merge(left.name, right.name, msg_queue, (path, ".", "name"))
+            left.values = XTMergingManager.smart_merge(left.values, right.values, msg_queue, (path, ".", "values"))
+            left.dp_id = XTMergingManager.smart_merge(left.dp_id, right.dp_id, msg_queue, (path, ".", "dp_id"))
             return left
         elif isinstance(left, dict):
             for key in left:
                 if key in right:
-                    left[key] = XTMergingManager.smart_merge(left[key], right[key], msg_queue, f"{path}[{key}]")
+                    left[key] = XTMergingManager.smart_merge(left[key], right[key], msg_queue, (path, "[", key))
                     right[key] = left[key]
                 else:
                     right[key] = left[key]
@@ -291,6 +336,11 @@ class XTMergingManager:
         elif isinstance(left, set):
             return left.update(right)
         elif isinstance(left, str):
+            if left == right and left.startswith("{"):
+                #Merging a json object with itself gives it back as dumped by json, only the
+                #value descriptors go through their cache, the other strings would only evict them
+                if (normalized := XTValueDescriptor.normalize(left)) is not None:
+                    return normalized
             #Strings could be strings or represent a json subtree
             try:
                 left_json = json.loads(left)
@@ -301,17 +351,17 @@ class XTMergingManager:
             except Exception:
                 right_json = None
             if left_json is not None and right_json is not None:
-                return json.dumps(XTMergingManager.smart_merge(left_json, right_json, msg_queue, f"{path}.@JS@"))
+                return json.dumps(XTMergingManager.smart_merge(left_json, right_json, msg_queue, (path, ".", "@JS@")))
             elif left_json is not None:
                 return json.dumps(left_json)
             elif right_json is not None:
                 return json.dumps(right_json)
             else:
                 if left != right and msg_queue is not None:
-                    msg_queue.append(f"Merging {type(left)} that are different: |{left}| <=> |{right}|, using left ({path})")
+                    msg_queue.append(XTMergingConflict(path, left, right))
                 return left
         else:
             if left != right and msg_queue is not None:
-                msg_queue.append(f"Merging {type(left)} that are different: |{left}| <=> |{right}|, using left ({path})")
+                msg_queue.append(XTMergingConflict(path, left, right))
             return left
     
\ No newline at end of file
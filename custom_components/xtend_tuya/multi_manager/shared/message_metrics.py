@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from collections import deque
+import threading
+import time
+from typing import Any
+
+#Number of recent messages used to compute the latency percentiles
+MESSAGE_METRICS_WINDOW = 1000
+
+class XTMessageMetricsSample:
+    def __init__(self, metrics: XTMessageMetrics, source: str) -> None:
+        self.metrics = metrics
+        self.source = source
+        self.start_time: float = 0
+
+    def __enter__(self) -> XTMessageMetricsSample:
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.metrics.record(self.source, time.perf_counter() - self.start_time)
+
+class XTMessageMetrics:
+    """Throughput and latency figures of the incoming message path.
+
+    The allocations are measured offline by the benchmarks in tests/benchmarks.
+    """
+
+    def __init__(self, window: int = MESSAGE_METRICS_WINDOW) -> None:
+        self.lock = threading.Lock()
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.message_count: dict[str, int] = {}
+        self.total_latency: float = 0
+        self.first_message_time: float | None = None
+        self.last_message_time: float | None = None
+
+    def measure(self, source: str) -> XTMessageMetricsSample:
+        return XTMessageMetricsSample(self, source)
+
+    def record(self, source: str, latency: float) -> None:
+        now = time.monotonic()
+        with self.lock:
+            if self.first_message_time is None:
+                self.first_message_time = now
+            self.last_message_time = now
+            self.message_count[source] = self.message_count.get(source, 0) + 1
+            self.total_latency += latency
+            self.latencies.append(latency)
+
+    def as_dict(self) -> dict[str, Any]:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            message_count = sum(self.message_count.values())
+            data: dict[str, Any] = {
+                "messages": dict(self.message_count),
+                "throughput_per_second": None,
+                "processing_capacity_per_second": None,
+                "latency_average_ms": None,
+                "latency_p50_ms": None,
+                "latency_p99_ms": None,
+                "latency_max_ms": None,
+            }
+            if message_count > 0:
+                elapsed = self.last_message_time - self.first_message_time
+                if elapsed > 0:
+                    data["throughput_per_second"] = round(message_count / elapsed, 2)
+                data["latency_average_ms"] = round(self.total_latency / message_count * 1000, 3)
+                if self.total_latency > 0:
+                    #How many messages per second the ingest path could process back to back
+                    data["processing_capacity_per_second"] = round(message_count / self.total_latency, 2)
+            if latencies:
+                data["latency_p50_ms"] = round(latencies[int(len(latencies) * 0.50)] * 1000, 3)
+                data["latency_p99_ms"] = round(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000, 3)
+                data["latency_max_ms"] = round(latencies[-1] * 1000, 3)
+            return data
@@ -1,5 +1,4 @@
 from __future__ import annotations
-import copy
 
 from ..multi_manager import MultiManager
 from ...const import LOGGER  # noqa: F401
@@ -71,31 +70,26 @@ class MultiSourceHandler:
                     self._prepare_structure_for_code(dev_id, code)
                     self.device_map[dev_id][code].register_source_message(source)
 
-    def filter_status_list(self, dev_id: str, original_source: str, status_in) -> str:
-        status_list = copy.deepcopy(status_in)
+    def filter_status_list(self, dev_id: str, original_source: str, status_in: list) -> list:
         device = self.multi_manager.device_map.get(dev_id, None)
         if not device:
-            return status_list
+            return status_in
         
         #Only filter for devices that have a VirtualState in their status_list
         virtual_states = self.multi_manager.virtual_state_handler.get_category_virtual_states(device.category)
         if not virtual_states:
-            return status_list
+            return status_in
+        virtual_state_keys = {virtual_state.key for virtual_state in virtual_states}
         
-        i = 0
-        for item in status_list:
-            code, dpId, value, result_ok = self.multi_manager._read_code_dpid_value_from_state(dev_id, item, False, True)
-            if not result_ok:
-                continue
-
-            for virtual_state in virtual_states:
-                if code == virtual_state.key:
-                    self._prepare_structure_for_code(dev_id, code)
-                    if not self._is_allowed_source_for_code(dev_id, code, original_source):
-                        status_list.pop(i)
-                        i -= 1
-                        break
-            i += 1
+        #Items were already annotated with their code by convert_device_report_status_list
+        status_list = []
+        for item in status_in:
+            code = item.get("code")
+            if code in virtual_state_keys:
+                self._prepare_structure_for_code(dev_id, code)
+                if not self._is_allowed_source_for_code(dev_id, code, original_source):
+                    continue
+            status_list.append(item)
         
         return status_list
     
@@ -20,6 +20,7 @@ from ..multi_manager import (
 class XTVirtualFunctionHandler:
     def __init__(self, multi_manager: MultiManager) -> None:
         self.descriptors_with_virtual_function = {}
+        self.category_virtual_functions: dict[str, tuple[DescriptionVirtualFunction, ...]] = {}
         self.multi_manager = multi_manager
     
     def register_device_descriptors(self, name: str, descriptors):
@@ -42,18 +43,23 @@ class XTVirtualFunctionHandler:
 
         if len(descriptors_with_vf) > 0:
             self.descriptors_with_virtual_function[name] = descriptors_with_vf
+            self._compile_category_virtual_functions()
     
-    def get_category_virtual_functions(self,category: str) -> list[DescriptionVirtualFunction]:
-        to_return = []
+    def _compile_category_virtual_functions(self) -> None:
+        #Build the per-category tables once, the lookups are done on every command
+        category_virtual_functions: dict[str, list[DescriptionVirtualFunction]] = {}
         for virtual_function in VirtualFunctions:
             for descriptor in self.descriptors_with_virtual_function.values():
-                if (descriptions := descriptor.get(category)):
+                for category, descriptions in descriptor.items():
                     for description in descriptions:
                         if description.virtual_function is not None and description.virtual_function & virtual_function.value:
                             # This virtual_state is applied to this key, let's return it
                             found_virtual_function = DescriptionVirtualFunction(description.key, virtual_function.name, virtual_function.value, description.vf_reset_state)
-                            to_return.append(found_virtual_function)
-        return to_return
+                            category_virtual_functions.setdefault(category, []).append(found_virtual_function)
+        self.category_virtual_functions = {category: tuple(virtual_functions) for category, virtual_functions in category_virtual_functions.items()}
+
+    def get_category_virtual_functions(self,category: str) -> tuple[DescriptionVirtualFunction, ...]:
+        return self.category_virtual_functions.get(category, ())
     
     def process_virtual_function(self, device_id: str, commands: list[dict[str, Any]]):
         device: XTDevice = self.multi_manager.device_map.get(device_id, None)
@@ -7,6 +7,9 @@ from homeassistant.helpers.entity import EntityDescription
 from .device import (
     XTDevice,
 )
+from .spec_pool import (
+    XTDeviceSpecPool,
+)
 
 from ...const import (
     VirtualStates,
@@ -21,6 +24,7 @@ from ..multi_manager import (
 class XTVirtualStateHandler:
     def __init__(self, multi_manager: MultiManager) -> None:
         self.descriptors_with_virtual_state = {}
+        self.category_virtual_states: dict[str, tuple[DescriptionVirtualState, ...]] = {}
         self.multi_manager = multi_manager
 
     def register_device_descriptors(self, name: str, descriptors):
@@ -42,24 +46,30 @@ class XTVirtualStateHandler:
                     descriptors_with_vs[category] = tuple(description_list_vs)
         if len(descriptors_with_vs) > 0:
             self.descriptors_with_virtual_state[name] = descriptors_with_vs
+            self._compile_category_virtual_states()
             for device in self.multi_manager.device_map.values():
                 self.apply_init_virtual_states(device)
 
-    def get_category_virtual_states(self,category: str) -> list[DescriptionVirtualState]:
-        to_return = []
+    def _compile_category_virtual_states(self) -> None:
+        #Build the per-category tables once, the lookups are done on every report
+        category_virtual_states: dict[str, list[DescriptionVirtualState]] = {}
         for virtual_state in VirtualStates:
             for descriptor in self.descriptors_with_virtual_state.values():
-                if (descriptions := descriptor.get(category)):
+                for category, descriptions in descriptor.items():
                     for description in descriptions:
                         if description.virtual_state is not None and description.virtual_state & virtual_state.value:
                             # This virtual_state is applied to this key, let's return it
                             found_virtual_state = DescriptionVirtualState(description.key, virtual_state.name, virtual_state.value, description.vs_copy_to_state, description.vs_copy_delta_to_state)
-                            to_return.append(found_virtual_state)
-        return to_return
+                            category_virtual_states.setdefault(category, []).append(found_virtual_state)
+        self.category_virtual_states = {category: tuple(virtual_states) for category, virtual_states in category_virtual_states.items()}
+
+    def get_category_virtual_states(self,category: str) -> tuple[DescriptionVirtualState, ...]:
+        return self.category_virtual_states.get(category, ())
 
     def apply_init_virtual_states(self, device: XTDevice):
         #WARNING, this method might be called multiple times for the same device, make sure it doesn't
         #fail upon multiple successive calls
+        #The copies of the shared entries are private ones, the shared entries themselves are left untouched
         virtual_states = self.get_category_virtual_states(device.category)
         for virtual_state in virtual_states:
             if virtual_state.virtual_state_value == VirtualStates.STATE_COPY_TO_MULTIPLE_STATE_NAME:
@@ -69,10 +79,14 @@ class XTVirtualStateHandler:
                             new_code = str(vs_new_code)
                             if device.status.get(new_code, None) is None:
                                 device.status[new_code] = copy.deepcopy(device.status[virtual_state.key])
-                            device.status_range[new_code] = copy.deepcopy(device.status_range[virtual_state.key])
+                            previous_entry = device.status_range.get(new_code)
+                            device.status_range[new_code] = copy.copy(device.status_range[virtual_state.key])
                             device.status_range[new_code].code = new_code
                             device.status_range[new_code].dp_id = None
-                            if not self.multi_manager._read_dpId_from_code(new_code, device):
+                            if new_code_dp_id := self.multi_manager._read_dpId_from_code(new_code, device):
+                                #Already copied by a previous call, keep the dp_id it was given
+                                device.status_range[new_code].dp_id = new_code_dp_id
+                            else:
                                 if dp_id := self.multi_manager._read_dpId_from_code(virtual_state.key, device):
                                     if new_dp_id := self._get_empty_local_strategy_dp_id(device):
                                         new_local_strategy = copy.deepcopy(device.local_strategy[dp_id])
@@ -83,14 +97,19 @@ class XTVirtualStateHandler:
                                         new_local_strategy["status_code"] = new_code
                                         device.local_strategy[new_dp_id] = new_local_strategy
                                         device.status_range[new_code].dp_id = new_dp_id
+                            XTDeviceSpecPool.keep_shared_entry(device.status_range, new_code, previous_entry)
                         for vs_new_code in virtual_state.vs_copy_delta_to_state:
                             new_code = str(vs_new_code)
                             if device.status.get(new_code, None) is None:
                                 device.status[new_code] = 0
-                            device.status_range[new_code] = copy.deepcopy(device.status_range[virtual_state.key])
+                            previous_entry = device.status_range.get(new_code)
+                            device.status_range[new_code] = copy.copy(device.status_range[virtual_state.key])
                             device.status_range[new_code].code = new_code
                             device.status_range[new_code].dp_id = None
-                            if not self.multi_manager._read_dpId_from_code(new_code, device):
+                            if new_code_dp_id := self.multi_manager._read_dpId_from_code(new_code, device):
+                                #Already copied by a previous call, keep the dp_id it was given
+                                device.status_range[new_code].dp_id = new_code_dp_id
+                            else:
                                 if dp_id := self.multi_manager._read_dpId_from_code(virtual_state.key, device):
                                     if new_dp_id := self._get_empty_local_strategy_dp_id(device):
                                         new_local_strategy = copy.deepcopy(device.local_strategy[dp_id])
@@ -101,33 +120,41 @@ class XTVirtualStateHandler:
                                         new_local_strategy["status_code"] = new_code
                                         device.local_strategy[new_dp_id] = new_local_strategy
                                         device.status_range[new_code].dp_id = new_dp_id
+                            XTDeviceSpecPool.keep_shared_entry(device.status_range, new_code, previous_entry)
                     if virtual_state.key in device.function:
                         for vs_new_code in virtual_state.vs_copy_to_state:
                             new_code = str(vs_new_code)
                             if device.status.get(new_code, None) is None:
                                 device.status[new_code] = copy.deepcopy(device.status[virtual_state.key])
-                            device.function[new_code] = copy.deepcopy(device.function[virtual_state.key])
+                            previous_entry = device.function.get(new_code)
+                            device.function[new_code] = copy.copy(device.function[virtual_state.key])
                             device.function[new_code].code = new_code
                             device.function[new_code].dp_id = None
-                            if not self.multi_manager._read_dpId_from_code(new_code, device):
+                            if new_code_dp_id := self.multi_manager._read_dpId_from_code(new_code, device):
+                                #Already copied by a previous call, keep the dp_id it was given
+                                device.function[new_code].dp_id = new_code_dp_id
+                            else:
                                 if dp_id := self.multi_manager._read_dpId_from_code(virtual_state.key, device):
                                     if new_dp_id := self._get_empty_local_strategy_dp_id(device):
                                         new_local_strategy = copy.deepcopy(device.local_strategy[dp_id])
                                         new_local_strategy["status_code"] = new_code
                                         device.local_strategy[new_dp_id] = new_local_strategy
                                         device.function[new_code].dp_id = new_dp_id
+                            XTDeviceSpecPool.keep_shared_entry(device.function, new_code, previous_entry)
+        if isinstance(device, XTDevice):
+            device.invalidate_code_index()
 
-    def apply_virtual_states_to_status_list(self, device: XTDevice, status_in: list) -> list:
-        status = copy.deepcopy(status_in)
+    def apply_virtual_states_to_status_list(self, device: XTDevice, status: list) -> list:
+        #Items were already annotated with their code and dpId by convert_device_report_status_list
         virtual_states = self.get_category_virtual_states(device.category)
         for virtual_state in virtual_states:
             if virtual_state.virtual_state_value == VirtualStates.STATE_COPY_TO_MULTIPLE_STATE_NAME:
-                for item in status:
-                    code, dpId, new_key_value, result_ok = self.multi_manager._read_code_dpid_value_from_state(device.id, item)
-                    if result_ok and code == virtual_state.key:
+                for item in status[:]:
+                    if item.get("dpId") is not None and item.get("code") == virtual_state.key:
+                        new_key_value = item.get("value")
                         cur_key_value = 0
-                        if code in device.status:
-                            cur_key_value = device.status[code]
+                        if virtual_state.key in device.status:
+                            cur_key_value = device.status[virtual_state.key]
                         for state_name in virtual_state.vs_copy_to_state:
                             code, dpId, new_key_value, result_ok = self.multi_manager._read_code_dpid_value_from_state(device.id, {"code": str(state_name), "value": new_key_value})
                             if result_ok:
@@ -147,12 +174,12 @@ class XTVirtualStateHandler:
                     continue
                 if device.status[virtual_state.key] is None:
                     device.status[virtual_state.key] = 0
-                if virtual_state.key in device.status:
-                    for item in status:
-                        code, dpId, new_key_value, result_ok = self.multi_manager._read_code_dpid_value_from_state(device.id, item, False, True)
-                        if result_ok and code == virtual_state.key:
-                            item["value"] += device.status[virtual_state.key]
-                            continue
+                for index, item in enumerate(status):
+                    if item.get("code") == virtual_state.key:
+                        #The caller may hold the item, don't modify it
+                        new_item = dict(item)
+                        new_item["value"] += device.status[virtual_state.key]
+                        status[index] = new_item
         return status
     
     def _get_empty_local_strategy_dp_id(self, device: XTDevice) -> int | None:
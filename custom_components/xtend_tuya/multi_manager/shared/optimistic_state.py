@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import threading
+from typing import Any
+
+from .device import (
+    XTDevice,
+)
+from ..multi_manager import (
+    MultiManager,
+)
+from ...const import (
+    OPTIMISTIC_STATE_TIMEOUT,
+    LOGGER,  # noqa: F401
+)
+
+class XTOptimisticState:
+    def __init__(self, value: Any, previous_status: dict[str, Any], generation: int) -> None:
+        self.value = value
+        self.previous_status = previous_status
+        self.generation = generation
+
+class XTOptimisticStateHandler:
+    """Apply the commanded values to the device status before the cloud confirms them.
+
+    Only the DPs that the device reports get an optimistic value, it is kept until a report
+    of the same code arrives and rolled back if no report came within the timeout.
+    """
+
+    def __init__(self, multi_manager: MultiManager, timeout: float = OPTIMISTIC_STATE_TIMEOUT) -> None:
+        self.multi_manager = multi_manager
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pending: dict[str, dict[str, XTOptimisticState]] = {}
+        self.generation: int = 0
+        self.confirmed_count: int = 0
+        self.rolled_back_count: int = 0
+
+    def apply_commands(self, device: XTDevice, commands: list[dict[str, Any]]) -> None:
+        updated_codes: list[str] = []
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            device_pending = self.pending.setdefault(device.id, {})
+            for command in commands:
+                code, dpId, value, result_ok = self.multi_manager._read_code_dpid_value_from_state(device.id, command)
+                if not result_ok or code not in device.status or not self._is_reported(device, code, dpId):
+                    continue
+                #The aliases can represent the value differently, the report updates them
+                if code in device_pending:
+                    #Keep the status from before the first unconfirmed command
+                    previous_status = device_pending[code].previous_status
+                else:
+                    previous_status = {code: device.status[code]}
+                device_pending[code] = XTOptimisticState(value, previous_status, generation)
+                device.status[code] = value
+                updated_codes.append(code)
+            if not device_pending:
+                self.pending.pop(device.id, None)
+        if updated_codes:
+            self.multi_manager.multi_device_listener.update_device(device, updated_codes)
+            hass = self.multi_manager.hass
+            hass.loop.call_soon_threadsafe(hass.loop.call_later, self.timeout, self._async_on_timeout, device.id, generation)
+
+    def _is_reported(self, device: XTDevice, code: str, dpId: int) -> bool:
+        #A DP that the device doesn't report would be rolled back even though the command succeeded
+        if device.status_range and code not in device.status_range:
+            return False
+        if dp_item := device.local_strategy.get(dpId):
+            if dp_item.get("property_update", False) or dp_item.get("access_mode") == "wr":
+                return False
+        return True
+
+    def on_device_report(self, device: XTDevice, status: list[dict[str, Any]]) -> None:
+        if device.id not in self.pending:
+            return
+        with self.lock:
+            if (device_pending := self.pending.get(device.id)) is None:
+                return
+            for item in status:
+                #The reported value replaces the optimistic one
+                if device_pending.pop(item.get("code"), None) is not None:
+                    self.confirmed_count += 1
+            if not device_pending:
+                self.pending.pop(device.id, None)
+
+    def _async_on_timeout(self, device_id: str, generation: int) -> None:
+        self.multi_manager.hass.async_add_executor_job(self._rollback, device_id, generation)
+
+    def _rollback(self, device_id: str, generation: int) -> None:
+        if (device := self.multi_manager.device_map.get(device_id)) is None:
+            return
+        updated_codes: list[str] = []
+        with self.lock:
+            if (device_pending := self.pending.get(device_id)) is None:
+                return
+            for code, optimistic_state in list(device_pending.items()):
+                #Newer commands have their own timeout
+                if optimistic_state.generation != generation:
+                    continue
+                del device_pending[code]
+                self.rolled_back_count += 1
+                for status_code, previous_value in optimistic_state.previous_status.items():
+                    if device.status.get(status_code) == optimistic_state.value:
+                        device.status[status_code] = previous_value
+                        updated_codes.append(status_code)
+            if not device_pending:
+                self.pending.pop(device_id, None)
+        if updated_codes:
+            LOGGER.debug(f"Device {device_id} didn't confirm {updated_codes} in time, rolling back")
+            self.multi_manager.multi_device_listener.update_device(device, updated_codes)
+
+    def get_metrics(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "pending": sum(len(device_pending) for device_pending in self.pending.values()),
+                "confirmed": self.confirmed_count,
+                "rolled_back": self.rolled_back_count,
+            }
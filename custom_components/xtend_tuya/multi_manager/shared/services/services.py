@@ -34,6 +34,7 @@ CONF_PAYLOAD = "payload"
 CONF_SESSION_ID = "session_id"
 CONF_FORMAT = "format"
 CONF_CHANNEL = "channel"
+CONF_TRICKLE = "trickle"
 
 SERVICE_GET_CAMERA_STREAM_URL = "get_camera_stream_url"
 SERVICE_GET_CAMERA_STREAM_URL_SCHEMA = vol.Schema(
@@ -71,6 +72,7 @@ SERVICE_WEBRTC_SDP_EXCHANGE_SCHEMA = vol.Schema(
         vol.Required(CONF_SESSION_ID): cv.string,
         vol.Optional(CONF_SOURCE): cv.string,
         vol.Optional(CONF_CHANNEL): cv.string,
+        vol.Optional(CONF_TRICKLE): cv.boolean,
     }
 )
 
@@ -156,8 +158,8 @@ class ServiceManager:
         if not source or not device_id:
             return None
         if multi_manager := self._get_correct_multi_manager(source, device_id):
-            if account := multi_manager.get_account_by_name(source):
-                response = await self.hass.async_add_executor_job(account.get_device_stream_allocate, device_id, stream_type)
+            if multi_manager.get_account_by_name(source):
+                response = await multi_manager.async_get_device_stream_allocate(device_id, stream_type, source)
                 return response
         return None
     
@@ -168,7 +170,7 @@ class ServiceManager:
         payload = event.data.get(CONF_PAYLOAD, None)
         if account := self.multi_manager.get_account_by_name(source):
             try:
-                if response := await self.hass.async_add_executor_job(account.call_api, method, url, payload):
+                if response := await account.async_call_api(self.hass, method, url, payload):
                     LOGGER.warning(f"API call response: {response}")
                     return response
             except Exception as e:
@@ -207,6 +209,11 @@ class ServiceManager:
         device_id   = event.data.get(CONF_DEVICE_ID, None)
         session_id  = event.data.get(CONF_SESSION_ID, None)
         channel     = event.data.get(CONF_CHANNEL, None)
+        try:
+            #Query parameters are not validated by the schema, they come as strings
+            trickle = cv.boolean(event.data.get(CONF_TRICKLE, False))
+        except vol.Invalid:
+            trickle = False
         #LOGGER.warning(f"DEBUG SDP CALL: {event}")
         if device_id is None or session_id is None:
             return None
@@ -218,7 +225,7 @@ class ServiceManager:
                 match event.content_type:
                     case "application/sdp":
                         if account := multi_manager.get_account_by_name(source):
-                            sdp_answer = await self.hass.async_add_executor_job(account.get_webrtc_sdp_answer, device_id, session_id, event.payload, channel)
+                            sdp_answer = await account.async_get_webrtc_sdp_answer(self.hass, device_id, session_id, event.payload, channel, trickle)
                             if sdp_answer is not None:
                                 response = web.Response(status=201, text=sdp_answer, content_type="application/sdp", charset="utf-8")
                                 response.headers["ETag"] = session_id
@@ -236,6 +243,16 @@ class ServiceManager:
                                 response.headers["ETag"] = session_id
                                 return response
                         return None
+            case "GET":
+                #Trickle mode only: the answer candidates received after the SDP answer was returned are only
+                #available through this call, the client has to poll it until it gets a=end-of-candidates
+                if account := multi_manager.get_account_by_name(source):
+                    trickle_answer = await self.hass.async_add_executor_job(account.get_webrtc_trickle_ice, session_id)
+                    if trickle_answer is not None:
+                        response = web.Response(status=200, text=trickle_answer, content_type="application/trickle-ice-sdpfrag", charset="utf-8")
+                        response.headers["ETag"] = session_id
+                        return response
+                return None
             case "DELETE":
                 if account := multi_manager.get_account_by_name(source):
                     delete_answer = await self.hass.async_add_executor_job(account.delete_webrtc_session, device_id, session_id)
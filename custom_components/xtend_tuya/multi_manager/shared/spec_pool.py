@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+import copy
+from dataclasses import dataclass
+import threading
+from typing import Any
+
+from .device import (
+    XTDevice,
+    XTDeviceFunction,
+    XTDeviceStatusRange,
+)
+from ...const import (
+    LOGGER,  # noqa: F401
+)
+
+def _raise_shared_entry_modified(entry: Any, *args, **kwargs):
+    #A missed unshare() would silently modify the entries of all the devices of the product
+    raise TypeError(f"{type(entry).__name__} is shared between devices, call XTDeviceSpecPool.unshare() first")
+
+class XTSharedEntry:
+    #Frozen once built by the dataclass __init__, the copies are regular private entries
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_is_frozen", True)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if getattr(self, "_is_frozen", False):
+            _raise_shared_entry_modified(self)
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name: str) -> None:
+        _raise_shared_entry_modified(self)
+
+    def __copy__(self):
+        return self.get_private_copy()
+
+    def __deepcopy__(self, memo: dict):
+        return self.get_private_copy()
+
+@dataclass(eq=False, repr=False)
+class XTSharedDeviceStatusRange(XTSharedEntry, XTDeviceStatusRange):
+    def get_private_copy(self) -> XTDeviceStatusRange:
+        return XTDeviceStatusRange(code=self.code, type=self.type, values=self.values, dp_id=self.dp_id)
+
+@dataclass(eq=False, repr=False)
+class XTSharedDeviceFunction(XTSharedEntry, XTDeviceFunction):
+    def get_private_copy(self) -> XTDeviceFunction:
+        return XTDeviceFunction(code=self.code, type=self.type, desc=self.desc, name=self.name, values=copy.deepcopy(self.values), dp_id=self.dp_id)
+
+class XTSharedLocalStrategy(dict):
+    #The nested dicts are shared too, built with dict.__init__ which doesn't go through __setitem__
+    __setitem__ = _raise_shared_entry_modified
+    __delitem__ = _raise_shared_entry_modified
+    __ior__ = _raise_shared_entry_modified
+    clear = _raise_shared_entry_modified
+    pop = _raise_shared_entry_modified
+    popitem = _raise_shared_entry_modified
+    setdefault = _raise_shared_entry_modified
+    update = _raise_shared_entry_modified
+
+    def __copy__(self) -> dict[str, Any]:
+        return copy.deepcopy(self)
+
+    def __deepcopy__(self, memo: dict) -> dict[str, Any]:
+        return {key: copy.deepcopy(item, memo) for key, item in self.items()}
+
+class XTDeviceSpecPool:
+    """Function, status range and local strategy entries shared between the devices of the same product.
+
+    The shared entries have their own read-only types, modifying them raises a TypeError: whatever
+    modifies the entries of a device in place calls unshare() or make_writable() first so that the
+    device gets its own copies back (copy-on-write), copy.copy() and copy.deepcopy() of a shared
+    entry also give a private one. Only the entries are shared, the dicts holding them stay per device as
+    they are linked between the accounts by the merge and get new codes from the virtual states.
+    The pool only lives for one share_devices() call, the devices hold the shared entries.
+    """
+
+    lock = threading.Lock()
+    shared_entry_count: int = 0
+    shared_count: int = 0
+    copy_count: int = 0
+
+    def share_devices(devices: Iterable[XTDevice]) -> None:
+        pool: dict[tuple, Any] = {}
+        shared_count = 0
+        for device in devices:
+            product_id = getattr(device, "product_id", None)
+            if product_id is None:
+                continue
+            for code, status_range in device.status_range.items():
+                if isinstance(status_range, XTDeviceStatusRange):
+                    key = (
+                        product_id,
+                        "status_range",
+                        code,
+                        XTDeviceSpecPool._get_key(status_range.type),
+                        XTDeviceSpecPool._get_key(status_range.values),
+                        XTDeviceSpecPool._get_key(status_range.dp_id),
+                    )
+                    if (shared_entry := pool.get(key)) is None:
+                        shared_entry = pool[key] = XTDeviceSpecPool._get_shared_status_range(status_range)
+                    else:
+                        shared_count += 1
+                    if shared_entry is not status_range:
+                        device.status_range[code] = shared_entry
+            for code, function in device.function.items():
+                if isinstance(function, XTDeviceFunction):
+                    key = (
+                        product_id,
+                        "function",
+                        code,
+                        XTDeviceSpecPool._get_key(function.type),
+                        XTDeviceSpecPool._get_key(function.desc),
+                        XTDeviceSpecPool._get_key(function.name),
+                        XTDeviceSpecPool._get_key(function.values),
+                        XTDeviceSpecPool._get_key(function.dp_id),
+                    )
+                    if (shared_entry := pool.get(key)) is None:
+                        shared_entry = pool[key] = XTDeviceSpecPool._get_shared_function(function)
+                    else:
+                        shared_count += 1
+                    if shared_entry is not function:
+                        device.function[code] = shared_entry
+            for dp_id, dp_item in device.local_strategy.items():
+                if isinstance(dp_item, dict):
+                    key = (product_id, "local_strategy", dp_id, XTDeviceSpecPool._get_key(dp_item))
+                    if (shared_entry := pool.get(key)) is None:
+                        shared_entry = pool[key] = XTDeviceSpecPool._get_shared_local_strategy(dp_item)
+                    else:
+                        shared_count += 1
+                    if shared_entry is not dp_item:
+                        device.local_strategy[dp_id] = shared_entry
+        with XTDeviceSpecPool.lock:
+            XTDeviceSpecPool.shared_entry_count = len(pool)
+            XTDeviceSpecPool.shared_count += shared_count
+
+    def _get_shared_status_range(status_range: XTDeviceStatusRange) -> XTSharedDeviceStatusRange:
+        if isinstance(status_range, XTSharedDeviceStatusRange):
+            return status_range
+        return XTSharedDeviceStatusRange(code=status_range.code, type=status_range.type, values=status_range.values, dp_id=status_range.dp_id)
+
+    def _get_shared_function(function: XTDeviceFunction) -> XTSharedDeviceFunction:
+        if isinstance(function, XTSharedDeviceFunction):
+            return function
+        return XTSharedDeviceFunction(code=function.code, type=function.type, desc=function.desc, name=function.name, values=function.values, dp_id=function.dp_id)
+
+    def _get_shared_local_strategy(dp_item: dict[str, Any]) -> XTSharedLocalStrategy:
+        if isinstance(dp_item, XTSharedLocalStrategy):
+            return dp_item
+        return XTSharedLocalStrategy(
+            (key, XTDeviceSpecPool._get_shared_local_strategy(item) if isinstance(item, dict) else item) for key, item in dp_item.items()
+        )
+
+    def is_shared(entry: Any) -> bool:
+        return isinstance(entry, (XTSharedEntry, XTSharedLocalStrategy))
+
+    def _get_key(value: Any) -> Any:
+        #True == 1 == 1.0, keep the type so that they don't end up sharing the same entry
+        if value is None or isinstance(value, str):
+            return value
+        if isinstance(value, dict):
+            return tuple((key, XTDeviceSpecPool._get_key(item)) for key, item in value.items())
+        if isinstance(value, (list, tuple)):
+            return (type(value).__name__, tuple(XTDeviceSpecPool._get_key(item) for item in value))
+        if isinstance(value, (int, float)):
+            return (type(value).__name__, value)
+        return (type(value).__name__, repr(value))
+
+    def unshare(device: Any) -> None:
+        """To be called before modifying the function, status range or local strategy entries of the device."""
+        for entries in (getattr(device, "status_range", {}), getattr(device, "function", {}), getattr(device, "local_strategy", {})):
+            for key in list(entries):
+                XTDeviceSpecPool.make_writable(entries, key)
+
+    def make_writable(entries: dict, key: Any) -> bool:
+        """Give the device its own copy of a single entry before modifying it, return True if it was shared."""
+        if not XTDeviceSpecPool.is_shared(entry := entries.get(key)):
+            return False
+        entries[key] = copy.copy(entry)
+        with XTDeviceSpecPool.lock:
+            XTDeviceSpecPool.copy_count += 1
+        return True
+
+    def keep_shared_entry(entries: dict, key: Any, previous_entry: Any) -> None:
+        """Put back a shared entry that was replaced by an identical private copy, the device keeps sharing it."""
+        if not XTDeviceSpecPool.is_shared(previous_entry) or (entry := entries.get(key)) is None:
+            return
+        private_copy = copy.copy(previous_entry)
+        if type(entry) is type(private_copy) and XTDeviceSpecPool._get_entry_key(entry) == XTDeviceSpecPool._get_entry_key(private_copy):
+            entries[key] = previous_entry
+
+    def _get_entry_key(entry: Any) -> Any:
+        return XTDeviceSpecPool._get_key(entry if isinstance(entry, dict) else vars(entry))
+
+    def get_metrics() -> dict[str, Any]:
+        with XTDeviceSpecPool.lock:
+            return {
+                "shared_entries": XTDeviceSpecPool.shared_entry_count,
+                "deduplicated": XTDeviceSpecPool.shared_count,
+                "copied_on_write": XTDeviceSpecPool.copy_count,
+            }
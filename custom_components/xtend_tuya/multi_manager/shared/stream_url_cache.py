@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from functools import partial
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from ...const import (
+    DOMAIN,
+    LOGGER,  # noqa: F401
+    STREAM_URL_CACHE_TTL,
+    STREAM_URL_REFRESH_MARGIN,
+)
+
+class XTStreamURL:
+    def __init__(self, url: str, expires_at: float) -> None:
+        self.url = url
+        self.expires_at = expires_at
+
+class XTStreamURLCache:
+    """Allocated stream URLs per device and stream type, allocated again before they expire.
+
+    The expiration is the expire_time returned by the allocation, or the TTL when the
+    allocation didn't return one. All the methods are called from the event loop.
+    """
+
+    def __init__(
+            self,
+            hass: HomeAssistant,
+            allocate: Callable[[str, str, str | None], dict[str, Any] | None],
+            ttl: float = STREAM_URL_CACHE_TTL,
+            refresh_margin: float = STREAM_URL_REFRESH_MARGIN,
+    ) -> None:
+        self.hass = hass
+        self.allocate = allocate
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.urls: dict[tuple[str, str, str | None], XTStreamURL] = {}
+        self.pending: dict[tuple[str, str, str | None], asyncio.Future] = {}
+        self.hit_count: int = 0
+        self.miss_count: int = 0
+        self.allocation_count: int = 0
+
+    async def async_get(self, device_id: str, stream_type: str, source: str | None = None) -> str | None:
+        key = (device_id, stream_type, source)
+        now = time.monotonic()
+        stream_url = self.urls.get(key)
+        if stream_url is not None and stream_url.expires_at > now:
+            self.hit_count += 1
+            if stream_url.expires_at - now < self.refresh_margin and key not in self.pending:
+                self.hass.async_create_background_task(self._async_refresh(key), f"{DOMAIN} stream URL refresh of {device_id}")
+            return stream_url.url
+        self.miss_count += 1
+        return await self._async_allocate(key)
+
+    async def _async_allocate(self, key: tuple[str, str, str | None]) -> str | None:
+        #Concurrent callers share the same allocation
+        future = self.pending.get(key)
+        if future is None:
+            future = self.hass.async_add_executor_job(self.allocate, *key)
+            self.pending[key] = future
+            self.allocation_count += 1
+            future.add_done_callback(partial(self._on_allocated, key))
+        if allocation := await asyncio.shield(future):
+            return allocation.get("url")
+        return None
+
+    async def _async_refresh(self, key: tuple[str, str, str | None]) -> None:
+        try:
+            await self._async_allocate(key)
+        except Exception as e:
+            #The URL will be allocated again on the next call once it expired
+            LOGGER.debug(f"Stream URL of {key[0]} could not be refreshed: {e}")
+
+    def _on_allocated(self, key: tuple[str, str, str | None], future: asyncio.Future) -> None:
+        self.pending.pop(key, None)
+        if future.cancelled() or future.exception() is not None or not future.result() or not future.result().get("url"):
+            self.urls.pop(key, None)
+            return
+        allocation: dict[str, Any] = future.result()
+        self.urls[key] = XTStreamURL(allocation["url"], self._get_expiration(allocation.get("expire_time")))
+
+    def _get_expiration(self, expire_time: Any) -> float:
+        now = time.monotonic()
+        try:
+            expire_time = float(expire_time)
+        except (TypeError, ValueError):
+            return now + self.ttl
+        if expire_time > 1e12:
+            #Timestamp in milliseconds
+            return now + expire_time / 1000 - time.time()
+        if expire_time > 1e9:
+            #Timestamp in seconds
+            return now + expire_time - time.time()
+        #Validity period in seconds
+        return now + expire_time
+
+    def invalidate(self, device_id: str) -> None:
+        for key in [key for key in self.urls if key[0] == device_id]:
+            self.urls.pop(key, None)
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "cached_urls": len(self.urls),
+            "hits": self.hit_count,
+            "misses": self.miss_count,
+            "allocations": self.allocation_count,
+        }
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+import json
+import threading
+from typing import Any
+
+from ...const import (
+    VALUE_DESCRIPTOR_CACHE_SIZE,
+)
+
+class XTValueDescriptorEntry:
+    def __init__(self, parsed: dict[str, Any] | None) -> None:
+        self.parsed = parsed
+        self.normalized: str | None = None
+
+class XTValueDescriptor:
+    """Parsed form of the JSON value descriptors of the DPs (values and valueDesc).
+
+    The SDK and the entities read the value descriptors as JSON strings, so the strings
+    stay the reference and their parsed form is kept per string. The parsed dicts are
+    shared between all the users of the same string and must not be modified: copy,
+    change the copy and turn it back into a string with dump().
+    """
+
+    lock = threading.Lock()
+    cache: OrderedDict[str, XTValueDescriptorEntry] = OrderedDict()
+
+    def parse(value_descr: Any) -> dict[str, Any] | None:
+        """Return the parsed value descriptor, None if it isn't a JSON object."""
+        if isinstance(value_descr, dict):
+            return value_descr
+        if not isinstance(value_descr, str):
+            return None
+        return XTValueDescriptor._get_entry(value_descr).parsed
+
+    def dump(value: dict[str, Any]) -> str:
+        value_descr = json.dumps(value)
+        #The dumped string will be read again, keep its parsed form
+        XTValueDescriptor._store_entry(value_descr, XTValueDescriptorEntry(value))
+        return value_descr
+
+    def normalize(value_descr: str) -> str | None:
+        """Return the value descriptor as dumped by json, None if it isn't a JSON object."""
+        entry = XTValueDescriptor._get_entry(value_descr)
+        if entry.parsed is None:
+            return None
+        if entry.normalized is None:
+            entry.normalized = json.dumps(entry.parsed)
+        return entry.normalized
+
+    def clear_cache():
+        with XTValueDescriptor.lock:
+            XTValueDescriptor.cache.clear()
+
+    def _get_entry(value_descr: str) -> XTValueDescriptorEntry:
+        with XTValueDescriptor.lock:
+            if entry := XTValueDescriptor.cache.get(value_descr):
+                XTValueDescriptor.cache.move_to_end(value_descr)
+                return entry
+        try:
+            parsed = json.loads(value_descr)
+        except Exception:
+            parsed = None
+        if not isinstance(parsed, dict):
+            parsed = None
+        entry = XTValueDescriptorEntry(parsed)
+        XTValueDescriptor._store_entry(value_descr, entry)
+        return entry
+
+    def _store_entry(value_descr: str, entry: XTValueDescriptorEntry) -> None:
+        with XTValueDescriptor.lock:
+            XTValueDescriptor.cache[value_descr] = entry
+            XTValueDescriptor.cache.move_to_end(value_descr)
+            while len(XTValueDescriptor.cache) > VALUE_DESCRIPTOR_CACHE_SIZE:
+                XTValueDescriptor.cache.popitem(last=False)
+
+    def with_changes(value: dict[str, Any] | None, changes: dict[str, Any]) -> str | None:
+        """Return the JSON of value with the changes applied, None if they don't change it."""
+        if not value:
+            return None
+        for key, new_value in changes.items():
+            if key not in value or value[key] != new_value:
+                break
+        else:
+            return None
+        new_value_descr = dict(value)
+        new_value_descr.update(changes)
+        return XTValueDescriptor.dump(new_value_descr)
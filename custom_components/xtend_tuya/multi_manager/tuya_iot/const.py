@@ -8,4 +8,51 @@ CONF_ACCESS_SECRET = "access_secret"
 CONF_USERNAME = "username"
 CONF_PASSWORD = "password"
 CONF_COUNTRY_CODE = "country_code"
-CONF_APP_TYPE = "tuya_app_type"
\ No newline at end of file
+CONF_APP_TYPE = "tuya_app_type"
+
+#Maximum number of OpenAPI requests in flight when fetching the devices at startup,
+#keep it low enough to stay under the Tuya cloud rate limits
+IOT_DEVICE_FETCH_MAX_WORKERS = 8
+#Size of the HTTP connection pool shared by the OpenAPI requests
+IOT_API_CONNECTION_POOL_SIZE = 10
+#Timeout in seconds of the OpenAPI requests made through the async client
+IOT_API_REQUEST_TIMEOUT = 30
+#Seconds before the token expiration at which it is refreshed
+IOT_API_TOKEN_REFRESH_MARGIN = 300
+#Client side budgets of the OpenAPI requests per class of endpoint: (requests per second, burst)
+IOT_API_RATE_LIMITS: dict[str, tuple[float, float]] = {
+    "model": (5, 10),
+    "shadow": (10, 20),
+    "command": (10, 10),
+    "ipc": (5, 10),
+    "default": (10, 20),
+}
+#Exponential backoff in seconds applied when the cloud throttles the requests
+IOT_API_BACKOFF_BASE = 1
+IOT_API_BACKOFF_MAX = 60
+#Number of times a throttled request is retried
+IOT_API_MAX_RETRIES = 3
+#Seconds during which property updates of a device are merged into one request, 0 disables it
+IOT_PROPERTY_UPDATE_COALESCING_WINDOW = 0
+#Categories of the locks operated through the door-lock OpenAPI
+IOT_LOCK_CATEGORIES = ("mk", "jtmspro")
+#Seconds during which the remote unlock types of a lock are reused
+IOT_LOCK_UNLOCK_TYPES_TTL = 86400
+#Seconds before the expiration of a lock ticket at which it isn't used anymore
+IOT_LOCK_TICKET_EXPIRATION_MARGIN = 30
+#Seconds to wait for the broker to acknowledge the messages published to the IPC MQTT
+IOT_IPC_PUBLISH_TIMEOUT = 10
+#Log the payloads published to the IPC MQTT at debug level (developer setting, not exposed in the options)
+IOT_IPC_LOG_PUBLISH_PAYLOADS = False
+#Categories of the cameras whose WebRTC configuration is fetched at startup
+IOT_WEBRTC_CATEGORIES = ("sp",)
+#Seconds during which the WebRTC configuration of a device is reused
+IOT_WEBRTC_CONFIG_TTL = 600
+#Seconds before the expiration at which the WebRTC configuration is refreshed in the background
+IOT_WEBRTC_CONFIG_REFRESH_MARGIN = 60
+#Seconds after the last stream of a device during which its WebRTC configuration keeps being refreshed
+IOT_WEBRTC_CONFIG_KEEP_WARM_PERIOD = 1800
+#Seconds during which a WebRTC session is kept
+IOT_WEBRTC_SESSION_TTL = 600
+#Maximum number of WebRTC sessions kept, the least recently used ones are dropped first
+IOT_WEBRTC_MAX_SESSIONS = 200
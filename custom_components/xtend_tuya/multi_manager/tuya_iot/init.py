@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import aiohttp
 import requests
 import json
 from typing import Optional, Literal, Any, overload
@@ -7,6 +8,7 @@ from typing import Optional, Literal, Any, overload
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
 from tuya_iot import (
     AuthType,
@@ -52,6 +54,9 @@ from .xt_tuya_iot_mq import (
 from .xt_tuya_iot_home_manager import (
     XTIOTHomeManager,
 )
+from .xt_tuya_iot_model_cache import (
+    XTIOTModelCache,
+)
 from ..multi_manager import (
     MultiManager,
 )
@@ -104,27 +109,32 @@ class XTTuyaIOTDeviceManagerInterface(XTDeviceManagerInterface):
             auth_type=auth_type,
         )
         api.set_dev_channel("hass")
+        api.set_client_session(async_get_clientsession(hass))
         try:
             if auth_type == AuthType.CUSTOM:
-                response = await hass.async_add_executor_job(
-                    api.connect, config_entry.options[CONF_USERNAME], config_entry.options[CONF_PASSWORD]
+                response = await api.async_connect(
+                    config_entry.options[CONF_USERNAME], config_entry.options[CONF_PASSWORD]
                 )
             else:
-                response = await hass.async_add_executor_job(
-                    api.connect,
+                response = await api.async_connect(
                     config_entry.options[CONF_USERNAME],
                     config_entry.options[CONF_PASSWORD],
                     config_entry.options[CONF_COUNTRY_CODE],
                     config_entry.options[CONF_APP_TYPE],
                 )
-        except requests.exceptions.RequestException as err:
+        except (aiohttp.ClientError, TimeoutError, requests.exceptions.RequestException) as err:
             raise ConfigEntryNotReady(err) from err
 
+        if response is None:
+            raise ConfigEntryNotReady("No response from the Tuya cloud")
+
         if response.get("success", False) is False:
             raise ConfigEntryNotReady(response)
         mq = XTIOTOpenMQ(api)
         mq.start()
-        device_manager = XTIOTDeviceManager(self.multi_manager, api, mq)
+        model_cache = XTIOTModelCache(hass, api, XTIOTModelCache.get_storage_key(config_entry.entry_id))
+        await model_cache.async_load()
+        device_manager = XTIOTDeviceManager(self.multi_manager, api, mq, model_cache)
         device_ids: list[str] = list()
         home_manager = XTIOTHomeManager(api, mq, device_manager, self.multi_manager)
         device_manager.add_device_listener(self.multi_manager.multi_device_listener)
@@ -148,9 +158,12 @@ class XTTuyaIOTDeviceManagerInterface(XTDeviceManagerInterface):
     
     def remove_device_listeners(self) -> None:
         self.iot_account.device_manager.remove_device_listener(self.multi_manager.multi_device_listener)
+        #Called on unload, the refresh timers must not outlive this API client
+        self.iot_account.device_manager.ipc_manager.webrtc_manager.config_cache.stop()
     
     def unload(self):
-        pass
+        if self.iot_account:
+            self.iot_account.device_manager.ipc_manager.webrtc_manager.config_cache.stop()
     
     def on_message(self, msg: str):
         self.iot_account.device_manager.on_message(msg)
@@ -165,6 +178,12 @@ class XTTuyaIOTDeviceManagerInterface(XTDeviceManagerInterface):
     ) -> Optional[str]:
         if device_id in self.iot_account.device_ids:
             return self.iot_account.device_manager.get_device_stream_allocate(device_id, stream_type)
+
+    def get_device_stream_allocation(
+            self, device_id: str, stream_type: Literal["flv", "hls", "rtmp", "rtsp"]
+    ) -> Optional[dict[str, Any]]:
+        if device_id in self.iot_account.device_ids:
+            return self.iot_account.device_manager.get_device_stream_allocation(device_id, stream_type)
     
     def get_device_registry_identifiers(self) -> list:
         return [DOMAIN]
@@ -197,6 +216,32 @@ class XTTuyaIOTDeviceManagerInterface(XTDeviceManagerInterface):
         pass
     
     def send_commands(self, device_id: str, commands: list[dict[str, Any]]):
+        open_api_regular_commands, property_commands = self._split_commands(device_id, commands)
+        if open_api_regular_commands:
+            LOGGER.debug(f"Sending Open API regular command : {open_api_regular_commands}")
+            self.iot_account.device_manager.send_commands(device_id, open_api_regular_commands)
+        if property_commands:
+            LOGGER.debug(f"Sending property command : {property_commands}")
+            self.iot_account.device_manager.send_property_update(device_id, property_commands)
+
+    async def async_send_commands(self, hass: HomeAssistant, device_id: str, commands: list[dict[str, Any]]):
+        open_api_regular_commands, property_commands = self._split_commands(device_id, commands)
+        if open_api_regular_commands:
+            LOGGER.debug(f"Sending Open API regular command : {open_api_regular_commands}")
+            await self.iot_account.device_manager.async_send_commands(device_id, open_api_regular_commands)
+        if property_commands:
+            LOGGER.debug(f"Sending property command : {property_commands}")
+            await self.iot_account.device_manager.async_send_property_update(device_id, property_commands)
+
+    def get_command_codes_to_send(self, device_id: str, commands: list[dict[str, Any]]) -> list[str]:
+        open_api_regular_commands, property_commands = self._split_commands(device_id, commands)
+        command_codes = [command["code"] for command in open_api_regular_commands]
+        for property_dict in property_commands:
+            command_codes.extend(property_dict)
+        return command_codes
+
+    def _split_commands(self, device_id: str, commands: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        #Returns the regular commands and the property updates that go through the Open API
         open_api_regular_commands: list[dict[str, Any]] = []
         property_commands: list[dict[str, Any]] = []
         devices = self.get_devices_from_device_id(device_id)
@@ -227,13 +272,7 @@ class XTTuyaIOTDeviceManagerInterface(XTDeviceManagerInterface):
                     command_value = prepare_value_for_property_update(device.local_strategy[dpId], command_value)
                     property_dict = {str(command_code): command_value}
                     property_commands.append(property_dict)
-        
-        if open_api_regular_commands:
-            LOGGER.debug(f"Sending Open API regular command : {open_api_regular_commands}")
-            self.iot_account.device_manager.send_commands(device_id, open_api_regular_commands)
-        if property_commands:
-            LOGGER.debug(f"Sending property command : {property_commands}")
-            self.iot_account.device_manager.send_property_update(device_id, property_commands)
+        return open_api_regular_commands, property_commands
 
     @overload
     def convert_to_xt_device(self, Any) -> XTDevice: ...
@@ -258,8 +297,30 @@ class XTTuyaIOTDeviceManagerInterface(XTDeviceManagerInterface):
                 return self.iot_account.device_manager.api.post(url, params)
         return None
     
-    def get_webrtc_sdp_answer(self, device_id: str, session_id: str, sdp_offer: str, channel: str) -> str | None:
-        return self.iot_account.device_manager.ipc_manager.webrtc_manager.get_sdp_answer(device_id, session_id, sdp_offer, channel)
+    async def async_call_api(self, hass: HomeAssistant, method: str, url: str, payload: str) -> str | None:
+        params: dict[str, any] = None
+        if payload:
+            params = json.loads(payload)
+        match method:
+            case "GET":
+                return await self.iot_account.device_manager.api.async_get(url, params)
+            case "POST":
+                return await self.iot_account.device_manager.api.async_post(url, params)
+        return None
+    
+    def get_diagnostics(self) -> dict[str, Any]:
+        return {
+            "token": self.iot_account.device_manager.api.get_token_metrics(),
+            "rate_limiter": self.iot_account.device_manager.api.rate_limiter.get_metrics(),
+            "webrtc_config_cache": self.iot_account.device_manager.ipc_manager.webrtc_manager.config_cache.get_metrics(),
+            "webrtc_sessions": self.iot_account.device_manager.ipc_manager.webrtc_manager.sdp_exchange.get_metrics(),
+        }
+    
+    def get_webrtc_sdp_answer(self, device_id: str, session_id: str, sdp_offer: str, channel: str, trickle: bool = False) -> str | None:
+        return self.iot_account.device_manager.ipc_manager.webrtc_manager.get_sdp_answer(device_id, session_id, sdp_offer, channel, trickle=trickle)
+    
+    async def async_get_webrtc_sdp_answer(self, hass: HomeAssistant, device_id: str, session_id: str, sdp_offer: str, channel: str, trickle: bool = False) -> str | None:
+        return await self.iot_account.device_manager.ipc_manager.webrtc_manager.async_get_sdp_answer(hass, device_id, session_id, sdp_offer, channel, trickle=trickle)
     
     def get_webrtc_ice_servers(self, device_id: str, session_id: str, format: str) -> str | None:
         return self.iot_account.device_manager.ipc_manager.webrtc_manager.get_ice_servers(device_id, session_id, format)
@@ -274,4 +335,7 @@ class XTTuyaIOTDeviceManagerInterface(XTDeviceManagerInterface):
         return self.iot_account.device_manager.ipc_manager.webrtc_manager.delete_webrtc_session(device_id, session_id)
     
     def send_webrtc_trickle_ice(self, device_id: str, session_id: str, candidate: str) -> str | None:
-        return self.iot_account.device_manager.ipc_manager.webrtc_manager.send_webrtc_trickle_ice(device_id, session_id, candidate)
\ No newline at end of file
+        return self.iot_account.device_manager.ipc_manager.webrtc_manager.send_webrtc_trickle_ice(device_id, session_id, candidate)
+    
+    def get_webrtc_trickle_ice(self, session_id: str) -> str | None:
+        return self.iot_account.device_manager.ipc_manager.webrtc_manager.get_webrtc_trickle_ice(session_id)
\ No newline at end of file
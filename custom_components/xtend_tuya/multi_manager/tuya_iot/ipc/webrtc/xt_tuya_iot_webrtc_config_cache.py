@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Any
+
+from tuya_iot import (
+    TuyaOpenAPI,
+)
+
+from ...const import (
+    IOT_WEBRTC_CONFIG_KEEP_WARM_PERIOD,
+    IOT_WEBRTC_CONFIG_REFRESH_MARGIN,
+    IOT_WEBRTC_CONFIG_TTL,
+)
+from .....const import (
+    LOGGER,  # noqa: F401
+)
+
+class XTIOTWebRTCDeviceConfig:
+    def __init__(self, config: dict[str, Any], expires_at: float) -> None:
+        self.config = config
+        self.expires_at = expires_at
+        self.skill_parsed: bool = False
+        self.any_stream_type = 1
+        self.highest_res_stream_type = 1
+        self.lowest_res_stream_type = 1
+        XTIOTWebRTCDeviceConfig._format_ice_servers(config)
+        self._parse_skill()
+
+    def _format_ice_servers(config: dict[str, Any]) -> None:
+        #Format ICE Servers so that they can be used by GO2RTC
+        p2p_config: dict = config.get("p2p_config", {})
+        if ices := p2p_config.get("ices"):
+            p2p_config["ices"] = json.dumps(ices).replace(': ', ':').replace(', ', ',')
+
+    def _parse_skill(self) -> None:
+        skill = self.config.get("skill")
+        if not skill:
+            return
+        cur_highest = 0
+        cur_lowest = 0
+        try:
+            skill_json: dict = json.loads(skill)
+            video_list: list[dict[str, any]] = skill_json.get("videos")
+            if video_list:
+                for video_details in video_list:
+                    if (
+                            "streamType" in video_details
+                        and "width" in video_details
+                        and "height" in video_details
+                    ):
+                        self.any_stream_type = video_details["streamType"]
+                        width = int(video_details["width"])
+                        height = int(video_details["height"])
+                        cur_value = width * height
+                        if cur_highest < cur_value:
+                            cur_highest = cur_value
+                            self.highest_res_stream_type = video_details["streamType"]
+                        if cur_lowest == 0 or cur_lowest > cur_value:
+                            cur_lowest = cur_value
+                            self.lowest_res_stream_type = video_details["streamType"]
+            self.skill_parsed = True
+        except Exception:
+            return
+
+    def get_stream_type(self, requested_channel: str) -> int:
+        if not self.skill_parsed:
+            return self.any_stream_type
+        if requested_channel == "high":
+            return self.highest_res_stream_type
+        elif requested_channel == "low":
+            return self.lowest_res_stream_type
+        try:
+            return int(requested_channel)
+        except Exception:
+            return self.any_stream_type
+
+class XTIOTWebRTCConfigCache:
+    """WebRTC configuration of the cameras.
+
+    The configuration of the cameras streamed recently is refreshed in the background
+    before it expires, the other ones are fetched again on their next stream.
+    """
+
+    def __init__(
+            self,
+            api: TuyaOpenAPI,
+            ttl: float = IOT_WEBRTC_CONFIG_TTL,
+            refresh_margin: float = IOT_WEBRTC_CONFIG_REFRESH_MARGIN,
+            keep_warm_period: float = IOT_WEBRTC_CONFIG_KEEP_WARM_PERIOD,
+    ) -> None:
+        self.api = api
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.keep_warm_period = keep_warm_period
+        self.lock = threading.Lock()
+        self.configs: dict[str, XTIOTWebRTCDeviceConfig] = {}
+        #Last time the configuration of a device was asked for by a stream
+        self.last_used: dict[str, float] = {}
+        self.refresh_timers: dict[str, threading.Timer] = {}
+        self.stopped: bool = False
+        self.hit_count: int = 0
+        self.miss_count: int = 0
+        self.refresh_count: int = 0
+        self.refresh_failure_count: int = 0
+
+    def get_config(self, device_id: str) -> XTIOTWebRTCDeviceConfig | None:
+        with self.lock:
+            now = time.monotonic()
+            self.last_used[device_id] = now
+            device_config = self.configs.get(device_id)
+            if device_config is not None and device_config.expires_at > now:
+                self.hit_count += 1
+                #Prefetched configs, or configs of cameras no longer kept warm, have no refresh pending
+                if device_id not in self.refresh_timers:
+                    self._schedule_refresh(device_id)
+                return device_config
+            self.miss_count += 1
+        return self.refresh(device_id)
+
+    def refresh(self, device_id: str) -> XTIOTWebRTCDeviceConfig | None:
+        webrtc_config = self.api.get(f"/v1.0/devices/{device_id}/webrtc-configs")
+        if not webrtc_config or not webrtc_config.get("success"):
+            LOGGER.debug(f"API WebRTC config of {device_id} failed: {webrtc_config}")
+            with self.lock:
+                self.refresh_failure_count += 1
+            return None
+        device_config = XTIOTWebRTCDeviceConfig(webrtc_config.get("result", {}), time.monotonic() + self.ttl)
+        with self.lock:
+            self.refresh_count += 1
+            self.configs[device_id] = device_config
+            self._schedule_refresh(device_id)
+        return device_config
+
+    def _schedule_refresh(self, device_id: str) -> None:
+        #Called with the lock held
+        if timer := self.refresh_timers.pop(device_id, None):
+            timer.cancel()
+        if self.stopped:
+            return
+        if not self._is_kept_warm(device_id):
+            return
+        if (device_config := self.configs.get(device_id)) is None:
+            return
+        refresh_delay = max(device_config.expires_at - time.monotonic() - self.refresh_margin, 0)
+        timer = threading.Timer(refresh_delay, self._refresh_in_background, [device_id])
+        timer.daemon = True
+        self.refresh_timers[device_id] = timer
+        timer.start()
+
+    def _is_kept_warm(self, device_id: str) -> bool:
+        #Called with the lock held, cameras that weren't streamed for a while aren't kept warm
+        last_used = self.last_used.get(device_id)
+        return last_used is not None and time.monotonic() - last_used <= self.keep_warm_period
+
+    def _refresh_in_background(self, device_id: str) -> None:
+        with self.lock:
+            self.refresh_timers.pop(device_id, None)
+            if self.stopped or not self._is_kept_warm(device_id):
+                return
+        try:
+            self.refresh(device_id)
+        except Exception as e:
+            #The next stream will fetch it again
+            LOGGER.debug(f"WebRTC config of {device_id} could not be refreshed: {e}")
+            with self.lock:
+                self.refresh_failure_count += 1
+
+    def invalidate(self, device_id: str) -> None:
+        with self.lock:
+            self.configs.pop(device_id, None)
+            self.last_used.pop(device_id, None)
+            if timer := self.refresh_timers.pop(device_id, None):
+                timer.cancel()
+
+    def stop(self) -> None:
+        with self.lock:
+            self.stopped = True
+            for timer in self.refresh_timers.values():
+                timer.cancel()
+            self.refresh_timers.clear()
+
+    def get_metrics(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "cached_devices": len(self.configs),
+                "refreshed_devices": len(self.refresh_timers),
+                "hits": self.hit_count,
+                "misses": self.miss_count,
+                "refreshes": self.refresh_count,
+                "refresh_failures": self.refresh_failure_count,
+            }
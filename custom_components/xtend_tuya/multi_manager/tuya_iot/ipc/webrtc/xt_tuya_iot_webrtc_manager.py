@@ -1,15 +1,24 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+import asyncio
+import threading
 import time
 import json
 
+from homeassistant.core import HomeAssistant
+
 from .....const import (
     LOGGER,  # noqa: F401
 )
 from ..xt_tuya_iot_ipc_manager import (
     XTIOTIPCManager,
 )
+from .xt_tuya_iot_webrtc_config_cache import (
+    XTIOTWebRTCConfigCache,
+)
+from .xt_tuya_iot_webrtc_session_store import (
+    XTIOTWebRTCSessionStore,
+)
 
 class XTIOTWebRTCSession:
     webrtc_config: dict[str, any]
@@ -20,15 +29,84 @@ class XTIOTWebRTCSession:
     answer_candidates: list[dict]
     has_all_candidates: bool
 
-    def __init__(self, ttl: int = 600) -> None:
+    def __init__(self, ttl: float = 600) -> None:
         self.webrtc_config = {}
         self.original_offer = None
         self.offer = None
         self.answer = {}
         self.final_answer = None
         self.answer_candidates = []
-        self.valid_until = datetime.now() + timedelta(0, ttl)
+        self.valid_until = time.monotonic() + ttl
         self.has_all_candidates = False
+        #Set once the answer and all its candidates were received
+        self.answer_complete = threading.Event()
+        #Set as soon as the answer was received, the candidates are trickled afterwards
+        self.answer_received = threading.Event()
+        self.answer_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future, bool]] = []
+        #Answer candidates already sent to the client (trickle mode)
+        self.delivered_candidates: int = 0
+        self.end_of_candidates_delivered: bool = False
+        self.lock = threading.Lock()
+    
+    def set_answer(self, answer: dict) -> None:
+        self.answer = answer
+        self._check_answer_complete()
+    
+    def add_answer_candidate(self, candidate: dict) -> None:
+        self.answer_candidates.append(candidate)
+        if candidate.get("candidate", None) == '':
+            self.has_all_candidates = True
+            self._check_answer_complete()
+    
+    def _check_answer_complete(self) -> None:
+        if not self.answer:
+            return
+        with self.lock:
+            self.answer_received.set()
+            if self.has_all_candidates:
+                self.answer_complete.set()
+            resolved_waiters = [waiter for waiter in self.answer_waiters if waiter[2] or self.answer_complete.is_set()]
+            self.answer_waiters = [waiter for waiter in self.answer_waiters if waiter not in resolved_waiters]
+        for loop, future, _ in resolved_waiters:
+            loop.call_soon_threadsafe(XTIOTWebRTCSession._resolve_waiter, future)
+    
+    def _resolve_waiter(future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(True)
+    
+    def wait_for_answer(self, timeout: float, trickle: bool = False) -> bool:
+        if trickle:
+            return self.answer_received.wait(timeout)
+        return self.answer_complete.wait(timeout)
+    
+    async def async_wait_for_answer(self, timeout: float, trickle: bool = False) -> bool:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future, trickle)
+        with self.lock:
+            if self.answer_complete.is_set() or (trickle and self.answer_received.is_set()):
+                return True
+            self.answer_waiters.append(waiter)
+        try:
+            async with asyncio.timeout(timeout):
+                await future
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            with self.lock:
+                if waiter in self.answer_waiters:
+                    self.answer_waiters.remove(waiter)
+    
+    def pop_undelivered_candidates(self) -> tuple[list[dict], bool]:
+        """Return the answer candidates not yet sent to the client and whether the end of candidates must be sent."""
+        with self.lock:
+            candidates = self.answer_candidates[self.delivered_candidates:]
+            self.delivered_candidates += len(candidates)
+            send_end_of_candidates = self.has_all_candidates and not self.end_of_candidates_delivered
+            if send_end_of_candidates:
+                self.end_of_candidates_delivered = True
+            return candidates, send_end_of_candidates
     
     def __repr__(self) -> str:
         answer = ""
@@ -47,67 +125,40 @@ class XTIOTWebRTCSession:
 
 class XTIOTWebRTCManager:
     def __init__(self, ipc_manager: XTIOTIPCManager) -> None:
-        self.sdp_exchange: dict[str, XTIOTWebRTCSession] = {}
+        self.sdp_exchange = XTIOTWebRTCSessionStore(XTIOTWebRTCSession)
         self.ipc_manager = ipc_manager
+        self.config_cache = XTIOTWebRTCConfigCache(ipc_manager.api)
     
     def get_webrtc_session(self, session_id: str) -> XTIOTWebRTCSession | None:
-        self._clean_cache()
-        if result := self.sdp_exchange.get(session_id):
-            return result
-        return None
-    
-    def _clean_cache(self) -> None:
-        current_time = datetime.now()
-        to_clean = []
-        for session_id in self.sdp_exchange:
-            if self.sdp_exchange[session_id].valid_until < current_time:
-                to_clean.append(session_id)
-        for session_id in to_clean:
-            self.sdp_exchange.pop(session_id)
+        return self.sdp_exchange.get(session_id)
     
     def set_sdp_answer(self, session_id: str, answer: str) -> None:
-        self._create_session_if_necessary(session_id)
-        self.sdp_exchange[session_id].answer = answer
+        self._create_session_if_necessary(session_id).set_answer(answer)
     
     def add_sdp_answer_candidate(self, session_id: str, candidate: dict) -> None:
-        self._create_session_if_necessary(session_id)
-        self.sdp_exchange[session_id].answer_candidates.append(candidate)
-        candidate_str = candidate.get("candidate", None)
-        if candidate_str == '':
-            self.sdp_exchange[session_id].has_all_candidates = True
+        self._create_session_if_necessary(session_id).add_answer_candidate(candidate)
 
     def set_config(self, session_id: str, config: dict[str, any]):
-        self._create_session_if_necessary(session_id)
-
-        #Format ICE Servers so that they can be used by GO2RTC
-        p2p_config: dict = config.get("p2p_config", {})
-        if ices := p2p_config.get("ices"):
-            p2p_config["ices"] = json.dumps(ices).replace(': ', ':').replace(', ', ',')
-        self.sdp_exchange[session_id].webrtc_config = config
+        #The ICE Servers were already formatted by the config cache
+        self._create_session_if_necessary(session_id).webrtc_config = config
 
     def set_sdp_offer(self, session_id: str, offer: str) -> None:
-        self._create_session_if_necessary(session_id)
-        self.sdp_exchange[session_id].offer = offer
+        self._create_session_if_necessary(session_id).offer = offer
     
     def set_original_sdp_offer(self, session_id: str, offer: str) -> None:
-        self._create_session_if_necessary(session_id)
-        self.sdp_exchange[session_id].original_offer = offer
+        self._create_session_if_necessary(session_id).original_offer = offer
 
-    def _create_session_if_necessary(self, session_id: str) -> None:
-        self._clean_cache()
-        if session_id not in self.sdp_exchange:
-            self.sdp_exchange[session_id] = XTIOTWebRTCSession()
+    def _create_session_if_necessary(self, session_id: str) -> XTIOTWebRTCSession:
+        return self.sdp_exchange.get_or_create(session_id)
     
     def get_config(self, device_id: str, session_id: str) -> dict | None:
         if current_exchange := self.get_webrtc_session(session_id):
             if current_exchange.webrtc_config:
                 return current_exchange.webrtc_config
         
-        webrtc_config = self.ipc_manager.api.get(f"/v1.0/devices/{device_id}/webrtc-configs")
-        if webrtc_config.get("success"):
-            result = webrtc_config.get("result")
-            self.set_config(session_id, result)
-            return result
+        if device_config := self.config_cache.get_config(device_id):
+            self.set_config(session_id, device_config.config)
+            return device_config.config
         return None
     
     def get_ice_servers(self, device_id: str, session_id: str, format: str) -> None:
@@ -137,46 +188,38 @@ class XTIOTWebRTCManager:
                     return temp_str.strip()
 
     def _get_stream_type(self, device_id: str, session_id: str, requested_channel: str) -> int:
-        any_stream_type = 1
-        highest_res_stream_type = any_stream_type
-        cur_highest = 0
-        lowest_res_stream_type = any_stream_type
-        cur_lowest = 0
-        if webrtc_config := self.get_config(device_id, session_id):
-            if skill := webrtc_config.get("skill"):
-                try:
-                    skill_json: dict = json.loads(skill)
-                    video_list: list[dict[str, any]] = skill_json.get("videos")
-                    if video_list:
-                        for video_details in video_list:
-                            if (
-                                    "streamType" in video_details
-                                and "width" in video_details
-                                and "height" in video_details
-                            ):
-                                any_stream_type = video_details["streamType"]
-                                width = int(video_details["width"])
-                                height = int(video_details["height"])
-                                cur_value = width * height
-                                if cur_highest < cur_value:
-                                    cur_highest = cur_value
-                                    highest_res_stream_type = video_details["streamType"]
-                                if cur_lowest == 0 or cur_lowest > cur_value:
-                                    cur_lowest = cur_value
-                                    lowest_res_stream_type = video_details["streamType"]
-                    if requested_channel == "high":
-                        return highest_res_stream_type
-                    elif requested_channel == "low":
-                        return lowest_res_stream_type
-                    else:
-                        return int(requested_channel)
-                except Exception:
-                    return any_stream_type
-        return any_stream_type
+        #The skill of the device was parsed once when its config was fetched
+        if device_config := self.config_cache.get_config(device_id):
+            return device_config.get_stream_type(requested_channel)
+        return 1
 
-    def get_sdp_answer(self, device_id: str, session_id: str, sdp_offer: str, channel: str, wait_for_answers: int = 5) -> str | None:
-        sleep_step = 0.01
-        sleep_count: int = int(wait_for_answers / sleep_step)
+    def get_sdp_answer(self, device_id: str, session_id: str, sdp_offer: str, channel: str, wait_for_answers: int = 5, trickle: bool = False) -> str | None:
+        if (prepared_offer := self._prepare_sdp_offer(device_id, session_id, sdp_offer, channel)) is None:
+            return None
+        topic, moto_id, offer_candidates, messages = prepared_offer
+        self.ipc_manager.publish_batch_to_ipc_mqtt(messages)
+        if session := self.get_webrtc_session(session_id):
+            session.wait_for_answer(wait_for_answers, trickle)
+        if end_messages := self._get_end_of_candidates_messages(device_id, session_id, topic, moto_id, offer_candidates):
+            self.ipc_manager.publish_batch_to_ipc_mqtt(end_messages)
+        return self._build_sdp_answer(session_id, trickle)
+
+    async def async_get_sdp_answer(self, hass: HomeAssistant, device_id: str, session_id: str, sdp_offer: str, channel: str, wait_for_answers: int = 5, trickle: bool = False) -> str | None:
+        prepared_offer = await hass.async_add_executor_job(self._prepare_sdp_offer, device_id, session_id, sdp_offer, channel)
+        if prepared_offer is None:
+            return None
+        topic, moto_id, offer_candidates, messages = prepared_offer
+        #The offer and its candidates are sent together and acknowledged together
+        await self.ipc_manager.async_publish_batch_to_ipc_mqtt(messages)
+        #The IPC listener completes the session when the answer arrives, no thread is held meanwhile
+        #In trickle mode the answer is returned right away, the late candidates go through trickle ICE
+        if session := self.get_webrtc_session(session_id):
+            await session.async_wait_for_answer(wait_for_answers, trickle)
+        if end_messages := self._get_end_of_candidates_messages(device_id, session_id, topic, moto_id, offer_candidates):
+            await self.ipc_manager.async_publish_batch_to_ipc_mqtt(end_messages)
+        return self._build_sdp_answer(session_id, trickle)
+
+    def _prepare_sdp_offer(self, device_id: str, session_id: str, sdp_offer: str, channel: str) -> tuple[str, str, list[str], list[tuple[str, str]]] | None:
         ENDLINE = "\r\n"
         self.set_original_sdp_offer(session_id, sdp_offer)
         if webrtc_config := self.get_config(device_id, session_id):
@@ -199,6 +242,8 @@ class XTIOTWebRTCManager:
                 sdp_offer = sdp_offer.replace(candidate_str, "")
             sdp_offer = sdp_offer.replace("a=end-of-candidates" + ENDLINE, "")
             self.set_sdp_offer(session_id, sdp_offer)
+            messages: list[tuple[str, str]] = []
+            #The answer is built from the exchange on the first sink topic
             for topic in self.ipc_manager.ipc_mq.mq_config.sink_topic.values():
                 topic = topic.replace("{device_id}", device_id)
                 topic = topic.replace("moto_id", moto_id)
@@ -224,7 +269,7 @@ class XTIOTWebRTCManager:
                         }
                     },
                 }
-                self.ipc_manager.publish_to_ipc_mqtt(topic, json.dumps(payload))
+                messages.append((topic, json.dumps(payload)))
                 if offer_candidates:
                     for candidate in offer_candidates:
                         payload = {
@@ -247,49 +292,53 @@ class XTIOTWebRTCManager:
                                 }
                             },
                         }
-                        self.ipc_manager.publish_to_ipc_mqtt(topic, json.dumps(payload))
-                for _ in range(sleep_count):
-                    if session := self.get_webrtc_session(session_id):
-                        if session.has_all_candidates:
-                            break
-                    time.sleep(sleep_step) #Wait for MQTT responses
-                if offer_candidates:
-                    payload = {
-                        "protocol":302,
-                        "pv":"2.2",
-                        "t":int(time.time()),
-                        "data":{
-                            "header":{
-                                "type":"candidate",
-                                "from":f"{self.ipc_manager.get_from()}",
-                                "to":f"{device_id}",
-                                "sub_dev_id":"",
-                                "sessionid":f"{session_id}",
-                                "moto_id":f"{moto_id}",
-                                "tid":""
-                            },
-                            "msg":{
-                                "mode":"webrtc",
-                                "candidate": ""
-                            }
-                        },
-                    }
-                    self.ipc_manager.publish_to_ipc_mqtt(topic, json.dumps(payload))
-                if session := self.get_webrtc_session(session_id):
-                    #Format SDP answer and send it back
-                    sdp_answer: str = session.answer.get("sdp", "")
-                    candidates: str = ""
-                    if session.answer_candidates:
-                        for candidate in session.answer_candidates:
-                            candidates += candidate.get("candidate", "")
-                        sdp_answer += candidates + "a=end-of-candidates" + ENDLINE
-                    session.final_answer = f"{sdp_answer}"
-                    return sdp_answer
-            
-            if not auth_token or not moto_id:
-                return None
+                        messages.append((topic, json.dumps(payload)))
+                return topic, moto_id, offer_candidates, messages
             
         return None
+
+    def _get_end_of_candidates_messages(self, device_id: str, session_id: str, topic: str, moto_id: str, offer_candidates: list[str]) -> list[tuple[str, str]]:
+        messages: list[tuple[str, str]] = []
+        if offer_candidates:
+            payload = {
+                "protocol":302,
+                "pv":"2.2",
+                "t":int(time.time()),
+                "data":{
+                    "header":{
+                        "type":"candidate",
+                        "from":f"{self.ipc_manager.get_from()}",
+                        "to":f"{device_id}",
+                        "sub_dev_id":"",
+                        "sessionid":f"{session_id}",
+                        "moto_id":f"{moto_id}",
+                        "tid":""
+                    },
+                    "msg":{
+                        "mode":"webrtc",
+                        "candidate": ""
+                    }
+                },
+            }
+            messages.append((topic, json.dumps(payload)))
+        return messages
+
+    def _build_sdp_answer(self, session_id: str, trickle: bool = False) -> str | None:
+        ENDLINE = "\r\n"
+        if session := self.get_webrtc_session(session_id):
+            #Format SDP answer and send it back
+            sdp_answer: str = session.answer.get("sdp", "")
+            candidates: str = ""
+            if trickle:
+                #Only the candidates received so far, the end of candidates is sent once it is known
+                sdp_answer += self._get_answer_candidates_sdpfrag(session)
+            elif session.answer_candidates:
+                for candidate in session.answer_candidates:
+                    candidates += candidate.get("candidate", "")
+                sdp_answer += candidates + "a=end-of-candidates" + ENDLINE
+            session.final_answer = f"{sdp_answer}"
+            return sdp_answer
+        return None
     
     def delete_webrtc_session(self, device_id: str, session_id: str) -> str | None:
         if webrtc_config := self.get_config(device_id, session_id):
@@ -313,8 +362,9 @@ class XTIOTWebRTCManager:
                     }
                 },
             }
-            for topic in self.ipc_manager.ipc_mq.mq_config.sink_topic.values():
-                self.ipc_manager.publish_to_ipc_mqtt(topic, json.dumps(payload))
+            self.ipc_manager.publish_batch_to_ipc_mqtt(
+                [(topic, json.dumps(payload)) for topic in self.ipc_manager.ipc_mq.mq_config.sink_topic.values()]
+            )
             return ""
         return None
     
@@ -341,7 +391,24 @@ class XTIOTWebRTCManager:
                     }
                 },
             }
-            for topic in self.ipc_manager.ipc_mq.mq_config.sink_topic.values():
-                self.ipc_manager.publish_to_ipc_mqtt(topic, json.dumps(payload))
+            self.ipc_manager.publish_batch_to_ipc_mqtt(
+                [(topic, json.dumps(payload)) for topic in self.ipc_manager.ipc_mq.mq_config.sink_topic.values()]
+            )
             return ""
-        return None
\ No newline at end of file
+        return None
+    
+    def get_webrtc_trickle_ice(self, session_id: str) -> str | None:
+        #Polled by the trickle mode clients, clients that don't poll (go2rtc, WHEP) must not use the trickle mode
+        if session := self.get_webrtc_session(session_id):
+            return self._get_answer_candidates_sdpfrag(session)
+        return None
+    
+    def _get_answer_candidates_sdpfrag(self, session: XTIOTWebRTCSession) -> str:
+        ENDLINE = "\r\n"
+        candidates, send_end_of_candidates = session.pop_undelivered_candidates()
+        sdpfrag: str = ""
+        for candidate in candidates:
+            sdpfrag += candidate.get("candidate", "")
+        if send_end_of_candidates:
+            sdpfrag += "a=end-of-candidates" + ENDLINE
+        return sdpfrag
\ No newline at end of file
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, TYPE_CHECKING
+
+from ...const import (
+    IOT_WEBRTC_MAX_SESSIONS,
+    IOT_WEBRTC_SESSION_TTL,
+)
+
+if TYPE_CHECKING:
+    from .xt_tuya_iot_webrtc_manager import (
+        XTIOTWebRTCSession,
+    )
+
+class XTIOTWebRTCSessionStore:
+    """WebRTC sessions by id, expired in order of expiration and dropped least recently used first when full."""
+
+    def __init__(
+            self,
+            session_factory: Callable[[float], XTIOTWebRTCSession],
+            ttl: float = IOT_WEBRTC_SESSION_TTL,
+            max_sessions: int = IOT_WEBRTC_MAX_SESSIONS,
+    ) -> None:
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.lock = threading.Lock()
+        self.sessions: OrderedDict[str, XTIOTWebRTCSession] = OrderedDict()
+        #(valid_until, sequence, session_id, session), the sessions that were replaced or evicted are skipped when popped
+        self.expirations: list[tuple[float, int, str, XTIOTWebRTCSession]] = []
+        self.sequence = itertools.count()
+        self.created_count: int = 0
+        self.expired_count: int = 0
+        self.evicted_count: int = 0
+
+    def get(self, session_id: str) -> XTIOTWebRTCSession | None:
+        with self.lock:
+            self._expire(time.monotonic())
+            if session := self.sessions.get(session_id):
+                self.sessions.move_to_end(session_id)
+            return session
+
+    def get_or_create(self, session_id: str) -> XTIOTWebRTCSession:
+        with self.lock:
+            self._expire(time.monotonic())
+            if session := self.sessions.get(session_id):
+                self.sessions.move_to_end(session_id)
+                return session
+            session = self.session_factory(self.ttl)
+            self.sessions[session_id] = session
+            heapq.heappush(self.expirations, (session.valid_until, next(self.sequence), session_id, session))
+            self.created_count += 1
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evicted_count += 1
+            return session
+
+    def pop(self, session_id: str) -> XTIOTWebRTCSession | None:
+        with self.lock:
+            return self.sessions.pop(session_id, None)
+
+    def _expire(self, now: float) -> None:
+        #Called with the lock held, only the sessions that are due are looked at
+        while self.expirations and self.expirations[0][0] < now:
+            _, _, session_id, session = heapq.heappop(self.expirations)
+            if self.sessions.get(session_id) is session:
+                self.sessions.pop(session_id)
+                self.expired_count += 1
+
+    def get_metrics(self) -> dict[str, Any]:
+        with self.lock:
+            self._expire(time.monotonic())
+            return {
+                "active": len(self.sessions),
+                "created": self.created_count,
+                "expired": self.expired_count,
+                "evicted": self.evicted_count,
+            }
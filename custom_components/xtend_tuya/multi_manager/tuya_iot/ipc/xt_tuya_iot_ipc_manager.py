@@ -1,5 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import time
+
+from paho.mqtt import client as mqtt
+
 from tuya_iot import (
     TuyaOpenAPI,
 )
@@ -21,6 +26,10 @@ from ...multi_manager import (
 from ....const import (
     LOGGER,  # noqa: F401
 )
+from ..const import (
+    IOT_IPC_LOG_PUBLISH_PAYLOADS,
+    IOT_IPC_PUBLISH_TIMEOUT,
+)
 from .webrtc.xt_tuya_iot_webrtc_manager import (
     XTIOTWebRTCManager,
 )
@@ -34,11 +43,40 @@ class XTIOTIPCManager:  # noqa: F811
         self.ipc_mq.add_message_listener(self.ipc_listener.handle_message)
         self.api = api
         self.webrtc_manager = XTIOTWebRTCManager(self)
+        self.log_publish_payloads = IOT_IPC_LOG_PUBLISH_PAYLOADS
 
     def get_from(self) -> str:
         return self.ipc_mq.mq_config.username.split("cloud_")[1]
 
     def publish_to_ipc_mqtt(self, topic: str, msg: str):
-        LOGGER.warning(f"Publishing to IPC: {msg}")
-        publish_result = self.ipc_mq.client.publish(topic=topic, payload=msg)
-        publish_result.wait_for_publish(10)
\ No newline at end of file
+        self.publish_batch_to_ipc_mqtt([(topic, msg)])
+
+    def _publish_messages(self, messages: list[tuple[str, str]]) -> list[mqtt.MQTTMessageInfo]:
+        #All the messages are in flight before waiting for any acknowledgement
+        publish_results: list[mqtt.MQTTMessageInfo] = []
+        for topic, msg in messages:
+            if self.log_publish_payloads:
+                LOGGER.debug(f"Publishing to IPC: {msg}")
+            publish_results.append(self.ipc_mq.publish(topic, msg))
+        return publish_results
+
+    def publish_batch_to_ipc_mqtt(self, messages: list[tuple[str, str]], timeout: float = IOT_IPC_PUBLISH_TIMEOUT) -> bool:
+        publish_results = self._publish_messages(messages)
+        deadline = time.monotonic() + timeout
+        for publish_result in publish_results:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            publish_result.wait_for_publish(remaining)
+        return all(publish_result.is_published() for publish_result in publish_results)
+
+    async def async_publish_batch_to_ipc_mqtt(self, messages: list[tuple[str, str]], timeout: float = IOT_IPC_PUBLISH_TIMEOUT) -> bool:
+        loop = asyncio.get_running_loop()
+        publish_results = self._publish_messages(messages)
+        futures = [self.ipc_mq.get_publish_future(loop, publish_result) for publish_result in publish_results]
+        if not futures:
+            return True
+        done, pending = await asyncio.wait(futures, timeout=timeout)
+        for publish_result in publish_results:
+            self.ipc_mq.cancel_publish_future(publish_result)
+        return not pending and all(future.result() for future in done)
\ No newline at end of file
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 from typing import Optional, Any
+import asyncio
+import threading
 import uuid
 import json
 from paho.mqtt import client as mqtt
@@ -43,6 +45,12 @@ class XTIOTIPCTuyaMQConfig(TuyaMQConfig):
 class XTIOTOpenMQIPC(XTIOTOpenMQ):
     def __init__(self, api: TuyaOpenAPI) -> None:
         self.mq_config: XTIOTIPCTuyaMQConfig = None
+        self.publish_lock = threading.Lock()
+        #Message ids published and not acknowledged yet, with the waiter of their acknowledgement.
+        #Abandoned ones stay until their acknowledgement so that it isn't taken for the one of a later message
+        self.pending_mids: dict[int, tuple[asyncio.AbstractEventLoop, asyncio.Future] | None] = {}
+        #Acknowledgements received before publish() returned the message id
+        self.early_acknowledged_mids: set[int] = set()
         super().__init__(api)
     
     def _get_mqtt_config(self) -> Optional[XTIOTIPCTuyaMQConfig]:
@@ -88,7 +96,48 @@ class XTIOTOpenMQIPC(XTIOTOpenMQ):
     
     def _on_publish(self, mqttc: mqtt.Client, user_data: Any, mid):
         #LOGGER.debug(f"_on_publish: {mid} <=> {user_data}")
-        pass
+        with self.publish_lock:
+            if mid in self.pending_mids:
+                waiter = self.pending_mids.pop(mid)
+            else:
+                waiter = None
+                self.early_acknowledged_mids.add(mid)
+        if waiter is not None:
+            loop, future = waiter
+            loop.call_soon_threadsafe(XTIOTOpenMQIPC._resolve_publish_future, future, True)
+
+    def _resolve_publish_future(future: asyncio.Future, published: bool) -> None:
+        if not future.done():
+            future.set_result(published)
+
+    def publish(self, topic: str, payload: str) -> mqtt.MQTTMessageInfo:
+        publish_result = self.client.publish(topic=topic, payload=payload)
+        if publish_result.rc != mqtt.MQTT_ERR_SUCCESS:
+            return publish_result
+        with self.publish_lock:
+            if publish_result.mid in self.early_acknowledged_mids:
+                self.early_acknowledged_mids.discard(publish_result.mid)
+            else:
+                self.pending_mids[publish_result.mid] = None
+        return publish_result
+
+    def get_publish_future(self, loop: asyncio.AbstractEventLoop, publish_result: mqtt.MQTTMessageInfo) -> asyncio.Future:
+        """Return a future resolved on the loop with whether the broker acknowledged the message."""
+        future = loop.create_future()
+        if publish_result.rc != mqtt.MQTT_ERR_SUCCESS:
+            future.set_result(False)
+            return future
+        with self.publish_lock:
+            if publish_result.mid not in self.pending_mids:
+                future.set_result(True)
+            else:
+                self.pending_mids[publish_result.mid] = (loop, future)
+        return future
+
+    def cancel_publish_future(self, publish_result: mqtt.MQTTMessageInfo) -> None:
+        with self.publish_lock:
+            if publish_result.mid in self.pending_mids:
+                self.pending_mids[publish_result.mid] = None
 
     def _start(self, mq_config: TuyaMQConfig) -> mqtt.Client:
         mqttc = mqtt.Client(mq_config.client_id)
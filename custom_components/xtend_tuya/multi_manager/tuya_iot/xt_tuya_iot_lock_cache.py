@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from tuya_iot import (
+    TuyaOpenAPI,
+)
+
+from .const import (
+    IOT_LOCK_TICKET_EXPIRATION_MARGIN,
+    IOT_LOCK_UNLOCK_TYPES_TTL,
+)
+from ...const import (
+    LOGGER,  # noqa: F401
+)
+
+#Validity of a ticket when the cloud doesn't tell it
+DEFAULT_TICKET_VALIDITY = 300
+
+class XTIOTLockTicket:
+    def __init__(self, ticket_id: str, expires_at: float) -> None:
+        self.ticket_id = ticket_id
+        self.expires_at = expires_at
+
+class XTIOTLockCache:
+    """Remote unlock types and password tickets of the locks, to avoid fetching them on every operation."""
+
+    def __init__(
+            self,
+            api: TuyaOpenAPI,
+            unlock_types_ttl: float = IOT_LOCK_UNLOCK_TYPES_TTL,
+            ticket_expiration_margin: float = IOT_LOCK_TICKET_EXPIRATION_MARGIN,
+    ) -> None:
+        self.api = api
+        self.unlock_types_ttl = unlock_types_ttl
+        self.ticket_expiration_margin = ticket_expiration_margin
+        self.lock = threading.Lock()
+        self.unlock_types: dict[str, tuple[list[str], float]] = {}
+        self.tickets: dict[str, XTIOTLockTicket] = {}
+
+    def get_unlock_types(self, device_id: str) -> list[str]:
+        with self.lock:
+            if device_id in self.unlock_types:
+                unlock_types, expires_at = self.unlock_types[device_id]
+                if expires_at > time.monotonic():
+                    return unlock_types
+        supported_unlock_types: list[str] = []
+        remote_unlock_types = self.api.get(f"/v1.0/devices/{device_id}/door-lock/remote-unlocks")
+        if remote_unlock_types and remote_unlock_types.get("success", False):
+            results = remote_unlock_types.get("result", [])
+            for result in results:
+                if result.get("open", False):
+                    if supported_unlock_type := result.get("remote_unlock_type", None):
+                        supported_unlock_types.append(supported_unlock_type)
+            with self.lock:
+                self.unlock_types[device_id] = (supported_unlock_types, time.monotonic() + self.unlock_types_ttl)
+        else:
+            LOGGER.debug(f"API remote unlock types of {device_id} failed: {remote_unlock_types}")
+        return supported_unlock_types
+
+    def fetch_ticket(self, device_id: str) -> XTIOTLockTicket | None:
+        ticket = self.api.post(f"/v1.0/devices/{device_id}/door-lock/password-ticket")
+        if not ticket or not ticket.get("success", False):
+            LOGGER.debug(f"API remote unlock ticket of {device_id} failed: {ticket}")
+            return None
+        result = ticket.get("result", {})
+        if ticket_id := result.get("ticket_id", None):
+            validity = result.get("expire_time", DEFAULT_TICKET_VALIDITY)
+            return XTIOTLockTicket(ticket_id, time.monotonic() + validity - self.ticket_expiration_margin)
+        return None
+
+    def take_ticket(self, device_id: str) -> tuple[str | None, bool]:
+        """Return a ticket and whether it was prefetched, a ticket is only used once."""
+        with self.lock:
+            ticket = self.tickets.pop(device_id, None)
+        if ticket is not None and ticket.expires_at > time.monotonic():
+            return ticket.ticket_id, True
+        if ticket := self.fetch_ticket(device_id):
+            return ticket.ticket_id, False
+        return None, False
+
+    def prefetch_ticket(self, device_id: str) -> None:
+        if ticket := self.fetch_ticket(device_id):
+            with self.lock:
+                self.tickets[device_id] = ticket
+
+    def invalidate(self, device_id: str) -> None:
+        with self.lock:
+            self.unlock_types.pop(device_id, None)
+            self.tickets.pop(device_id, None)
@@ -5,12 +5,15 @@ https://github.com/tuya/tuya-iot-python-sdk
 
 from __future__ import annotations
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tuya_iot import (
+    AuthType,
     TuyaDeviceManager,
     TuyaOpenAPI,
     TuyaOpenMQ,
 )
-from typing import Any
+from typing import Any, Literal
 
 from ...const import (
     LOGGER,
@@ -31,19 +34,45 @@ from ..multi_manager import (
     MultiManager,  # noqa: F811
 )
 from ...base import TuyaEntity
+from .const import (
+    IOT_DEVICE_FETCH_MAX_WORKERS,
+    IOT_PROPERTY_UPDATE_COALESCING_WINDOW,
+    IOT_LOCK_CATEGORIES,
+    IOT_WEBRTC_CATEGORIES,
+)
 from .ipc.xt_tuya_iot_ipc_manager import (
     XTIOTIPCManager
 )
+from .xt_tuya_iot_model_cache import (
+    XTIOTModelCache,
+)
+from .xt_tuya_iot_lock_cache import (
+    XTIOTLockCache,
+)
 
 
 class XTIOTDeviceManager(TuyaDeviceManager):
-    def __init__(self, multi_manager: MultiManager, api: TuyaOpenAPI, mq: TuyaOpenMQ) -> None:
+    def __init__(
+            self,
+            multi_manager: MultiManager,
+            api: TuyaOpenAPI,
+            mq: TuyaOpenMQ,
+            model_cache: XTIOTModelCache,
+            fetch_max_workers: int = IOT_DEVICE_FETCH_MAX_WORKERS,
+            property_update_window: float = IOT_PROPERTY_UPDATE_COALESCING_WINDOW,
+    ) -> None:
         self.device_map: dict[str, XTDevice] = {}
         super().__init__(api, mq)
         mq.remove_message_listener(self.on_message)
         mq.add_message_listener(self.forward_message_to_multi_manager)
         self.multi_manager = multi_manager
+        self.model_cache = model_cache
+        self.fetch_max_workers = fetch_max_workers
+        self.property_update_window = property_update_window
+        self.pending_property_updates: dict[str, dict[str, str]] = {}
+        self.pending_property_lock = threading.Lock()
         self.ipc_manager = XTIOTIPCManager(api, multi_manager)
+        self.lock_cache = XTIOTLockCache(api)
 
     def forward_message_to_multi_manager(self, msg:str):
         self.multi_manager.on_message(MESSAGE_SOURCE_TUYA_IOT, msg)
@@ -127,12 +156,36 @@ class XTIOTDeviceManager(TuyaDeviceManager):
     
     def update_device_function_cache(self, devIds: list = []):
         super().update_device_function_cache(devIds)
-        for device_id in self.device_map:
-            device = self.device_map[device_id]
-            device_open_api = self.get_open_api_device(device)
-            self.multi_manager.device_watcher.report_message(device_id, f"About to merge {device} and {device_open_api}", device)
-            XTMergingManager.merge_devices(device, device_open_api)
-            self.multi_manager.virtual_state_handler.apply_init_virtual_states(device)
+
+        #Fetch the OpenAPI view of all the devices concurrently, the merging is done
+        #on the calling thread as soon as the responses of a device are in
+        with ThreadPoolExecutor(max_workers=max(1, self.fetch_max_workers), thread_name_prefix="xt_tuya_iot_fetch") as executor:
+            pending_fetches = {
+                executor.submit(self.get_open_api_device, device): device_id
+                for device_id, device in self.device_map.items()
+            }
+            for fetch in as_completed(pending_fetches):
+                device_id = pending_fetches[fetch]
+                device = self.device_map[device_id]
+                device_open_api = fetch.result()
+                if device_open_api is not None:
+                    self.multi_manager.device_watcher.report_message(device_id, f"About to merge {device} and {device_open_api}", device)
+                    XTMergingManager.merge_devices(device, device_open_api)
+                self.multi_manager.virtual_state_handler.apply_init_virtual_states(device)
+
+        #Models that came from the disk cache are checked against the cloud once we're started
+        self.model_cache.schedule_revalidation(self._fetch_device_model)
+        self.model_cache.remove_unused_products(
+            product_id for device in self.device_map.values() if (product_id := getattr(device, "product_id", None))
+        )
+
+        #Know the unlock types of the locks before the first operation
+        for device in self.device_map.values():
+            if getattr(device, "category", None) in IOT_LOCK_CATEGORIES:
+                self.multi_manager.hass.add_job(self.lock_cache.get_unlock_types, device.id)
+            #The first stream of the cameras then starts without fetching their WebRTC config
+            if getattr(device, "category", None) in IOT_WEBRTC_CATEGORIES:
+                self.multi_manager.hass.add_job(self.ipc_manager.webrtc_manager.config_cache.refresh, device.id)
 
     def on_message(self, msg: str):
         super().on_message(msg)
@@ -146,9 +199,8 @@ class XTIOTDeviceManager(TuyaDeviceManager):
         if not device:
             return
         self.multi_manager.device_watcher.report_message(device_id, f"[IOT]On device report: {status}", device)
-        status_new = self.multi_manager.convert_device_report_status_list(device_id, status)
-        status_new = self.multi_manager.multi_source_handler.filter_status_list(device_id, MESSAGE_SOURCE_TUYA_IOT, status_new)
-        status_new = self.multi_manager.virtual_state_handler.apply_virtual_states_to_status_list(device, status_new)
+        self.multi_manager.process_device_report_status_list(device, MESSAGE_SOURCE_TUYA_IOT, status)
+        #The IoT path applies the reported values as they are
         for item in status:
             if "code" in item and "value" in item:
                 code = item["code"]
@@ -180,15 +232,13 @@ class XTIOTDeviceManager(TuyaDeviceManager):
         device_properties.status = {}
         device_properties.local_strategy = {}
         response = self.api.get(f"/v2.0/cloud/thing/{device.id}/shadow/properties")
-        response2 = self.api.get(f"/v2.0/cloud/thing/{device.id}/model")
-        if not response.get("success") or not response2.get("success"):
+        data_model = self.model_cache.get_model(getattr(device, "product_id", None), device.id, self._fetch_device_model)
+        if not response.get("success") or data_model is None:
             LOGGER.warning(f"Response1: {response}")
-            LOGGER.warning(f"Response2: {response2}")
             return
         
-        if response2.get("success"):
-            result = response2.get("result", {})
-            data_model = json.loads(result.get("model", "{}"))
+        if data_model is not None:
+            #The parsed model is shared between the devices of the same product, don't modify it
             device_properties.data_model = data_model
             for service in data_model["services"]:
                 for property in service["properties"]:
@@ -199,10 +249,9 @@ class XTIOTDeviceManager(TuyaDeviceManager):
                         ):
                         dp_id = int(property["abilityId"])
                         code  = property["code"]
-                        typeSpec = property["typeSpec"]
-                        real_type = TuyaEntity.determine_dptype(typeSpec["type"])
+                        typeSpec = dict(property["typeSpec"])
+                        real_type = TuyaEntity.determine_dptype(typeSpec.pop("type"))
                         access_mode = property["accessMode"]
-                        typeSpec.pop("type")
                         typeSpec_json = json.dumps(typeSpec)
                         if dp_id not in device_properties.local_strategy:
                             if code in device_properties.function or code in device_properties.status_range:
@@ -277,19 +326,106 @@ class XTIOTDeviceManager(TuyaDeviceManager):
                         device_properties.status[code] = dp_property.get("value",None)
         return device_properties
 
+    def _fetch_device_model(self, device_id: str) -> str | None:
+        response = self.api.get(f"/v2.0/cloud/thing/{device_id}/model")
+        if not response.get("success"):
+            LOGGER.warning(f"Response2: {response}")
+            return None
+        return response.get("result", {}).get("model", "{}")
+
+    def get_device_stream_allocation(
+            self, device_id: str, stream_type: Literal["flv", "hls", "rtmp", "rtsp"]
+    ) -> dict[str, Any] | None:
+        #Same endpoint as the SDK's get_device_stream_allocate, which only returns the URL
+        if self.api.auth_type != AuthType.SMART_HOME:
+            return None
+        response = self.api.post(f"/v1.0/devices/{device_id}/stream/actions/allocate", {"type": stream_type})
+        if response.get("success"):
+            return response.get("result")
+        return None
+
+    async def async_send_commands(
+            self, device_id: str, commands: list[dict[str, Any]]
+    ) -> dict[str, Any]:
+        #Same endpoints as the SDK's send_commands, on the event loop
+        if self.api.auth_type == AuthType.SMART_HOME:
+            return await self.api.async_post(f"/v1.0/devices/{device_id}/commands", {"commands": commands})
+        return await self.api.async_post(f"/v1.0/iot-03/devices/{device_id}/commands", {"commands": commands})
+
+    def _merge_properties(self, properties: list[dict[str, Any]]) -> dict[str, str]:
+        #All the properties go in a single request, the last value of a property wins
+        merged_properties: dict[str, str] = {}
+        for property in properties:
+            for prop_key in property:
+                merged_properties[prop_key] = property[prop_key]
+        return merged_properties
+
     def send_property_update(
             self, device_id: str, properties: list[dict[str, Any]]
     ):
-        for property in properties:
-            for prop_key in property:
-                property_str = f"{{\"{prop_key}\":{property[prop_key]}}}"
-                self.api.post(f"/v2.0/cloud/thing/{device_id}/shadow/properties/issue", {"properties": property_str}
-        )
+        merged_properties = self._merge_properties(properties)
+        if not merged_properties:
+            return
+
+        if self.property_update_window <= 0:
+            self._issue_properties(device_id, merged_properties)
+            return
+
+        with self.pending_property_lock:
+            if device_id in self.pending_property_updates:
+                self.pending_property_updates[device_id].update(merged_properties)
+                return
+            self.pending_property_updates[device_id] = merged_properties
+        timer = threading.Timer(self.property_update_window, self._flush_property_update, [device_id])
+        timer.daemon = True
+        timer.start()
+
+    def _flush_property_update(self, device_id: str):
+        with self.pending_property_lock:
+            properties = self.pending_property_updates.pop(device_id, None)
+        if properties:
+            self._issue_properties(device_id, properties)
+
+    def _issue_properties(self, device_id: str, properties: dict[str, str]):
+        self.api.post(f"/v2.0/cloud/thing/{device_id}/shadow/properties/issue", {"properties": self._get_properties_str(properties)})
+
+    async def async_send_property_update(
+            self, device_id: str, properties: list[dict[str, Any]]
+    ):
+        merged_properties = self._merge_properties(properties)
+        if not merged_properties:
+            return
+
+        if self.property_update_window <= 0:
+            await self._async_issue_properties(device_id, merged_properties)
+            return
+
+        with self.pending_property_lock:
+            if device_id in self.pending_property_updates:
+                self.pending_property_updates[device_id].update(merged_properties)
+                return
+            self.pending_property_updates[device_id] = merged_properties
+        self.multi_manager.hass.loop.call_later(self.property_update_window, self._async_schedule_property_flush, device_id)
+
+    def _async_schedule_property_flush(self, device_id: str):
+        self.multi_manager.hass.async_create_task(self._async_flush_property_update(device_id))
+
+    async def _async_flush_property_update(self, device_id: str):
+        with self.pending_property_lock:
+            properties = self.pending_property_updates.pop(device_id, None)
+        if properties:
+            await self._async_issue_properties(device_id, properties)
+
+    async def _async_issue_properties(self, device_id: str, properties: dict[str, str]):
+        await self.api.async_post(f"/v2.0/cloud/thing/{device_id}/shadow/properties/issue", {"properties": self._get_properties_str(properties)})
+
+    def _get_properties_str(self, properties: dict[str, str]) -> str:
+        #Values were already formatted by prepare_value_for_property_update
+        return "{" + ",".join(f"\"{prop_key}\":{prop_value}" for prop_key, prop_value in properties.items()) + "}"
     
     def send_lock_unlock_command(
             self, device_id: str, lock: bool
     ) -> bool:
-        supported_unlock_types: list[str] = []
         if lock:
             open = "false"
         else:
@@ -297,21 +433,23 @@ class XTIOTDeviceManager(TuyaDeviceManager):
 
         self.multi_manager.device_watcher.report_message(device_id, f"Sending lock/unlock command open: {open}", self.device_map[device_id])
 
-        remote_unlock_types = self.api.get(f"/v1.0/devices/{device_id}/door-lock/remote-unlocks")
-        self.multi_manager.device_watcher.report_message(device_id, f"API remote unlock types: {remote_unlock_types}", self.device_map[device_id])
-        if remote_unlock_types.get("success", False):
-            results = remote_unlock_types.get("result", [])
-            for result in results:
-                if result.get("open", False):
-                    if supported_unlock_type := result.get("remote_unlock_type", None):
-                        supported_unlock_types.append(supported_unlock_type)
+        supported_unlock_types = self.lock_cache.get_unlock_types(device_id)
+        self.multi_manager.device_watcher.report_message(device_id, f"API remote unlock types: {supported_unlock_types}", self.device_map[device_id])
         if "remoteUnlockWithoutPwd" in supported_unlock_types:
-            ticket = self.api.post(f"/v1.0/devices/{device_id}/door-lock/password-ticket")
-            self.multi_manager.device_watcher.report_message(device_id, f"API remote unlock ticket: {ticket}", self.device_map[device_id])
-            if ticket.get("success", False):
-                result = ticket.get("result", {})
-                if ticket_id := result.get("ticket_id", None):
-                    lock_operation = self.api.post(f"/v1.0/smart-lock/devices/{device_id}/password-free/door-operate", {"ticket_id": ticket_id, "open": open})
-                    self.multi_manager.device_watcher.report_message(device_id, f"API remote unlock operation result: {lock_operation}", self.device_map[device_id])
-                    return lock_operation.get("success", False)
+            while True:
+                ticket_id, prefetched = self.lock_cache.take_ticket(device_id)
+                self.multi_manager.device_watcher.report_message(device_id, f"API remote unlock ticket: {ticket_id} (prefetched: {prefetched})", self.device_map[device_id])
+                if not ticket_id:
+                    break
+                lock_operation = self.api.post(f"/v1.0/smart-lock/devices/{device_id}/password-free/door-operate", {"ticket_id": ticket_id, "open": open})
+                self.multi_manager.device_watcher.report_message(device_id, f"API remote unlock operation result: {lock_operation}", self.device_map[device_id])
+                if lock_operation and lock_operation.get("success", False):
+                    #Have a ticket ready for the next operation
+                    self.multi_manager.hass.add_job(self.lock_cache.prefetch_ticket, device_id)
+                    return True
+                #A prefetched ticket may have been rejected, retry once with a fresh one
+                if not prefetched:
+                    break
+        #The lock capabilities may have changed, fetch them again next time
+        self.lock_cache.invalidate(device_id)
         return False
\ No newline at end of file
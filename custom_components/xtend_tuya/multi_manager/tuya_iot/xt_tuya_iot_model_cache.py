@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+import hashlib
+import json
+import threading
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from tuya_iot import (
+    TuyaOpenAPI,
+)
+
+from ...const import (
+    DOMAIN,
+    LOGGER,  # noqa: F401
+)
+
+MODEL_CACHE_STORAGE_VERSION = 1
+MODEL_CACHE_SAVE_DELAY = 10
+
+class XTIOTModelCache:
+    """Persistent cache of the Tuya thing models, keyed by product_id and model hash.
+
+    The models are stored in Home Assistant's .storage folder along with the model hash
+    currently used by each product. Models served from disk are revalidated against the
+    cloud in the background once the startup is done.
+    """
+
+    def __init__(self, hass: HomeAssistant, api: TuyaOpenAPI, storage_key: str) -> None:
+        self.hass = hass
+        self.api = api
+        self.store: Store[dict[str, Any]] = Store(hass, MODEL_CACHE_STORAGE_VERSION, storage_key)
+        #product_id => key of the model used by the product
+        self.products: dict[str, str] = {}
+        #product_id.model_hash => model
+        self.models: dict[str, str] = {}
+        self.parsed_models: dict[str, dict[str, Any]] = {}
+        self.validated_products: set[str] = set()
+        self.revalidation_candidates: dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.product_locks: dict[str, threading.Lock] = {}
+
+    def get_storage_key(entry_id: str) -> str:
+        return f"{DOMAIN}.{entry_id}.thing_models"
+
+    async def async_remove_store(hass: HomeAssistant, entry_id: str) -> None:
+        """Delete the cache of a config entry, to be called when the entry is removed."""
+        await Store(hass, MODEL_CACHE_STORAGE_VERSION, XTIOTModelCache.get_storage_key(entry_id)).async_remove()
+
+    async def async_load(self) -> None:
+        #Caches of the former format (keyed by product_id only) are dropped
+        if (data := await self.store.async_load()) and "products" in data:
+            self.products = data["products"]
+            self.models = data.get("models", {})
+
+    def _get_product_lock(self, product_id: str) -> threading.Lock:
+        with self.lock:
+            if product_id not in self.product_locks:
+                self.product_locks[product_id] = threading.Lock()
+            return self.product_locks[product_id]
+
+    def _get_model_key(product_id: str, model_hash: str) -> str:
+        return f"{product_id}.{model_hash}"
+
+    def _get_parsed_model(self, model_key: str) -> dict[str, Any]:
+        #Parse the model only once, it is shared by all the devices of the product
+        if model_key not in self.parsed_models:
+            self.parsed_models[model_key] = json.loads(self.models[model_key])
+        return self.parsed_models[model_key]
+
+    def get_model(self, product_id: str, device_id: str, fetch_model: Callable[[str], str | None]) -> dict[str, Any] | None:
+        """Return the parsed thing model of a product, fetching it only on a cache miss."""
+        if not product_id:
+            if model := fetch_model(device_id):
+                return json.loads(model)
+            return None
+
+        #Only one device of a given product fetches the model, the others wait for it
+        with self._get_product_lock(product_id):
+            with self.lock:
+                if (model_key := self.products.get(product_id)) in self.models:
+                    if product_id not in self.validated_products:
+                        self.revalidation_candidates.setdefault(product_id, device_id)
+                    return self._get_parsed_model(model_key)
+            if model := fetch_model(device_id):
+                return self.set_model(product_id, model)
+        return None
+
+    def set_model(self, product_id: str, model: str) -> dict[str, Any]:
+        model_key = XTIOTModelCache._get_model_key(product_id, hashlib.sha256(model.encode("utf8")).hexdigest())
+        with self.lock:
+            self.validated_products.add(product_id)
+            self.revalidation_candidates.pop(product_id, None)
+            if self.products.get(product_id) != model_key or model_key not in self.models:
+                self.products[product_id] = model_key
+                self.models[model_key] = model
+                #The previous version of the model is no longer used
+                self._remove_unreferenced_models()
+                self.hass.loop.call_soon_threadsafe(self._async_schedule_save)
+            return self._get_parsed_model(model_key)
+
+    def remove_unused_products(self, product_ids: Iterable[str]) -> None:
+        """Remove the models of the products that no device uses anymore."""
+        product_ids = set(product_ids)
+        with self.lock:
+            unused_products = [product_id for product_id in self.products if product_id not in product_ids]
+            for product_id in unused_products:
+                del self.products[product_id]
+                self.validated_products.discard(product_id)
+                self.revalidation_candidates.pop(product_id, None)
+            removed_model_count = self._remove_unreferenced_models()
+        if unused_products or removed_model_count:
+            LOGGER.debug(f"Removed the thing models of {len(unused_products)} products that are no longer used")
+            self.hass.loop.call_soon_threadsafe(self._async_schedule_save)
+
+    def _remove_unreferenced_models(self) -> int:
+        #Called with the lock held
+        model_keys = set(self.products.values())
+        unreferenced_model_keys = [model_key for model_key in self.models if model_key not in model_keys]
+        for model_key in unreferenced_model_keys:
+            del self.models[model_key]
+            self.parsed_models.pop(model_key, None)
+        return len(unreferenced_model_keys)
+
+    def _async_schedule_save(self) -> None:
+        self.store.async_delay_save(self._data_to_save, MODEL_CACHE_SAVE_DELAY)
+
+    def _data_to_save(self) -> dict[str, Any]:
+        with self.lock:
+            return {"products": dict(self.products), "models": dict(self.models)}
+
+    def schedule_revalidation(self, fetch_model: Callable[[str], str | None]) -> None:
+        """Revalidate the models that were served from disk, can be called from any thread."""
+        if self.revalidation_candidates:
+            self.hass.add_job(self.async_revalidate, fetch_model)
+
+    async def async_revalidate(self, fetch_model: Callable[[str], str | None]) -> None:
+        with self.lock:
+            candidates = dict(self.revalidation_candidates)
+        for product_id, device_id in candidates.items():
+            model = await self.hass.async_add_executor_job(fetch_model, device_id)
+            if model is None:
+                continue
+            previous_model_key = self.products.get(product_id)
+            self.set_model(product_id, model)
+            if self.products.get(product_id) != previous_model_key:
+                LOGGER.debug(f"Thing model of product {product_id} changed, it will be used after the next restart")
@@ -1,19 +1,32 @@
 """Tuya Open API."""
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import hmac
 import json
+import threading
 import time
 from typing import Any
 
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 
 from tuya_iot.tuya_enums import AuthType
 from tuya_iot.version import VERSION
 from ...const import (
     LOGGER,  # noqa: F401
 )
+from .const import (
+    IOT_API_CONNECTION_POOL_SIZE,
+    IOT_API_REQUEST_TIMEOUT,
+    IOT_API_TOKEN_REFRESH_MARGIN,
+    IOT_API_MAX_RETRIES,
+)
+from .xt_tuya_iot_rate_limiter import (
+    XTIOTRateLimiter,
+)
 
 TUYA_ERROR_CODE_TOKEN_INVALID = 1010
 
@@ -64,9 +77,21 @@ class XTIOTOpenAPI:
         access_secret: str,
         auth_type: AuthType = AuthType.SMART_HOME,
         lang: str = "en",
+        connection_pool_size: int = IOT_API_CONNECTION_POOL_SIZE,
+        token_refresh_margin: int = IOT_API_TOKEN_REFRESH_MARGIN,
+        rate_limiter: XTIOTRateLimiter | None = None,
+        max_retries: int = IOT_API_MAX_RETRIES,
     ) -> None:
         """Init TuyaOpenAPI."""
         self.session = requests.session()
+        #Keep enough pooled connections so that concurrent requests reuse them
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connection_pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        #Async requests run on Home Assistant's shared aiohttp session, see set_client_session
+        self.client_session: aiohttp.ClientSession | None = None
+        self.rate_limiter = rate_limiter if rate_limiter is not None else XTIOTRateLimiter()
+        self.max_retries = max_retries
 
         self.endpoint = endpoint
         self.access_id = access_id
@@ -81,6 +106,14 @@ class XTIOTOpenAPI:
             self.__login_path = TO_C_SMART_HOME_TOKEN_API
 
         self.token_info: TuyaTokenInfo = None
+        #Only one thread refreshes the token or logs in, the others wait for its result
+        self.token_lock = threading.RLock()
+        #Same for the coroutines, they refresh the token or log in on the event loop without blocking it
+        self.async_token_lock = asyncio.Lock()
+        self.token_refresh_margin = token_refresh_margin
+        self.token_refresh_count: int = 0
+        self.token_refresh_failure_count: int = 0
+        self.login_count: int = 0
 
         self.dev_channel: str = ""
 
@@ -96,6 +129,7 @@ class XTIOTOpenAPI:
         path: str,
         params: dict[str, Any] | None = None,
         body: dict[str, Any] | None = None,
+        access_token: str | None = None,
     ) -> tuple[str, int]:
 
         # HTTPMethod
@@ -129,7 +163,9 @@ class XTIOTOpenAPI:
         t = int(time.time() * 1000)
 
         message = self.access_id
-        if self.token_info is not None:
+        if access_token is not None:
+            message += access_token
+        elif self.token_info is not None:
             message += self.token_info.access_token
         message += str(t) + str_to_sign
         sign = (
@@ -143,32 +179,131 @@ class XTIOTOpenAPI:
         )
         return sign, t
 
+    def __is_token_path(self, path: str) -> bool:
+        return (
+            path.startswith(self.__login_path)
+            or path.startswith(TO_C_CUSTOM_REFRESH_TOKEN_API)
+            or path.startswith(TO_C_SMART_HOME_REFRESH_TOKEN_API)
+        )
+
+    def __need_token_refresh(self, token_info: TuyaTokenInfo) -> bool:
+        # should use refresh token? Refresh ahead of the expiration so requests never use an expired token
+        now = int(time.time() * 1000)
+        return token_info.expire_time - self.token_refresh_margin * 1000 <= now
+
     def __refresh_access_token_if_need(self, path: str):
-        if self.is_connect() is False:
+        if self.__is_token_path(path):
             return
 
-        if path.startswith(self.__login_path):
+        if self.is_connect() is False:
             return
 
-        # should use refresh token?
-        now = int(time.time() * 1000)
-        expired_time = self.token_info.expire_time
+        if not self.__need_token_refresh(self.token_info):
+            return
 
-        if expired_time - 60 * 1000 > now:  # 1min
+        if delay := self.__reserve_token_request(TO_C_SMART_HOME_REFRESH_TOKEN_API):
+            time.sleep(delay)
+        with self.token_lock:
+            #Another thread may have refreshed the token while we were waiting for the lock
+            token_info = self.token_info
+            if token_info is None or not self.__need_token_refresh(token_info):
+                return
+
+            self.token_refresh_count += 1
+            if self.auth_type == AuthType.CUSTOM:
+                response = self.post(
+                    TO_C_CUSTOM_REFRESH_TOKEN_API + token_info.refresh_token
+                )
+            else:
+                response = self.get(
+                    TO_C_SMART_HOME_REFRESH_TOKEN_API + token_info.refresh_token
+                )
+
+            self.__on_token_refresh_response(token_info, response)
+
+    async def __async_refresh_access_token_if_need(self, path: str):
+        if self.__is_token_path(path):
             return
 
-        self.token_info.access_token = ""
+        if self.__should_reconnect():
+            if delay := self.__reserve_token_request(self.__login_path):
+                await asyncio.sleep(delay)
+            async with self.async_token_lock:
+                if self.__should_reconnect():
+                    await self.__async_login()
 
-        if self.auth_type == AuthType.CUSTOM:
-            response = self.post(
-                TO_C_CUSTOM_REFRESH_TOKEN_API + self.token_info.refresh_token
-            )
+        token_info = self.token_info
+        if token_info is None or not self.__need_token_refresh(token_info):
+            return
+
+        if delay := self.__reserve_token_request(TO_C_SMART_HOME_REFRESH_TOKEN_API):
+            await asyncio.sleep(delay)
+        async with self.async_token_lock:
+            #Another coroutine may have refreshed the token while we were waiting for the lock
+            token_info = self.token_info
+            if token_info is None or not self.__need_token_refresh(token_info):
+                return
+
+            self.token_refresh_count += 1
+            if self.auth_type == AuthType.CUSTOM:
+                response = await self.async_post(
+                    TO_C_CUSTOM_REFRESH_TOKEN_API + token_info.refresh_token
+                )
+            else:
+                response = await self.async_get(
+                    TO_C_SMART_HOME_REFRESH_TOKEN_API + token_info.refresh_token
+                )
+
+            self.__on_token_refresh_response(token_info, response)
+
+    def __on_token_refresh_response(self, token_info: TuyaTokenInfo, response: dict[str, Any] | None):
+        #The blocking and the async clients share the token, keep it if the other one already replaced it
+        if self.token_info is not token_info:
+            return
+        if response and response.get("success", False):
+            self.token_info = TuyaTokenInfo(response)
         else:
-            response = self.get(
-                TO_C_SMART_HOME_REFRESH_TOKEN_API + self.token_info.refresh_token
-            )
+            #Forget the token, the next request will log in again
+            self.token_refresh_failure_count += 1
+            LOGGER.warning(f"Token refresh failed: {response}")
+            self.token_info = None
 
-        self.token_info = TuyaTokenInfo(response)
+    def __reserve_token_request(self, path: str) -> float:
+        #The token requests are sent with the token lock held, they wait for the rate limiter before taking it
+        return self.rate_limiter.reserve(self.rate_limiter.get_endpoint_class(path))
+
+    def __relogin(self, failed_access_token: str):
+        if delay := self.__reserve_token_request(self.__login_path):
+            time.sleep(delay)
+        with self.token_lock:
+            #Only log in again if no other thread already did it after the failed request
+            if self.token_info is not None and self.token_info.access_token != failed_access_token:
+                return
+            self.token_info = None
+            self.__login()
+
+    async def __async_relogin(self, failed_access_token: str):
+        if delay := self.__reserve_token_request(self.__login_path):
+            await asyncio.sleep(delay)
+        async with self.async_token_lock:
+            #Only log in again if no other coroutine already did it after the failed request
+            if self.token_info is not None and self.token_info.access_token != failed_access_token:
+                return
+            self.token_info = None
+            await self.__async_login()
+
+    def get_token_metrics(self) -> dict[str, Any]:
+        expire_time = self.token_info.expire_time if self.token_info else None
+        return {
+            "token_refresh_count": self.token_refresh_count,
+            "token_refresh_failure_count": self.token_refresh_failure_count,
+            "login_count": self.login_count,
+            "token_expire_time": expire_time,
+        }
+
+    def set_client_session(self, client_session: aiohttp.ClientSession):
+        """Set the aiohttp session used by the async requests."""
+        self.client_session = client_session
 
     def set_dev_channel(self, dev_channel: str):
         """Set dev channel."""
@@ -196,28 +331,64 @@ class XTIOTOpenAPI:
         self.__password = password
         self.__country_code = country_code
         self.__schema = schema
+        if delay := self.__reserve_token_request(self.__login_path):
+            time.sleep(delay)
+        with self.token_lock:
+            return self.__login()
+
+    def __login(self) -> dict[str, Any]:
+        #Called with the token lock held
         self.connecting = True
+        self.login_count += 1
+        try:
+            response = self.post(self.__login_path, self.__get_login_body())
+        finally:
+            self.connecting = False
+        return self.__on_login_response(response)
+
+    async def async_connect(
+        self,
+        username: str = "",
+        password: str = "",
+        country_code: str = "",
+        schema: str = "",
+    ) -> dict[str, Any]:
+        """Connect to Tuya Cloud without blocking the event loop, see connect."""
+        self.__username = username
+        self.__password = password
+        self.__country_code = country_code
+        self.__schema = schema
+        if delay := self.__reserve_token_request(self.__login_path):
+            await asyncio.sleep(delay)
+        async with self.async_token_lock:
+            return await self.__async_login()
+
+    async def __async_login(self) -> dict[str, Any]:
+        #Called with the async token lock held
+        self.connecting = True
+        self.login_count += 1
+        try:
+            response = await self.async_post(self.__login_path, self.__get_login_body())
+        finally:
+            self.connecting = False
+        return self.__on_login_response(response)
+
+    def __get_login_body(self) -> dict[str, Any]:
         if self.auth_type == AuthType.CUSTOM:
-            response = self.post(
-                TO_C_CUSTOM_TOKEN_API,
-                {
-                    "username": username,
-                    "password": hashlib.sha256(password.encode("utf8"))
-                    .hexdigest()
-                    .lower(),
-                },
-            )
-        else:
-            response = self.post(
-                TO_C_SMART_HOME_TOKEN_API,
-                {
-                    "username": username,
-                    "password": hashlib.md5(password.encode("utf8")).hexdigest(),
-                    "country_code": country_code,
-                    "schema": schema,
-                },
-            )
-        self.connecting = False
+            return {
+                "username": self.__username,
+                "password": hashlib.sha256(self.__password.encode("utf8"))
+                .hexdigest()
+                .lower(),
+            }
+        return {
+            "username": self.__username,
+            "password": hashlib.md5(self.__password.encode("utf8")).hexdigest(),
+            "country_code": self.__country_code,
+            "schema": self.__schema,
+        }
+
+    def __on_login_response(self, response: dict[str, Any]) -> dict[str, Any]:
         if not response["success"]:
             return response
 
@@ -226,33 +397,40 @@ class XTIOTOpenAPI:
 
         return response
 
-    def is_connect(self) -> bool:
-        """Is connect to tuya cloud."""
-        if (
+    def __should_reconnect(self) -> bool:
+        return (
             self.token_info is None
             and not self.connecting
             and self.__username 
             and self.__password
             and self.__country_code
-        ):
-            self.connect(
-                self.__username, self.__password, self.__country_code, self.__schema
-            )
+        )
+
+    def __has_access_token(self) -> bool:
         return self.token_info is not None and len(self.token_info.access_token) > 0
 
-    def __request(
+    def is_connect(self) -> bool:
+        """Is connect to tuya cloud."""
+        if self.__should_reconnect():
+            if delay := self.__reserve_token_request(self.__login_path):
+                time.sleep(delay)
+            with self.token_lock:
+                if self.__should_reconnect():
+                    self.__login()
+        return self.__has_access_token()
+
+    def __get_request_headers(
         self,
         method: str,
         path: str,
         params: dict[str, Any] | None = None,
         body: dict[str, Any] | None = None,
-        first_pass: bool = True
-    ) -> dict[str, Any]:
-
-        self.__refresh_access_token_if_need(path)
-
-        access_token = self.token_info.access_token if self.token_info else ""
-        sign, t = self._calculate_sign(method, path, params, body)
+    ) -> dict[str, str]:
+        #Login and refresh requests are signed without the current token
+        access_token = ""
+        if self.token_info is not None and not self.__is_token_path(path):
+            access_token = self.token_info.access_token
+        sign, t = self._calculate_sign(method, path, params, body, access_token)
         headers = {
             "client_id": self.access_id,
             "sign": sign,
@@ -268,41 +446,128 @@ class XTIOTOpenAPI:
             headers["dev_lang"] = "python"
             headers["dev_version"] = VERSION
             headers["dev_channel"] = self.dev_channel
+        return headers
 
-        """ LOGGER.debug(
-            f"Request: method = {method}, \
-                url = {self.endpoint + path},\
-                params = {params},\
-                body = {body},\
-                t = {int(time.time()*1000)}"
-        ) """
+    def __request(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None = None,
+        body: dict[str, Any] | None = None,
+        first_pass: bool = True
+    ) -> dict[str, Any]:
 
-        response = self.session.request(
-            method, self.endpoint + path, params=params, json=body, headers=headers
-        )
+        self.__refresh_access_token_if_need(path)
+
+        endpoint_class = self.rate_limiter.get_endpoint_class(path)
+        #The token requests already waited for the rate limiter, they aren't retried as the token lock is held
+        is_token_path = self.__is_token_path(path)
+        max_retries = 0 if is_token_path else self.max_retries
+        for attempt in range(max_retries + 1):
+            if not is_token_path and (delay := self.rate_limiter.reserve(endpoint_class)):
+                time.sleep(delay)
+
+            #Signed on every attempt, the signature contains the timestamp
+            headers = self.__get_request_headers(method, path, params, body)
+            access_token = headers["access_token"]
+
+            """ LOGGER.debug(
+                f"Request: method = {method}, \
+                    url = {self.endpoint + path},\
+                    params = {params},\
+                    body = {body},\
+                    t = {int(time.time()*1000)}"
+            ) """
+
+            response = self.session.request(
+                method, self.endpoint + path, params=params, json=body, headers=headers
+            )
+            result = response.json() if response.ok else None
+            #The backoff is updated by the last attempt too
+            if not self.rate_limiter.on_response(endpoint_class, method, response.status_code, result) or attempt == max_retries:
+                break
+            LOGGER.debug(f"Request {method} {path} throttled by the cloud (code={response.status_code}), retrying")
 
         if response.ok is False:
             LOGGER.error(
-                f"Response error: code={response.status_code}, body={response.body}"
+                f"Response error: code={response.status_code}, body={response.text}"
             )
             return None
 
-        result = response.json()
-
         """ LOGGER.debug(
             f"Response: {json.dumps(result, ensure_ascii=False, indent=2)}"
         ) """
 
-        if result.get("code", -1) == TUYA_ERROR_CODE_TOKEN_INVALID:
-            self.token_info = None
-            self.connect(
-                self.__username, self.__password, self.__country_code, self.__schema
-            )
+        if result.get("code", -1) == TUYA_ERROR_CODE_TOKEN_INVALID and not is_token_path:
+            self.__relogin(access_token)
             if first_pass:
                 return self.__request(method, path, params, body, False)
 
         return result
 
+    async def __async_request(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None = None,
+        body: dict[str, Any] | None = None,
+        first_pass: bool = True
+    ) -> dict[str, Any]:
+
+        if self.client_session is None:
+            raise RuntimeError("No aiohttp session set, call set_client_session first")
+
+        await self.__async_refresh_access_token_if_need(path)
+
+        #aiohttp only accepts string query parameters, the signature uses the same representation
+        query = {key: str(value) for key, value in params.items()} if params else None
+
+        endpoint_class = self.rate_limiter.get_endpoint_class(path)
+        #The token requests already waited for the rate limiter, they aren't retried as the token lock is held
+        is_token_path = self.__is_token_path(path)
+        max_retries = 0 if is_token_path else self.max_retries
+        for attempt in range(max_retries + 1):
+            if not is_token_path and (delay := self.rate_limiter.reserve(endpoint_class)):
+                await asyncio.sleep(delay)
+
+            #Signed on every attempt, the signature contains the timestamp
+            headers = self.__get_request_headers(method, path, params, body)
+            access_token = headers["access_token"]
+
+            async with self.client_session.request(
+                method,
+                self.endpoint + path,
+                params=query,
+                json=body,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=IOT_API_REQUEST_TIMEOUT),
+            ) as response:
+                status_code = response.status
+                if response.ok:
+                    result = await response.json(content_type=None)
+                    error_body = None
+                else:
+                    result = None
+                    error_body = await response.text()
+            #The backoff is updated by the last attempt too
+            if not self.rate_limiter.on_response(endpoint_class, method, status_code, result) or attempt == max_retries:
+                break
+            LOGGER.debug(f"Request {method} {path} throttled by the cloud (code={status_code}), retrying")
+
+        if result is None:
+            LOGGER.error(
+                f"Response error: code={status_code}, body={error_body}"
+            )
+            return None
+
+        #The token requests run with the async token lock held, which isn't reentrant
+        if result.get("code", -1) == TUYA_ERROR_CODE_TOKEN_INVALID and not is_token_path:
+            await self.__async_relogin(access_token)
+            if first_pass:
+                return await self.__async_request(method, path, params, body, False)
+
+        return result
+
     def get(self, path: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
         """Http Get.
 
@@ -358,3 +623,19 @@ class XTIOTOpenAPI:
             response: response body
         """
         return self.__request("DELETE", path, params, None)
+
+    async def async_get(self, path: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
+        """Http Get on the event loop, see get."""
+        return await self.__async_request("GET", path, params, None)
+
+    async def async_post(self, path: str, body: dict[str, Any] | None = None) -> dict[str, Any]:
+        """Http Post on the event loop, see post."""
+        return await self.__async_request("POST", path, None, body)
+
+    async def async_put(self, path: str, body: dict[str, Any] | None = None) -> dict[str, Any]:
+        """Http Put on the event loop, see put."""
+        return await self.__async_request("PUT", path, None, body)
+
+    async def async_delete(self, path: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
+        """Http Delete on the event loop, see delete."""
+        return await self.__async_request("DELETE", path, params, None)
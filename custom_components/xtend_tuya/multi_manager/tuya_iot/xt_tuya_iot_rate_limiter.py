@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import random
+import re
+import threading
+import time
+from typing import Any
+
+from .const import (
+    IOT_API_BACKOFF_BASE,
+    IOT_API_BACKOFF_MAX,
+    IOT_API_RATE_LIMITS,
+)
+
+ENDPOINT_CLASS_MODEL = "model"
+ENDPOINT_CLASS_SHADOW = "shadow"
+ENDPOINT_CLASS_COMMAND = "command"
+ENDPOINT_CLASS_IPC = "ipc"
+ENDPOINT_CLASS_DEFAULT = "default"
+
+#Evaluated in order, the first matching pattern gives the class of the endpoint
+ENDPOINT_CLASS_PATTERNS: list[tuple[re.Pattern, str]] = [
+    (re.compile(r"/thing/[^/]+/model$"), ENDPOINT_CLASS_MODEL),
+    (re.compile(r"/shadow/properties/issue$|/commands$|/door-lock/|/smart-lock/"), ENDPOINT_CLASS_COMMAND),
+    (re.compile(r"/shadow/properties$|/status$"), ENDPOINT_CLASS_SHADOW),
+    (re.compile(r"/webrtc|/stream/|/ipc/|/cameras/"), ENDPOINT_CLASS_IPC),
+]
+
+#Error codes returned by the Tuya cloud when a request is throttled (1110: concurrent requests over the limit),
+#the quota errors aren't retried as they last until the next billing period
+TUYA_THROTTLING_ERROR_CODES = {1110}
+
+class XTIOTTokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_update = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """Take a token and return how long the caller has to wait before using it."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_update) * self.rate)
+        self.last_update = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate
+
+class XTIOTBackoff:
+    def __init__(self) -> None:
+        self.level: int = 0
+        self.until: float = 0
+
+class XTIOTRateLimiter:
+    """Client side rate limiting of the OpenAPI requests, one budget per class of endpoint.
+
+    Throttled requests (HTTP 429, throttling error codes) and server errors increase an
+    exponential backoff shared by all the requests of the same class, successful
+    requests decrease it again.
+    """
+
+    def __init__(
+        self,
+        rate_limits: dict[str, tuple[float, float]] = IOT_API_RATE_LIMITS,
+        backoff_base: float = IOT_API_BACKOFF_BASE,
+        backoff_max: float = IOT_API_BACKOFF_MAX,
+    ) -> None:
+        self.lock = threading.Lock()
+        self.buckets: dict[str, XTIOTTokenBucket] = {
+            endpoint_class: XTIOTTokenBucket(rate, capacity) for endpoint_class, (rate, capacity) in rate_limits.items()
+        }
+        if ENDPOINT_CLASS_DEFAULT not in self.buckets:
+            self.buckets[ENDPOINT_CLASS_DEFAULT] = XTIOTTokenBucket(*IOT_API_RATE_LIMITS[ENDPOINT_CLASS_DEFAULT])
+        self.backoffs: dict[str, XTIOTBackoff] = {endpoint_class: XTIOTBackoff() for endpoint_class in self.buckets}
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_count: dict[str, int] = {endpoint_class: 0 for endpoint_class in self.buckets}
+        self.throttled_count: dict[str, int] = {endpoint_class: 0 for endpoint_class in self.buckets}
+        self.waited_time: float = 0
+
+    def get_endpoint_class(self, path: str) -> str:
+        path = path.split("?", 1)[0]
+        for pattern, endpoint_class in ENDPOINT_CLASS_PATTERNS:
+            if endpoint_class in self.buckets and pattern.search(path):
+                return endpoint_class
+        return ENDPOINT_CLASS_DEFAULT
+
+    def reserve(self, endpoint_class: str) -> float:
+        """Return the delay to wait before sending a request of this class."""
+        now = time.monotonic()
+        with self.lock:
+            self.request_count[endpoint_class] += 1
+            delay = self.buckets[endpoint_class].reserve(now)
+            delay = max(delay, self.backoffs[endpoint_class].until - now)
+            if delay > 0:
+                self.waited_time += delay
+            return max(delay, 0)
+
+    def on_response(self, endpoint_class: str, method: str, status_code: int, result: dict[str, Any] | None) -> bool:
+        """Update the backoff of the class from a response, return True if the request should be retried."""
+        throttled = status_code == 429 or XTIOTRateLimiter.is_throttling_result(result)
+        #Only idempotent requests are retried on server errors, the others may already have been applied
+        server_error = status_code >= 500 and method == "GET"
+        with self.lock:
+            backoff = self.backoffs[endpoint_class]
+            if not throttled and not server_error:
+                if backoff.level > 0:
+                    backoff.level -= 1
+                return False
+            self.throttled_count[endpoint_class] += 1
+            backoff.level += 1
+            delay = min(self.backoff_base * 2 ** (backoff.level - 1), self.backoff_max)
+            #Jitter so that the waiting requests don't all come back at the same time
+            backoff.until = max(backoff.until, time.monotonic() + delay * random.uniform(0.5, 1))
+            return True
+
+    def is_throttling_result(result: dict[str, Any] | None) -> bool:
+        if not result or result.get("success", True):
+            return False
+        try:
+            return int(result.get("code", -1)) in TUYA_THROTTLING_ERROR_CODES
+        except (TypeError, ValueError):
+            return False
+
+    def get_metrics(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "requests": dict(self.request_count),
+                "throttled": dict(self.throttled_count),
+                "backoff_level": {endpoint_class: backoff.level for endpoint_class, backoff in self.backoffs.items()},
+                "waited_seconds": round(self.waited_time, 3),
+            }
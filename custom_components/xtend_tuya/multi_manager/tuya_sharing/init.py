@@ -187,6 +187,12 @@ class XTTuyaSharingDeviceManagerInterface(XTDeviceManagerInterface):
     ) -> Optional[str]:
         if device_id in self.sharing_account.device_ids:
             return self.sharing_account.device_manager.get_device_stream_allocate(device_id, stream_type)
+
+    def get_device_stream_allocation(
+            self, device_id: str, stream_type: Literal["flv", "hls", "rtmp", "rtsp"]
+    ) -> Optional[dict[str, Any]]:
+        if device_id in self.sharing_account.device_ids:
+            return self.sharing_account.device_manager.get_device_stream_allocation(device_id, stream_type)
     
     def get_device_registry_identifiers(self) -> list:
         if self.sharing_account.device_manager.reuse_config:
@@ -245,6 +251,15 @@ class XTTuyaSharingDeviceManagerInterface(XTDeviceManagerInterface):
         return get_tuya_platform_descriptors(platform)
     
     def send_commands(self, device_id: str, commands: list[dict[str, Any]]):
+        if regular_commands := self._get_regular_commands(device_id, commands):
+            self.sharing_account.device_manager.send_commands(device_id, regular_commands)
+
+    def get_command_codes_to_send(self, device_id: str, commands: list[dict[str, Any]]) -> list[str]:
+        if not self.get_devices_from_device_id(device_id):
+            return []
+        return [command["code"] for command in self._get_regular_commands(device_id, commands)]
+
+    def _get_regular_commands(self, device_id: str, commands: list[dict[str, Any]]) -> list[dict[str, Any]]:
         regular_commands: list[dict[str, Any]] = []
         devices = self.get_devices_from_device_id(device_id)
         for command in commands:
@@ -260,9 +275,7 @@ class XTTuyaSharingDeviceManagerInterface(XTDeviceManagerInterface):
                         break
             if not skip_command:
                 regular_commands.append(command)
-        
-        if regular_commands:
-            self.sharing_account.device_manager.send_commands(device_id, regular_commands)
+        return regular_commands
     
 
     @overload
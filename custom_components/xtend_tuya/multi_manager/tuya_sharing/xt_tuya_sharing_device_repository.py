@@ -25,6 +25,9 @@ from ..shared.device import (
     XTDeviceFunction,
     XTDeviceStatusRange,
 )
+from ..shared.spec_pool import (
+    XTDeviceSpecPool,
+)
 
 class XTSharingDeviceRepository(DeviceRepository):
     def __init__(self, customer_api: CustomerApi, manager: XTSharingDeviceManager, multi_manager: MultiManager):
@@ -95,6 +98,8 @@ class XTSharingDeviceRepository(DeviceRepository):
     def update_device_strategy_info(self, device: CustomerDevice):
         #super().update_device_strategy_info(device)
         self._update_device_strategy_info_mod(device)
+        #Only the entries whose type is replaced get private copies, the device shares them again afterwards
+        copied_shared_entries = False
         #Sometimes the Type provided by Tuya is ill formed,
         #replace it with the one from the local strategy
         for loc_strat in device.local_strategy.values():
@@ -103,9 +108,11 @@ class XTSharingDeviceRepository(DeviceRepository):
             code = loc_strat["statusCode"]
             value_type = loc_strat["valueType"]
 
-            if code in device.status_range:
+            if code in device.status_range and device.status_range[code].type != value_type:
+                copied_shared_entries |= XTDeviceSpecPool.make_writable(device.status_range, code)
                 device.status_range[code].type = value_type
-            if code in device.function:
+            if code in device.function and device.function[code].type != value_type:
+                copied_shared_entries |= XTDeviceSpecPool.make_writable(device.function, code)
                 device.function[code].type     = value_type
 
             if (
@@ -118,4 +125,6 @@ class XTSharingDeviceRepository(DeviceRepository):
                 device.status_range[code].type   = value_type
                 device.status_range[code].values = loc_strat["valueDesc"]
 
-        self.multi_manager.virtual_state_handler.apply_init_virtual_states(device)
\ No newline at end of file
+        self.multi_manager.virtual_state_handler.apply_init_virtual_states(device)
+        if copied_shared_entries:
+            self.multi_manager.share_device_specs()
\ No newline at end of file
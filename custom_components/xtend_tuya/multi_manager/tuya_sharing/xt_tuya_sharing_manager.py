@@ -3,7 +3,7 @@ This file contains all the code that inherit from Tuya integration
 """
 
 from __future__ import annotations
-from typing import Any
+from typing import Any, Literal
 
 from tuya_sharing.manager import (
     Manager,
@@ -121,9 +121,7 @@ class XTSharingDeviceManager(Manager):  # noqa: F811
         if not device:
             return
         self.multi_manager.device_watcher.report_message(device_id, f"[SHARING]On device report: {status}", device)
-        status_new = self.multi_manager.convert_device_report_status_list(device_id, status)
-        status_new = self.multi_manager.multi_source_handler.filter_status_list(device_id, MESSAGE_SOURCE_TUYA_SHARING, status_new)
-        status_new = self.multi_manager.virtual_state_handler.apply_virtual_states_to_status_list(device, status_new)
+        status_new = self.multi_manager.process_device_report_status_list(device, MESSAGE_SOURCE_TUYA_SHARING, status)
 
         super()._on_device_report(device_id, status_new)
         #Temporary fix until a better solution is found
@@ -147,6 +145,15 @@ class XTSharingDeviceManager(Manager):  # noqa: F811
             return
         super().send_commands(device_id, commands)
     
+    def get_device_stream_allocation(
+            self, device_id: str, stream_type: Literal["flv", "hls", "rtmp", "rtsp"]
+    ) -> dict[str, Any] | None:
+        #Same endpoint as the SDK's get_device_stream_allocate, which only returns the URL
+        response = self.customer_api.post(f"/v1.0/m/ipc/{device_id}/stream/actions/allocate", None, {"type": stream_type})
+        if response.get("success"):
+            return response.get("result")
+        return None
+
     def send_lock_unlock_command(
             self, device_id: str, lock: bool
     ) -> bool:
@@ -0,0 +1,215 @@
+"""Fixtures of the message ingest benchmarks.
+
+The benchmarks need the requirements of the integration (Home Assistant and the two
+Tuya SDKs) as well as pytest-benchmark, all listed in requirements_test.txt and run by
+the Benchmarks workflow:
+
+    pip install -r requirements_test.txt
+    pytest tests/benchmarks --benchmark-only
+
+The SDK managers are built without their cloud client and MQTT connection, the
+recorded reports are fed to MultiManager.on_message as the MQTT clients would.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("homeassistant")
+pytest.importorskip("tuya_iot")
+pytest.importorskip("tuya_sharing")
+pytest.importorskip("pytest_benchmark")
+
+from tuya_iot.device import PROTOCOL_DEVICE_REPORT  # noqa: E402
+
+from custom_components.xtend_tuya.const import (  # noqa: E402
+    MESSAGE_SOURCE_TUYA_IOT,
+    MESSAGE_SOURCE_TUYA_SHARING,
+)
+from custom_components.xtend_tuya.multi_manager.multi_manager import (  # noqa: E402
+    MultiManager,
+)
+from custom_components.xtend_tuya.multi_manager.shared.device import (  # noqa: E402
+    XTDevice,
+    XTDeviceFunction,
+    XTDeviceStatusRange,
+)
+from custom_components.xtend_tuya.multi_manager.tuya_iot.xt_tuya_iot_manager import (  # noqa: E402
+    XTIOTDeviceManager,
+)
+from custom_components.xtend_tuya.multi_manager.tuya_sharing.xt_tuya_sharing_manager import (  # noqa: E402
+    XTSharingDeviceManager,
+)
+from custom_components.xtend_tuya.sensor import (  # noqa: E402
+    SENSORS,
+)
+
+#Number of devices of the benchmarked installation
+BENCHMARK_DEVICE_COUNT = 200
+
+#Number of reports replayed per round
+BENCHMARK_REPORT_COUNT = 2000
+
+#Smart plug with energy metering ("cz" category), its add_ele DP is copied to several
+#states and summed in the reporting payload by the virtual states of sensor.py
+#(dp_id, code, type, value descriptor, aliases, writable)
+SMART_PLUG_DPS: tuple[tuple[int, str, str, dict[str, Any], list[str], bool], ...] = (
+    (1, "switch_1", "Boolean", {}, ["switch"], True),
+    (9, "countdown_1", "Integer", {"unit": "s", "min": 0, "max": 86400, "scale": 0, "step": 1}, [], True),
+    (17, "add_ele", "Integer", {"unit": "kW·h", "min": 0, "max": 50000, "scale": 3, "step": 100}, [], False),
+    (18, "cur_current", "Integer", {"unit": "mA", "min": 0, "max": 30000, "scale": 0, "step": 1}, [], False),
+    (19, "cur_power", "Integer", {"unit": "W", "min": 0, "max": 50000, "scale": 1, "step": 1}, [], False),
+    (20, "cur_voltage", "Integer", {"unit": "V", "min": 0, "max": 5000, "scale": 1, "step": 1}, [], False),
+    (21, "test_bit", "Integer", {"min": 0, "max": 5, "scale": 0, "step": 1}, [], False),
+    (22, "voltage_coe", "Integer", {"min": 0, "max": 1000000, "scale": 0, "step": 1}, [], False),
+    (23, "electric_coe", "Integer", {"min": 0, "max": 1000000, "scale": 0, "step": 1}, [], False),
+    (24, "power_coe", "Integer", {"min": 0, "max": 1000000, "scale": 0, "step": 1}, [], False),
+    (25, "electricity_coe", "Integer", {"min": 0, "max": 1000000, "scale": 0, "step": 1}, [], False),
+    (26, "fault", "Bitmap", {"label": ["ov_cr", "ov_vol", "ov_pwr", "ls_cr", "ls_vol", "ls_pow"]}, [], False),
+    (38, "relay_status", "Enum", {"range": ["power_off", "power_on", "last"]}, [], True),
+    (39, "overcharge_switch", "Boolean", {}, [], True),
+    (40, "light_mode", "Enum", {"range": ["relay", "pos", "none"]}, [], True),
+    (41, "child_lock", "Boolean", {}, ["lock"], True),
+    (42, "cycle_time", "String", {"maxlen": 255}, [], True),
+    (43, "random_time", "String", {"maxlen": 255}, [], True),
+    (44, "switch_inching", "String", {"maxlen": 255}, [], True),
+)
+
+#Recorded sequence of reports of a smart plug: (DPs reported together, value of each DP per report index)
+RECORDED_REPORT_PATTERNS: tuple[tuple[int, ...], ...] = (
+    (18, 19, 20),
+    (17,),
+    (18, 19, 20),
+    (1,),
+    (18, 19, 20),
+    (17, 18, 19, 20),
+    (26,),
+    (18, 19),
+)
+
+class XTBenchmarkAccount:
+    """Account exposing an SDK manager to the MultiManager, as tuya_iot/init.py and tuya_sharing/init.py do."""
+
+    def __init__(self, device_manager: Any) -> None:
+        self.device_manager = device_manager
+
+    def get_available_device_maps(self) -> list[dict[str, XTDevice]]:
+        return [self.device_manager.device_map]
+
+    def on_message(self, msg: dict[str, Any]) -> None:
+        self.device_manager.on_message(msg)
+
+    def on_update_device(self, device: XTDevice) -> list[str] | None:
+        return None
+
+class XTBenchmarkMQ:
+    def add_message_listener(self, listener) -> None:
+        pass
+
+    def remove_message_listener(self, listener) -> None:
+        pass
+
+def get_value(dp_type: str, value_descr: dict[str, Any], index: int) -> Any:
+    if dp_type == "Boolean":
+        return index % 2 == 0
+    if dp_type == "Integer":
+        return value_descr["min"] + index % (value_descr["max"] - value_descr["min"] + 1)
+    if dp_type == "Enum":
+        return value_descr["range"][index % len(value_descr["range"])]
+    if dp_type == "Bitmap":
+        return index % (1 << len(value_descr["label"]))
+    return f"{index:08x}"
+
+def build_device(index: int) -> XTDevice:
+    device_id = f"bench{index:017d}"
+    device = XTDevice(
+        id=device_id,
+        name=f"Smart plug {index}",
+        local_key="0123456789abcdef",
+        category="cz",
+        product_id="benchmarkplug001",
+        product_name="Smart plug",
+        sub=False,
+        uuid=device_id,
+        asset_id="benchmark",
+        online=True,
+        icon="",
+        ip="",
+        time_zone="+01:00",
+        active_time=0,
+        create_time=0,
+        update_time=0,
+        support_local=True,
+    )
+    for dp_id, code, dp_type, value_descr, aliases, writable in SMART_PLUG_DPS:
+        values = json.dumps(value_descr)
+        device.local_strategy[dp_id] = {
+            "value_convert": "default",
+            "status_code": code,
+            "config_item": {
+                "statusFormat": f'{{"{code}":"$"}}',
+                "valueDesc": values,
+                "valueType": dp_type,
+                "pid": device.product_id,
+            },
+            "status_code_alias": list(aliases),
+        }
+        device.status_range[code] = XTDeviceStatusRange(code=code, type=dp_type, values=values, dp_id=dp_id)
+        if writable:
+            device.function[code] = XTDeviceFunction(code=code, type=dp_type, values=values, dp_id=dp_id)
+        device.status[code] = get_value(dp_type, value_descr, 0)
+    return device
+
+def build_multi_manager(source: str, device_count: int = BENCHMARK_DEVICE_COUNT) -> MultiManager:
+    multi_manager = MultiManager(MagicMock())
+    if source == MESSAGE_SOURCE_TUYA_IOT:
+        #The IoT manager connects to the cloud when built, only set what the report path uses
+        device_manager = XTIOTDeviceManager.__new__(XTIOTDeviceManager)
+        device_manager.mq = XTBenchmarkMQ()
+        device_manager.device_map = {}
+        device_manager.device_listeners = set()
+        device_manager.multi_manager = multi_manager
+    else:
+        device_manager = XTSharingDeviceManager(multi_manager)
+    for index in range(device_count):
+        device = build_device(index)
+        device_manager.device_map[device.id] = device
+        multi_manager.master_device_map[device.id] = device
+    multi_manager.accounts[source] = XTBenchmarkAccount(device_manager)
+    multi_manager.register_device_descriptors("sensors", SENSORS)
+    multi_manager.is_ready_for_messages = True
+    return multi_manager
+
+def build_recorded_reports(device_count: int = BENCHMARK_DEVICE_COUNT, report_count: int = BENCHMARK_REPORT_COUNT) -> list[tuple[str, list[tuple[int, str, Any]]]]:
+    """Reports as (device id, [(dp_id, code, value)]), the same for both report paths."""
+    dps = {dp[0]: dp for dp in SMART_PLUG_DPS}
+    reports: list[tuple[str, list[tuple[int, str, Any]]]] = []
+    for index in range(report_count):
+        pattern = RECORDED_REPORT_PATTERNS[index % len(RECORDED_REPORT_PATTERNS)]
+        items: list[tuple[int, str, Any]] = []
+        for dp_id in pattern:
+            _, code, dp_type, value_descr, _, _ = dps[dp_id]
+            items.append((dp_id, code, get_value(dp_type, value_descr, index + 1)))
+        reports.append((f"bench{index * 7 % device_count:017d}", items))
+    return reports
+
+def to_message(source: str, device_id: str, items: list[tuple[int, str, Any]], timestamp: int) -> dict[str, Any]:
+    """PROTOCOL_DEVICE_REPORT message as received from the MQTT client of the source."""
+    if source == MESSAGE_SOURCE_TUYA_IOT:
+        status = [{"code": code, "value": value, "t": timestamp} for _, code, value in items]
+    else:
+        status = [{"dpId": dp_id, "value": value, "t": timestamp} for dp_id, _, value in items]
+    return {
+        "protocol": PROTOCOL_DEVICE_REPORT,
+        "pv": "2.0",
+        "sign": "",
+        "t": timestamp,
+        "data": {"devId": device_id, "dataId": f"{timestamp}", "productKey": "benchmarkplug001", "status": status},
+    }
+
+@pytest.fixture(scope="module")
+def recorded_reports() -> list[tuple[str, list[tuple[int, str, Any]]]]:
+    return build_recorded_reports()
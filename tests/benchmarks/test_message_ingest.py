@@ -0,0 +1,82 @@
+"""Throughput, latency and allocations of MultiManager.on_message for both report paths."""
+from __future__ import annotations
+
+import time
+import tracemalloc
+from typing import Any
+
+import pytest
+
+from custom_components.xtend_tuya.const import (
+    MESSAGE_SOURCE_TUYA_IOT,
+    MESSAGE_SOURCE_TUYA_SHARING,
+)
+from custom_components.xtend_tuya.multi_manager.multi_manager import (
+    MultiManager,
+)
+
+from .conftest import (
+    build_multi_manager,
+    to_message,
+)
+
+REPORT_PATHS = (MESSAGE_SOURCE_TUYA_IOT, MESSAGE_SOURCE_TUYA_SHARING)
+
+def build_messages(source: str, recorded_reports: list) -> list[dict[str, Any]]:
+    #Each replay gets its own messages, as the MQTT clients would deliver them
+    return [to_message(source, device_id, items, 1700000000000 + index) for index, (device_id, items) in enumerate(recorded_reports)]
+
+def replay(multi_manager: MultiManager, source: str, messages: list[dict[str, Any]]) -> None:
+    for message in messages:
+        multi_manager.on_message(source, message)
+
+def measure_latencies(multi_manager: MultiManager, source: str, messages: list[dict[str, Any]]) -> list[float]:
+    latencies: list[float] = []
+    for message in messages:
+        start_time = time.perf_counter()
+        multi_manager.on_message(source, message)
+        latencies.append(time.perf_counter() - start_time)
+    return sorted(latencies)
+
+def measure_allocations(multi_manager: MultiManager, source: str, messages: list[dict[str, Any]]) -> float:
+    #Single threaded, so the peak of the process is the peak of the message being processed
+    allocated = 0
+    tracemalloc.start()
+    try:
+        for message in messages:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+            multi_manager.on_message(source, message)
+            allocated += max(tracemalloc.get_traced_memory()[1] - start_memory, 0)
+    finally:
+        tracemalloc.stop()
+    return allocated / len(messages)
+
+@pytest.mark.parametrize("source", REPORT_PATHS)
+def test_message_ingest(benchmark, source: str, recorded_reports: list) -> None:
+    multi_manager = build_multi_manager(source)
+
+    benchmark.pedantic(
+        replay,
+        setup=lambda: ((multi_manager, source, build_messages(source, recorded_reports)), {}),
+        rounds=20,
+        iterations=1,
+        warmup_rounds=2,
+    )
+
+    messages = build_messages(source, recorded_reports)
+    latencies = measure_latencies(multi_manager, source, messages)
+    #The report paths work on copies of the payload items
+    assert messages == build_messages(source, recorded_reports)
+    benchmark.extra_info["reports"] = len(recorded_reports)
+    if benchmark.stats is not None:
+        #None when run with --benchmark-disable
+        benchmark.extra_info["reports_per_second"] = round(len(recorded_reports) / benchmark.stats.stats.mean, 1)
+    benchmark.extra_info["latency_p50_us"] = round(latencies[len(latencies) // 2] * 1e6, 1)
+    benchmark.extra_info["latency_p99_us"] = round(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1e6, 1)
+    benchmark.extra_info["allocated_bytes_per_report"] = round(measure_allocations(multi_manager, source, build_messages(source, recorded_reports)))
+
+    #The reports went through the virtual states of the smart plugs
+    device = next(iter(multi_manager.device_map.values()))
+    assert "add_ele_today" in device.status
+    assert multi_manager.message_metrics.as_dict()["messages"][source] > 0